@@ -0,0 +1,144 @@
+'''
+    Benchmark of chart frame time.
+
+    Chart of 20 candles is updated by a stream of ticks: the forming candle
+    changes each tick and a new candle comes each --ticks-per-candle ticks,
+    as PriceDispatcher feeds Chart_window.update_chart.
+
+    Compared renderers on the same offscreen (Agg) figure:
+        - before - clear axes, apply styles, format dates and rebuild candles
+          by mpl_finance.candlestick_ohlc, draw figure (old update_chart)
+        - after - GUI.candle_renderer.CandleRenderer
+
+    Agg canvas does not show blitted region, so numbers of 'after'
+    do not include copying of bitmap to screen.
+
+    Run from ForHedge directory:
+        python -m Benchmarks.chart_benchmark [--frames 300] [--ticks-per-candle 30]
+'''
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from mpl_finance import candlestick_ohlc
+
+from Binary._latency import get_percentile
+from GUI.candle_renderer import CandleRenderer
+
+SIZE = 20
+
+
+def create_figure():
+    '''
+    Returns figure, canvas and axes styled like Chart_window
+    '''
+
+    figure = Figure(figsize=(10, 6), facecolor='#141523', edgecolor='#141523')
+    canvas = FigureCanvasAgg(figure)
+
+    ax = figure.add_subplot(facecolor='#141523')
+    ax.tick_params(grid_color='#797987', colors='#797987', bottom=False, labelcolor='w')
+    ax.grid()
+    figure.autofmt_xdate()
+    figure.subplots_adjust(left=0.09, bottom=0.20, right=0.94, top=0.90, wspace=0.2, hspace=0)
+
+    return figure, canvas, ax
+
+
+def get_stream(frames, ticks_per_candle, seed=1):
+    '''
+    Yields windows of the latest SIZE candles after each tick
+    :return: generator of list of tuple(date, open, high, low, close)
+    '''
+
+    generator = random.Random(seed)
+    price = 1.1
+    date = 1570000000
+
+    candles = []
+    for i in range(SIZE):
+        open_, price = price, price * (1 + generator.gauss(0, 0.0005))
+        candles.append((date, open_, max(open_, price) * 1.0002, min(open_, price) * 0.9998, price))
+        date += 60
+
+    for i in range(frames):
+        price *= 1 + generator.gauss(0, 0.0002)
+        if i % ticks_per_candle == ticks_per_candle - 1:
+            candles = candles[1:] + [(date, price, price, price, price)]
+            date += 60
+        else:
+            date_, open_, high, low, close = candles[-1]
+            candles[-1] = (date_, open_, max(high, price), min(low, price), price)
+
+        yield list(candles)
+
+
+def render_before(canvas, ax, candle_data):
+    '''
+    Frame of old Chart_window.update_chart
+    '''
+
+    ax.clear()
+    ax.tick_params(grid_color='#797987', colors='#797987', bottom=False, labelcolor='w')
+    ax.grid()
+
+    dates = [datetime.fromtimestamp(candle[0]).strftime('%H:%M') for candle in candle_data]
+    candle_data = [(i, candle[1], candle[2], candle[3], candle[4]) for i, candle in enumerate(candle_data, 1)]
+    candlestick_ohlc(ax, candle_data, colorup='#13c585', colordown='#f71857', width=0.3)
+
+    ax.set_xticks(range(1, len(dates) + 1))
+    ax.set_xticklabels(dates)
+    canvas.draw()
+
+
+def run(name, frames, ticks_per_candle):
+    '''
+    :return: sorted list of frame times in seconds
+    '''
+
+    figure, canvas, ax = create_figure()
+    canvas.draw()
+
+    if name == 'after':
+        renderer = CandleRenderer(canvas, ax, size=SIZE)
+        render = renderer.update
+    else:
+        render = lambda candles: render_before(canvas, ax, candles)
+
+    times = []
+    for candles in get_stream(frames, ticks_per_candle):
+        start = time.perf_counter()
+        render(candles)
+        times.append(time.perf_counter() - start)
+
+    return sorted(times)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Chart frame time benchmark')
+    parser.add_argument('--frames', type=int, default=300, help='ticks to render')
+    parser.add_argument('--ticks-per-candle', type=int, default=30, help='ticks of one candle')
+    args = parser.parse_args()
+
+    print('{:<10}{:>10}{:>10}{:>10}{:>10}{:>10}'.format('frame, ms', 'mean', 'p50', 'p99', 'max', 'fps'))
+    for name in ('before', 'after'):
+        times = run(name, args.frames, args.ticks_per_candle)
+        mean = sum(times) / len(times)
+        print('{:<10}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.0f}'.format(
+            name, mean * 1000, get_percentile(times, 50) * 1000, get_percentile(times, 99) * 1000,
+            times[-1] * 1000, 1 / mean))
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
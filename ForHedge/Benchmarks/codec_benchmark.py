@@ -0,0 +1,89 @@
+'''
+    Benchmark of JSON backends available to Binary._codec.
+
+    Payloads in Benchmarks/payloads have the shape of Binary.com responses
+    the clients receive: candles (ticks_history), proposal,
+    proposal_open_contract and portfolio.
+
+    For each available backend reports decode and encode throughput
+    in messages per second and MB per second.
+
+    Run from ForHedge directory:
+        python -m Benchmarks.codec_benchmark [seconds_per_case]
+'''
+
+import json
+import os
+import sys
+import time
+
+import Binary._codec as codec
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+PAYLOADS = ['candles', 'proposal', 'proposal_open_contract', 'portfolio']
+
+
+def load_payloads():
+    '''
+    Returns payloads as compact text, the way they come from the socket
+    :return: list of tuple(name, text)
+    '''
+
+    payloads = []
+    for name in PAYLOADS:
+        with open(os.path.join(PAYLOADS_DIR, name + '.json')) as file:
+            payloads.append((name, json.dumps(json.load(file), separators=(',', ':'))))
+
+    return payloads
+
+
+def measure(function, argument, seconds):
+    '''
+    Calls function repeatedly for given time
+    :return: calls per second
+    '''
+
+    # calibrate batch size to keep timer overhead small
+    batch = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(batch):
+            function(argument)
+        if time.perf_counter() - start > 0.01:
+            break
+        batch *= 2
+
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(batch):
+            function(argument)
+        calls += batch
+
+    return calls / (time.perf_counter() - start)
+
+
+def main(seconds=0.5):
+
+    payloads = load_payloads()
+    backends = codec.get_available_backends()
+
+    print('selected backend: ' + codec.BACKEND)
+    print('{:<10}{:<24}{:>9}{:>14}{:>10}{:>14}{:>10}'.format(
+        'backend', 'payload', 'bytes', 'decode msg/s', 'MB/s', 'encode msg/s', 'MB/s'))
+
+    for backend, loads, dumps in backends:
+        for name, text in payloads:
+            size = len(text.encode('utf-8'))
+            message = loads(text)
+
+            decode = measure(loads, text, seconds)
+            encode = measure(dumps, message, seconds)
+
+            print('{:<10}{:<24}{:>9}{:>14.0f}{:>10.1f}{:>14.0f}{:>10.1f}'.format(
+                backend, name, size, decode, decode*size/1e6, encode, encode*size/1e6))
+
+
+if __name__ == '__main__':
+
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.5)
@@ -0,0 +1,206 @@
+'''
+    Benchmark of request/response correlation under thread contention.
+
+    Starts local echo WebSocket server and drives 1, 8 and 64 caller threads
+    through two correlation implementations over the same websocket-client transport:
+        - before: four locks and Event per request (old MultiThreadWSHelper)
+        - after: one PendingRequest per req_id behind one lock (MultiThreadWSHelper)
+
+    Reports requests per second and p50/p99 wait time.
+
+    Run from ForHedge directory:
+        python -m Benchmarks.correlation_benchmark [requests_per_thread]
+'''
+
+import asyncio
+import json
+import sys
+import time
+from threading import Thread, Lock, Event
+
+import websockets
+from websocket import WebSocketApp
+
+import Binary._multithread_helper as mt_helper
+
+HOST = '127.0.0.1'
+PORT = 64510
+THREAD_COUNTS = [1, 8, 64]
+
+
+class LegacyHelper:
+    '''
+        Correlation as it was before PendingRequest:
+        separate locks for id counter, responses and events
+    '''
+
+    def __init__(self):
+
+        self.responses = dict()
+        self.request_id = 0
+        self.events = dict()
+
+        self.lock_get_next_req_id = Lock()
+        self.lock_responses_operations = Lock()
+        self.lock_events = Lock()
+        self.ws_lock = Lock()
+
+    def get_next_req_id(self):
+        with self.lock_get_next_req_id:
+            id_to_return = self.request_id
+            self.request_id += 1
+        return id_to_return
+
+    def add_response(self, response):
+        with self.lock_responses_operations:
+            self.responses[response['req_id']] = response
+
+    def get_response(self, id):
+        with self.lock_responses_operations:
+            return self.responses[id]
+
+    def add_event(self, id, event):
+        with self.lock_events:
+            self.events[id] = event
+
+    def set_event(self, id):
+        with self.lock_events:
+            self.events[id].set()
+
+    def in_events(self, id):
+        with self.lock_events:
+            return id in self.events
+
+    # the same sequence as Binary methods and on_app_msg used
+
+    def call(self, send):
+        curID = self.get_next_req_id()
+        curEvent = Event()
+        self.add_event(curID, curEvent)
+        send(json.dumps({'ping' : 1, 'req_id' : curID}))
+        curEvent.wait()
+        return self.get_response(curID)
+
+    def on_msg(self, msg):
+        resp = json.loads(msg)
+        self.add_response(resp)
+        id_ = resp['req_id']
+        if self.in_events(id_):
+            self.set_event(id_)
+
+
+class PendingHelper(mt_helper.MultiThreadWSHelper):
+    '''
+        Correlation by PendingRequest (current MultiThreadWSHelper)
+    '''
+
+    def call(self, send):
+        pending = self.register_request()
+        send(json.dumps({'ping' : 1, 'req_id' : pending.req_id}))
+        return pending.wait()
+
+    def on_msg(self, msg):
+        self.resolve_response(json.loads(msg))
+
+
+class Client:
+    '''
+        Connection to echo server driven by given helper
+    '''
+
+    def __init__(self, helper):
+
+        self.helper = helper
+        self.opened = Event()
+        self.app = WebSocketApp(url='ws://{}:{}'.format(HOST, PORT),
+                                on_open = lambda ws: self.opened.set(),
+                                on_message = lambda ws, msg: self.helper.on_msg(msg))
+        Thread(target=self.app.run_forever, daemon=True).start()
+        self.opened.wait()
+
+    def send_request(self, request):
+        with self.helper.ws_lock:
+            self.app.send(request)
+
+    def call(self):
+        return self.helper.call(self.send_request)
+
+    def close(self):
+        self.app.close()
+
+
+def start_echo_server():
+    '''
+    Starts echo server in background thread
+    :return: None
+    '''
+
+    started = Event()
+
+    async def echo(ws, *args):
+        async for msg in ws:
+            await ws.send(msg)
+
+    async def serve():
+        async with websockets.serve(echo, HOST, PORT):
+            started.set()
+            await asyncio.Future()
+
+    Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    started.wait()
+
+
+def percentile(values, p):
+
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values)*p))]
+
+
+def run(helper_class, thread_count, requests_per_thread):
+    '''
+    Drives thread_count threads making requests_per_thread calls each
+    :return: tuple(requests per second, p50 wait, p99 wait)
+    '''
+
+    client = Client(helper_class())
+    waits = []
+    waits_lock = Lock()
+
+    def caller():
+        local = []
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            client.call()
+            local.append(time.perf_counter() - start)
+        with waits_lock:
+            waits.extend(local)
+
+    threads = [Thread(target=caller) for _ in range(thread_count)]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    client.close()
+
+    return len(waits) / elapsed, percentile(waits, 0.5), percentile(waits, 0.99)
+
+
+def main(requests_per_thread=500):
+
+    start_echo_server()
+
+    print('{:<8}{:>9}{:>14}{:>12}{:>12}'.format('impl', 'threads', 'req/s', 'p50 ms', 'p99 ms'))
+
+    for thread_count in THREAD_COUNTS:
+        for name, helper_class in (('before', LegacyHelper), ('after', PendingHelper)):
+            rps, p50, p99 = run(helper_class, thread_count, requests_per_thread)
+            print('{:<8}{:>9}{:>14.0f}{:>12.3f}{:>12.3f}'.format(name, thread_count, rps, p50*1000, p99*1000))
+
+
+if __name__ == '__main__':
+
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,271 @@
+'''
+    End-to-end hedge latency benchmark: from MetaTrader order notification
+    to acknowledgement of the opposite option bought at Binary.com.
+
+    Synthetic TRADE_TRANSACTION_ORDER_ADD messages are sent to
+    MetaTraderAccount.server the way MQL expert sends them (new connection
+    per order) at given rate and bursts. Received orders are hedged by
+    BinaryAccount.buy_contract through SessionPool against local
+    Binary.test_server with configurable latency.
+
+    Reports throughput and p50/p99/p99.9/max per stage in milliseconds:
+        - accept - from client connect to accept() by server
+        - recv - from accept to the whole message received
+        - parse - process_event
+        - dispatch - from event listener to hedge worker
+        - connect/auth - session checkout (connect and authorize if it is not ready)
+        - buy - buy_contract round trip
+        - total - from client connect to buy acknowledgement
+
+    Exit status is 1 if p99 of total is above --budget milliseconds,
+    so the benchmark can fail CI on regression.
+
+    Run from ForHedge directory:
+        python -m Benchmarks.hedge_benchmark [--count 200] [--rate 20] [--burst 1]
+                                             [--latency 0.02] [--jitter 0.005] [--budget 0]
+'''
+
+import argparse
+import queue
+import socket
+import sys
+import time
+from threading import Thread, Lock
+
+import Binary._binary_general as bin_api
+from Binary._latency import get_percentile
+from Binary.session_pool import SessionPool
+from Binary.test_server import FakeBinaryServer
+from MetaTrader.mt_account import MetaTraderAccount
+
+HOST = '127.0.0.1'
+TOKEN = 'benchmark-token'
+STAGES = ['accept', 'recv', 'parse', 'dispatch', 'connect/auth', 'buy', 'total']
+
+ORDER_PATTERN = '''TRADE_TRANSACTION_ORDER_ADD
+Symbol: {symbol}
+Deal ticket: 0
+Deal type: DEAL_TYPE_{type}
+Order ticket: {order_id}
+Order type: ORDER_TYPE_{type}
+Order state: ORDER_STATE_STARTED
+Order time type: ORDER_TIME_GTC
+Order expiration: 1970.01.01 00:00
+Price: 1.10191
+Price trigger: 0
+Stop Loss: 0
+Take Profit: 0
+Volume: 0.01
+Position: 0
+Position by: 0
+'''
+
+
+class Listener:
+    '''
+        Stands for Qt signal of MetaTrader window:
+        orders are hedged by another thread
+    '''
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def emit(self, event):
+        self.queue.put(event)
+
+
+class HedgeBenchmark:
+
+    def __init__(self, count, rate, burst, workers, latency, jitter, warm):
+
+        self.count = count
+        self.rate = rate
+        self.burst = burst
+        self.workers = workers
+        self.warm = warm
+
+        self.binary_server = FakeBinaryServer(latency=latency, jitter=jitter, tick_interval=1)
+        self.pool = SessionPool()
+        self.listener = Listener()
+        self.mt_server = MetaTraderAccount(host=HOST, port=0, event_listener=self.listener)
+
+        self.lock = Lock()
+        # key - order id, value - time.perf_counter() before connect
+        self.sent_at = dict()
+        # list of dict of stage durations in seconds
+        self.results = []
+        self.errors = 0
+        self.send_errors = 0
+
+    def send_order(self, order_id):
+        '''
+        Sends one order like MQL expert does:
+        connect, send description, wait until server closes connection
+        '''
+
+        message = ORDER_PATTERN.format(symbol='EURUSD',
+                                       type='BUY' if order_id % 2 else 'SELL',
+                                       order_id=order_id)
+
+        with self.lock:
+            self.sent_at[str(order_id)] = time.perf_counter()
+
+        try:
+            with socket.create_connection((HOST, self.mt_server.port), timeout=5) as client:
+                client.sendall(message.encode('utf-8'))
+                client.recv(1)
+        except OSError:
+            with self.lock:
+                self.send_errors += 1
+
+    def send_orders(self):
+
+        interval = self.burst / self.rate
+        order_id = 100000000
+        next_time = time.perf_counter()
+
+        while order_id - 100000000 < self.count:
+            senders = []
+            for _ in range(min(self.burst, self.count - (order_id - 100000000))):
+                order_id += 1
+                senders.append(Thread(target=self.send_order, args=(order_id,)))
+
+            for sender in senders:
+                sender.start()
+            for sender in senders:
+                sender.join()
+
+            next_time += interval
+            time.sleep(max(next_time - time.perf_counter(), 0))
+
+    def hedge(self):
+        '''
+        Hedge worker: the same steps as MetaTrader window does for each order
+        '''
+
+        while True:
+            event = self.listener.queue.get()
+            if event is None:
+                return
+
+            picked = time.perf_counter()
+            session = self.pool.get_session(TOKEN)
+            checked_out = time.perf_counter()
+
+            response = session.buy_contract(amount=1,
+                                            type='CALL' if event['type'] == 'SELL' else 'PUT',
+                                            duration=1,
+                                            duration_unit='m',
+                                            symbol=event['symbol'])
+            acknowledged = time.perf_counter()
+
+            timing = event['timing']
+            with self.lock:
+                sent_at = self.sent_at[event['order_id']]
+                if response is None or 'error' in response:
+                    self.errors += 1
+
+                self.results.append({
+                    'accept' : timing['accepted'] - sent_at,
+                    'recv' : timing['received'] - timing['accepted'],
+                    'parse' : timing['parsed'] - timing['received'],
+                    'dispatch' : picked - timing['parsed'],
+                    'connect/auth' : checked_out - picked,
+                    'buy' : acknowledged - checked_out,
+                    'total' : acknowledged - sent_at,
+                    'acknowledged' : acknowledged,
+                    'sent_at' : sent_at
+                })
+
+    def run(self, timeout=60):
+        '''
+        Runs benchmark
+        :return: dict - stage and tuple(p50, p99, p99.9, max) in seconds,
+                 key 'throughput' - hedges per second
+        '''
+
+        self.binary_server.start()
+        bin_api.set_binary_url(self.binary_server.url)
+
+        self.mt_server.start_connection()
+        while not self.mt_server.connected:
+            if self.mt_server.connection_error:
+                raise OSError('MetaTrader server did not start')
+            time.sleep(0.01)
+
+        if self.warm:
+            self.pool.get_session(TOKEN)
+
+        workers = [Thread(target=self.hedge, daemon=True) for _ in range(self.workers)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            self.send_orders()
+
+            deadline = time.perf_counter() + timeout
+            while len(self.results) + self.send_errors < self.count and time.perf_counter() < deadline:
+                time.sleep(0.05)
+        finally:
+            for _ in workers:
+                self.listener.queue.put(None)
+            self.mt_server.kill()
+            self.pool.close_all()
+            self.binary_server.stop()
+            bin_api.set_binary_url(None)
+
+        return self.get_report()
+
+    def get_report(self):
+
+        with self.lock:
+            results = list(self.results)
+
+        report = dict()
+        for stage in STAGES:
+            values = sorted(result[stage] for result in results)
+            report[stage] = (get_percentile(values, 50), get_percentile(values, 99),
+                             get_percentile(values, 99.9), values[-1] if len(values) > 0 else 0.0)
+
+        duration = max(r['acknowledged'] for r in results) - min(r['sent_at'] for r in results) \
+                   if len(results) > 0 else 0
+        report['throughput'] = len(results) / duration if duration > 0 else 0.0
+
+        return report
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='End-to-end hedge latency benchmark')
+    parser.add_argument('--count', type=int, default=200, help='orders to send')
+    parser.add_argument('--rate', type=float, default=20, help='orders per second')
+    parser.add_argument('--burst', type=int, default=1, help='orders sent at once')
+    parser.add_argument('--workers', type=int, default=1, help='hedge threads (window hedges in one)')
+    parser.add_argument('--latency', type=float, default=0.02, help='Binary.com response latency, seconds')
+    parser.add_argument('--jitter', type=float, default=0.005, help='Binary.com latency jitter, seconds')
+    parser.add_argument('--cold', action='store_true', help='do not open session before the first order')
+    parser.add_argument('--budget', type=float, default=0, help='fail if p99 of total is above, ms')
+    args = parser.parse_args()
+
+    benchmark = HedgeBenchmark(count=args.count, rate=args.rate, burst=args.burst,
+                               workers=args.workers, latency=args.latency,
+                               jitter=args.jitter, warm=not args.cold)
+    report = benchmark.run()
+
+    print('orders: {}, hedged: {}, buy errors: {}, send errors: {}'.format(
+        args.count, len(benchmark.results), benchmark.errors, benchmark.send_errors))
+    print('throughput: {:.1f} hedges/s'.format(report['throughput']))
+    print('{:<14}{:>10}{:>10}{:>10}{:>10}'.format('stage, ms', 'p50', 'p99', 'p99.9', 'max'))
+    for stage in STAGES:
+        print('{:<14}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}'.format(stage, *[v * 1000 for v in report[stage]]))
+
+    if args.budget > 0 and report['total'][1] * 1000 > args.budget:
+        print('p99 of total {:.2f} ms is above budget {:.2f} ms'.format(report['total'][1] * 1000, args.budget))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,140 @@
+'''
+    Benchmark of history outputs of Binary.get_history.
+
+    ticks_history responses of 20, 5000 and 100000 candles
+    (Benchmarks/payloads/candles.json repeated with shifted epochs)
+    are converted by parsers of each output:
+        - tuples - list of tuple (date, open, high, low, close)
+        - array - numpy structured array of CANDLE_DTYPE
+        - columns - dict of numpy array per field
+
+    Reports per output in microseconds:
+        - decode - JSON decoding of response text (the same for all outputs, for scale)
+        - parse - conversion of decoded response
+        - use - typical consumer step: chart bounds and 20 candles moving average of close
+    and memory kept by result in KB.
+
+    Run from ForHedge directory:
+        python -m Benchmarks.history_benchmark [seconds_per_case]
+'''
+
+import json
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+import Binary._codec as codec
+import Binary._responses as responses
+from Benchmarks.codec_benchmark import PAYLOADS_DIR, measure
+
+SIZES = [20, 5000, 100000]
+OUTPUTS = ['tuples', 'array', 'columns']
+
+# moving average period of consumer step
+PERIOD = 20
+
+
+def get_payload(size):
+    '''
+    Returns candles response of given size as compact text
+    :return: str
+    '''
+
+    with open(os.path.join(PAYLOADS_DIR, 'candles.json')) as file:
+        response = json.load(file)
+
+    template = response['candles']
+    step = template[1]['epoch'] - template[0]['epoch']
+    span = step * len(template)
+
+    candles = []
+    for i in range(size):
+        candle = dict(template[i % len(template)])
+        candle['epoch'] += span * (i // len(template))
+        candles.append(candle)
+
+    response['candles'] = candles
+    response['echo_req']['count'] = size
+
+    return json.dumps(response, separators=(',', ':'))
+
+
+def use_tuples(candles):
+
+    low = min(candle[3] for candle in candles)
+    high = max(candle[2] for candle in candles)
+
+    closes = [candle[4] for candle in candles]
+    average = []
+    total = sum(closes[:PERIOD - 1])
+    for i in range(PERIOD - 1, len(closes)):
+        total += closes[i]
+        average.append(total / PERIOD)
+        total -= closes[i - PERIOD + 1]
+
+    return low, high, average
+
+
+def use_arrays(low, high, close):
+
+    average = np.convolve(close, np.ones(PERIOD) / PERIOD, mode='valid')
+
+    return low.min(), high.max(), average
+
+
+def use_array(candles):
+    return use_arrays(candles['low'], candles['high'], candles['close'])
+
+
+def use_columns(columns):
+    return use_arrays(columns['low'], columns['high'], columns['close'])
+
+
+USERS = {
+    'tuples' : use_tuples,
+    'array' : use_array,
+    'columns' : use_columns
+}
+
+
+def get_result_size(parser, response):
+    '''
+    Returns memory allocated by parser result in KB
+    '''
+
+    tracemalloc.start()
+    result = parser(response)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del result
+
+    return size / 1024
+
+
+def main(seconds=0.5):
+
+    print('{:>8}{:<10}{:>14}{:>14}{:>14}{:>14}{:>12}'.format(
+        'candles', ' output', 'decode, us', 'parse, us', 'use, us', 'parse+use', 'memory, KB'))
+
+    for size in SIZES:
+        text = get_payload(size)
+        response = codec.loads(text)
+        decode = 1e6 / measure(codec.loads, text, seconds)
+
+        for output in OUTPUTS:
+            parser = responses.get_history_parser(output)
+            result = parser(response)
+
+            parse = 1e6 / measure(parser, response, seconds)
+            use = 1e6 / measure(USERS[output], result, seconds)
+
+            print('{:>8}{:<10}{:>14.1f}{:>14.1f}{:>14.1f}{:>14.1f}{:>12.1f}'.format(
+                size, ' ' + output, decode, parse, use, parse + use, get_result_size(parser, response)))
+
+
+if __name__ == '__main__':
+
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.5)
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import sys
+import traceback
+
+import websockets
+
+import Binary._binary_general as bin_api
+import Binary._codec as codec
+from Binary._errors import RequestTimeoutError, ConnectionLostError
+
+
+class AsyncSubscription:
+    '''
+        Stream of updates received by one subscribed request.
+        Use it as async iterator:
+
+            async for update in subscription:
+                ...
+
+        Each update is converted by given parser.
+        close() stops the stream at Binary.com side.
+    '''
+
+    def __init__(self, helper, req_id, parser=None):
+
+        self.helper = helper
+        self.req_id = req_id
+        self.parser = parser
+        self.queue = asyncio.Queue()
+        self.closed = False
+        self.subscription_id = None
+
+    def push(self, response):
+
+        if self.subscription_id is None and 'subscription' in response:
+            self.subscription_id = response['subscription']['id']
+
+        self.queue.put_nowait(response)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+
+        if self.closed:
+            raise StopAsyncIteration
+
+        response = await self.queue.get()
+
+        # None is pushed when subscription or connection is closed
+        if response is None:
+            raise StopAsyncIteration
+
+        return response if self.parser is None else self.parser(response)
+
+    async def close(self):
+
+        if self.closed:
+            return
+
+        self.closed = True
+        self.helper.subscriptions.pop(self.req_id, None)
+        self.queue.put_nowait(None)
+
+        if not self.subscription_id is None:
+            await self.helper.forget_subscription(self.subscription_id)
+
+
+class AsyncWSHelper:
+    '''
+        Asyncio analog of MultiThreadWSHelper.
+
+        One event loop drives any number of concurrent requests:
+        each request gets unique id and future which is resolved
+        by the response with the same req_id.
+        There is no thread and no lock per request.
+
+        Requests wait for response not longer than given timeout
+        or default_timeout seconds (None to wait forever)
+        and raise RequestTimeoutError after that.
+        Cancelling the awaiting task forgets the request.
+    '''
+
+    def __init__(self, url, default_timeout=30):
+
+        self.url = url
+        self.default_timeout = default_timeout
+        self.ws = None
+        self.reader = None
+
+        # use to identify requests
+        self.request_id = 0
+
+        '''
+            key - request id
+            value - future resolved by response
+        '''
+        self.pending = dict()
+
+        '''
+            key - request id
+            value - AsyncSubscription
+        '''
+        self.subscriptions = dict()
+
+    def get_next_req_id(self):
+
+        id_to_return = self.request_id
+        self.request_id += 1
+
+        return id_to_return
+
+    async def open_app(self):
+
+        self.ws = await websockets.connect(self.url, open_timeout=self.default_timeout)
+        self.reader = asyncio.ensure_future(self.read_responses())
+
+    async def close_app(self):
+
+        if not self.ws is None:
+            await self.ws.close()
+
+        if not self.reader is None:
+            await self.reader
+
+    async def read_responses(self):
+        '''
+        Receives responses and resolves futures by req_id
+        :return:
+        '''
+
+        try:
+            async for msg in self.ws:
+                self.on_app_msg(msg)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.on_app_close()
+
+    def on_app_msg(self, msg):
+
+        try:
+            resp = codec.loads(msg)
+            id_ = resp.get('req_id')
+
+            if id_ in self.subscriptions:
+                self.subscriptions[id_].push(resp)
+
+            future = self.pending.pop(id_, None)
+            if not future is None and not future.done():
+                future.set_result(resp)
+
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def on_app_close(self):
+        '''
+        Fails all waiting requests and finishes all subscriptions
+        :return:
+        '''
+
+        pending, self.pending = self.pending, dict()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionLostError('Connection to Binary.com closed'))
+
+        subscriptions, self.subscriptions = self.subscriptions, dict()
+        for subscription in subscriptions.values():
+            subscription.closed = True
+            subscription.queue.put_nowait(None)
+
+    async def wait_response(self, req_id, future, timeout=None):
+        '''
+        Waits for future of request. Request is forgotten if timeout expires or task is cancelled
+        :param timeout: seconds or None to wait default_timeout
+        :return: dict
+        '''
+
+        if timeout is None:
+            timeout = self.default_timeout
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RequestTimeoutError('No response to request {} in {} seconds'.format(req_id, timeout))
+        finally:
+            self.pending.pop(req_id, None)
+
+    async def send(self, request):
+        '''
+        Writes request into connection
+        :param request: str
+        :return: None
+        '''
+
+        try:
+            await self.ws.send(request)
+        except websockets.ConnectionClosed as e:
+            raise ConnectionLostError('Connection to Binary.com closed') from e
+
+    async def request(self, build_request, timeout=None, **params):
+        '''
+        Sends request built by given function and waits for response
+        :param build_request: function from _binary_general which takes req_id
+        :param timeout: seconds or None to wait default_timeout
+        :param params: parameters of build_request
+        :return: dict
+        '''
+
+        curID = self.get_next_req_id()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[curID] = future
+
+        try:
+            await self.send(build_request(req_id=curID, **params))
+        except:
+            self.pending.pop(curID, None)
+            raise
+
+        return await self.wait_response(curID, future, timeout)
+
+    async def subscribe(self, build_request, parser=None, timeout=None, **params):
+        '''
+        Sends subscribe request and returns first response and stream of next ones
+        :param build_request: function from _binary_general which takes req_id
+        :param parser: function to convert each update
+        :param timeout: seconds or None to wait default_timeout for the first response
+        :param params: parameters of build_request
+        :return: tuple(dict, AsyncSubscription)
+        '''
+
+        curID = self.get_next_req_id()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[curID] = future
+
+        subscription = AsyncSubscription(self, curID, parser)
+        self.subscriptions[curID] = subscription
+
+        try:
+            await self.send(build_request(req_id=curID, **params))
+            response = await self.wait_response(curID, future, timeout)
+        except:
+            self.pending.pop(curID, None)
+            self.subscriptions.pop(curID, None)
+            raise
+
+        # first response is returned, stream starts with the next one
+        subscription.queue.get_nowait()
+
+        if 'error' in response:
+            self.subscriptions.pop(curID, None)
+            subscription.closed = True
+
+        return response, subscription
+
+    async def forget_subscription(self, subscription_id):
+        '''
+        Makes request to stop receive events by subscription
+        :return: dict
+        '''
+
+        return await self.request(bin_api.get_forget_stream_json, streamID=subscription_id)
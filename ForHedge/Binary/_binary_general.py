@@ -6,18 +6,38 @@
         APP_ID
         API_URL
 
+    Clients connect to BINARY_URL if it is set (by set_binary_url or
+    BINARY_URL environment variable), e.g. to local Binary.test_server.
+
+    Requests are serialized by _codec (the fastest available JSON backend).
+
     For more information visit https://developers.binary.com/api/
 '''
 
-import json
+import Binary._codec as codec
+import os
 
 APP_ID = 19182
 
 API_URL = 'wss://ws.binaryws.com/websockets/v3?app_id='
 
+BINARY_URL = os.environ.get('BINARY_URL')
+
 def get_binary_url(appid=None):
 
-    return API_URL + str(APP_ID) if appid is None else str(appid)
+    if not BINARY_URL is None:
+        return BINARY_URL
+
+    return API_URL + str(APP_ID if appid is None else appid)
+
+def set_binary_url(url=None):
+    '''
+    Points clients created after the call at given server
+    :param url: str or None to use Binary.com
+    :return: None
+    '''
+    global BINARY_URL
+    BINARY_URL = url
 
 # API CALL PATTERNS
 
@@ -32,7 +52,7 @@ def get_asset_json(req_id=0):
     req = ASSETS_PATTERN.copy()
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 FORGET_STREAM_PATTERN = {
@@ -45,7 +65,7 @@ def get_forget_stream_json(streamID, req_id=0):
     req['forget'] = streamID
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 # FORGET ALL SPECIFIED STREAMS: candles, ticks, proposal...
@@ -59,7 +79,7 @@ def get_forget_all_json(stream_name, req_id=0):
     req['forget_all'] = stream_name
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 PING_PATTERN = {
@@ -71,7 +91,7 @@ def get_ping_json(req_id=0):
     req = PING_PATTERN.copy()
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 PRICE_PROPOSAL_PATTERN = {
@@ -87,16 +107,18 @@ PRICE_PROPOSAL_PATTERN = {
 }
 
 def get_price_proposal_json(amount=100, type='CALL', duration=60,
-                            duration_unit='s', symbol='frxEURUSD', req_id=0):
+                            duration_unit='s', symbol='frxEURUSD', subscribe=0, req_id=0):
     req = PRICE_PROPOSAL_PATTERN.copy()
     req['amount'] = amount
     req['contract_type'] = type
     req['duration'] = duration
     req['duration_unit'] = duration_unit
     req['symbol'] = symbol
+    if subscribe == 1:
+        req['subscribe'] = 1
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 def get_price_proposal_dict(amount=100, type='CALL', duration=60,
@@ -126,7 +148,7 @@ def get_tick_stream_json(symbol='frxEURUSD', subscribe=1, req_id=0):
     if subscribe != 1:
         req.pop('subscribe')
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 TICK_HISTORY_PATTERN = {
@@ -159,7 +181,7 @@ def get_tick_history_json(symbol='frxEURUSD', start=1, end='latest',
         req.pop('subscribe')
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 
@@ -175,7 +197,7 @@ def get_authorize_json(apiToken, req_id=0):
     req['authorize'] = apiToken
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 LOGOUT_PATTERN = {
@@ -187,7 +209,7 @@ def get_logout_json(req_id=0):
     req = LOGOUT_PATTERN.copy()
     req['req_id'] = req
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 BALANCE_PATTERN = {
@@ -202,7 +224,7 @@ def get_balance_json(subscribe=0, req_id=0):
     req['subscribe'] = subscribe
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 LOGIN_HISTORY_PATTERN = {
@@ -216,7 +238,7 @@ def get_login_history_json(limit=25, req_id=0):
     req['limit'] = limit
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 # BUY, SELL, DEPOSIT, WITHDRAWAL
@@ -234,7 +256,7 @@ def get_statement_json(limit=10, offset=0, date_from=0, date_to=0, req_id=0):
     req = STATEMENT_PATTERN.copy()
     req['limit'] = limit
     req['offset'] = offset
-    if date_from == 0 or date_to == 0:
+    if date_from == 0 or date_to == 0 or date_from is None or date_to is None:
         req.pop('date_from')
         req.pop('date_to')
     else:
@@ -242,7 +264,7 @@ def get_statement_json(limit=10, offset=0, date_from=0, date_to=0, req_id=0):
         req['date_to'] = date_to
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 # CURRENT OPTIONS
@@ -255,7 +277,7 @@ def get_portfolio_json(req_id=0):
     req = PORTFOLIO_PATTERN.copy()
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 CONTRACT_PROPOSAL_PATTERN = {
@@ -265,14 +287,20 @@ CONTRACT_PROPOSAL_PATTERN = {
     "req_id": 0
 }
 
-def get_contract_proposal_json(contract_id, subscribe=1, req_id=0):
+def get_contract_proposal_json(contract_id=None, subscribe=1, req_id=0):
+    '''
+    :param contract_id: None to stream all opened contracts of account
+    '''
     req = CONTRACT_PROPOSAL_PATTERN.copy()
-    req['contract_id'] = contract_id
+    if contract_id is None:
+        req.pop('contract_id')
+    else:
+        req['contract_id'] = contract_id
     if subscribe!=1:
         req.pop('subscribe')
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 PROFIT_TABLE_PATTERN = {
@@ -297,7 +325,7 @@ def get_profit_table_json(limit=25, offset=0, date_from=0, date_to=0, req_id=0):
         req['date_to'] = date_to
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 SELL_CONTRACT_PATTERN = {
@@ -312,7 +340,7 @@ def get_sell_contract_json(contract_id, price=0, req_id=0):
     req['price'] = price # 0 - sell now
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
 
 
 BUY_CONTRACT_PATTERN = {
@@ -331,4 +359,43 @@ def get_buy_contract_json(proposal_id, price=1, proposal_parameters=None, req_id
 
     req['req_id'] = req_id
 
-    return json.dumps(req)
+    return codec.dumps(req)
+
+
+BUY_MULTIPLE_ACCOUNTS_PATTERN = {
+    "buy_contract_for_multiple_accounts": "proposal_ID",
+    "price": 100,
+    "tokens": [],
+    "req_id": 0
+}
+
+def get_buy_multiple_accounts_json(tokens, proposal_id, price=1, proposal_parameters=None, req_id=0):
+    req = BUY_MULTIPLE_ACCOUNTS_PATTERN.copy()
+    req['buy_contract_for_multiple_accounts'] = proposal_id
+    req['price'] = price
+    req['tokens'] = list(tokens)
+
+    if proposal_id == 1:
+        req['parameters'] = proposal_parameters
+
+    req['req_id'] = req_id
+
+    return codec.dumps(req)
+
+
+def get_buy_contract_prefix(proposal_id, price=1):
+    '''
+    Returns buy request serialized without req_id.
+    Allows to prepare buy request beforehand and only append req_id when buying
+    :return: str
+    '''
+    req = BUY_CONTRACT_PATTERN.copy()
+    req['buy'] = proposal_id
+    req['price'] = price
+    req.pop('req_id')
+
+    return codec.dumps(req)[:-1] + ',"req_id":'
+
+def complete_prepared_request(prefix, req_id=0):
+
+    return prefix + str(req_id) + '}'
@@ -0,0 +1,52 @@
+'''
+    JSON codec used for all the WebSocket traffic:
+    requests built in _binary_general and responses parsed in on_app_msg.
+
+    The fastest available backend is chosen at import time:
+        orjson -> ujson -> json (standard library)
+
+    Install orjson or ujson to speed up clients, nothing else has to be changed.
+
+    dumps always returns str: Binary.com expects text frames.
+'''
+
+import json
+
+
+def _get_json_backend():
+    return json.loads, lambda obj: json.dumps(obj, separators=(',', ':'))
+
+def _get_ujson_backend():
+    import ujson
+    return ujson.loads, ujson.dumps
+
+def _get_orjson_backend():
+    import orjson
+    return orjson.loads, lambda obj: orjson.dumps(obj).decode('utf-8')
+
+# from the fastest to the slowest
+BACKENDS = [
+    ('orjson', _get_orjson_backend),
+    ('ujson', _get_ujson_backend),
+    ('json', _get_json_backend)
+]
+
+
+def get_available_backends():
+    '''
+    Returns backends which can be imported
+    :return: list of tuple(name, loads, dumps)
+    '''
+
+    available = []
+    for name, get_backend in BACKENDS:
+        try:
+            loads_, dumps_ = get_backend()
+        except ImportError:
+            continue
+        available.append((name, loads_, dumps_))
+
+    return available
+
+
+BACKEND, loads, dumps = get_available_backends()[0]
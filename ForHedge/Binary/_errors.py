@@ -0,0 +1,40 @@
+'''
+    Errors raised by Binary.com clients instead of waiting forever.
+'''
+
+
+class ConnectionLostError(ConnectionError):
+    '''
+        Request could not be completed because connection to Binary.com was lost
+    '''
+    pass
+
+
+class BuyNotConfirmedError(ConnectionLostError):
+    '''
+        Connection to Binary.com was lost while buy (or sell) request was in flight.
+        The contract could be bought. Check portfolio before retrying
+    '''
+    pass
+
+
+class AuthorizationError(Exception):
+    '''
+        Binary.com rejected api token (e.g. it is invalid or expired)
+    '''
+    pass
+
+
+class RequestTimeoutError(TimeoutError):
+    '''
+        Response did not come before deadline. Request is forgotten:
+        its response (if it comes later) is dropped
+    '''
+    pass
+
+
+class RequestCancelledError(Exception):
+    '''
+        Request was cancelled by RequestHandle.cancel() while somebody waited for it
+    '''
+    pass
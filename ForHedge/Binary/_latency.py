@@ -0,0 +1,202 @@
+'''
+    Round-trip time monitor of Binary and BinaryAccount connection.
+
+    Sends 'ping' request every interval seconds and keeps RTT of the last
+    window pings. Connection is degraded if p90 of RTT is above degraded_rtt
+    or the last ping got no response in ping_timeout.
+
+    Time spent by receiving thread on each message is kept too:
+    if hedge is slow while RTT is fine, the time is lost in our own process.
+'''
+
+from Binary._errors import ConnectionLostError, RequestTimeoutError, RequestCancelledError
+from threading import Thread, Lock, Event
+from collections import deque
+import logging
+import sys
+import traceback
+import time
+
+
+# upper bounds of histogram buckets in seconds
+RTT_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float('inf'))
+
+
+def get_percentile(values, percent):
+    '''
+    Returns percentile of sorted values (nearest rank)
+    :param values: sorted list
+    :param percent: 0-100
+    :return: float
+    '''
+
+    if len(values) == 0:
+        return 0.0
+
+    rank = max(int(round(percent / 100 * len(values))) - 1, 0)
+
+    return values[min(rank, len(values) - 1)]
+
+
+class LatencyMonitor:
+    '''
+        Pings connection of given client in background thread.
+
+        Statistics:
+            - pings / timeouts
+            - rtt_last, rtt_p50, rtt_p90, rtt_p99, rtt_max - seconds over the window
+            - processing_p50, processing_p99, processing_max - seconds spent by
+              receiving thread on one message over the last window messages
+            - degraded
+    '''
+
+    def __init__(self, client, interval=5, window=120, degraded_rtt=0.5, ping_timeout=5):
+
+        self.client = client
+        self.interval = interval
+        self.degraded_rtt = degraded_rtt
+        self.ping_timeout = ping_timeout
+
+        self.rtt = deque(maxlen=window)
+        self.processing = deque(maxlen=window)
+
+        self.pings = 0
+        self.timeouts = 0
+        self.last_timed_out = False
+        self.degraded = False
+
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+
+    def start(self):
+        '''
+        Starts pinging in background
+        :return: None
+        '''
+
+        with self.lock:
+            if not self.thread is None:
+                return
+            self.thread = Thread(target=self.run, daemon=True)
+
+        self.thread.start()
+
+    def stop(self):
+
+        self.stopped.set()
+
+    def run(self):
+
+        while not self.stopped.wait(self.interval):
+            if not self.client.ready:
+                continue
+
+            try:
+                self.ping()
+            except:
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def ping(self):
+        '''
+        Sends one ping and records its RTT
+        :return: RTT in seconds or None if there is no response
+        '''
+
+        start = time.perf_counter()
+        try:
+            self.client.request_ping().result(self.ping_timeout)
+        except RequestTimeoutError:
+            self.add_rtt(None)
+            return None
+        except (ConnectionLostError, RequestCancelledError):
+            # connection is lost - it is counted by reconnection statistics
+            return None
+
+        rtt = time.perf_counter() - start
+        self.add_rtt(rtt)
+
+        return rtt
+
+    def add_rtt(self, rtt):
+        '''
+        Records ping result and checks if connection is degraded
+        :param rtt: seconds or None if ping timed out
+        :return: None
+        '''
+
+        with self.lock:
+            self.pings += 1
+            self.last_timed_out = rtt is None
+
+            if rtt is None:
+                self.timeouts += 1
+            else:
+                self.rtt.append(rtt)
+
+            was_degraded = self.degraded
+            self.degraded = self.last_timed_out or \
+                            get_percentile(sorted(self.rtt), 90) > self.degraded_rtt
+
+        if self.degraded != was_degraded:
+            if self.degraded:
+                logging.warning('Connection to Binary.com is degraded: ' + str(self.get_stats()))
+            else:
+                logging.warning('Connection to Binary.com is restored')
+
+    def add_processing(self, elapsed):
+        '''
+        Records time spent by receiving thread on one message.
+        Called by receiving thread without lock (deque append is atomic)
+        :param elapsed: seconds
+        :return: None
+        '''
+
+        self.processing.append(elapsed)
+
+    def is_degraded(self):
+        return self.degraded
+
+    def get_histogram(self):
+        '''
+        Returns number of pings in the window by RTT buckets
+        :return: list of tuple(upper bound in seconds, count)
+        '''
+
+        with self.lock:
+            rtt = list(self.rtt)
+
+        counts = [0] * len(RTT_BUCKETS)
+        for value in rtt:
+            for i, bound in enumerate(RTT_BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+
+        return list(zip(RTT_BUCKETS, counts))
+
+    def get_stats(self):
+        '''
+        Returns RTT statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        with self.lock:
+            rtt = sorted(self.rtt)
+            processing = sorted(self.processing)
+
+            return {
+                'pings' : self.pings,
+                'timeouts' : self.timeouts,
+                'rtt_last' : self.rtt[-1] if len(self.rtt) > 0 else 0.0,
+                'rtt_p50' : get_percentile(rtt, 50),
+                'rtt_p90' : get_percentile(rtt, 90),
+                'rtt_p99' : get_percentile(rtt, 99),
+                'rtt_max' : rtt[-1] if len(rtt) > 0 else 0.0,
+                'processing_p50' : get_percentile(processing, 50),
+                'processing_p99' : get_percentile(processing, 99),
+                'processing_max' : processing[-1] if len(processing) > 0 else 0.0,
+                'degraded' : self.degraded
+            }
@@ -1,5 +1,96 @@
 
-from threading import Thread, Lock, Event
+from threading import Thread, Lock, Event, local
+from collections import OrderedDict
+from Binary._subscription import Subscription
+from Binary._pipeline import Pipeline, RequestHandle
+from Binary._reconnect import ReconnectManager
+from Binary._latency import LatencyMonitor
+from Binary._scheduler import SendScheduler
+from Binary._errors import ConnectionLostError, RequestTimeoutError, RequestCancelledError
+import Binary._binary_general as bin_api
+import itertools
+import time
+
+
+class PendingRequest:
+    '''
+        One request waiting for its response.
+
+        Created by MultiThreadWSHelper.register_request with unique req_id
+        and resolved by the receiving thread when response with this req_id comes.
+        Subscription requests stay registered: the first response resolves request,
+        the next ones are pushed into subscription.
+
+        Requests sent by send_registered keep their text, so they can be sent again
+        after reconnection if they are idempotent (see _reconnect).
+    '''
+
+    def __init__(self, client, req_id, subscription=None, push_first=False, idempotent=True):
+
+        self.client = client
+        self.req_id = req_id
+        self.subscription = subscription
+        self.push_first = push_first
+        self.idempotent = idempotent
+        self.request = None
+        self.response = None
+        self.error = None
+        self.event = Event()
+
+        # connection the request was sent by, None if it is not sent yet
+        self.generation = None
+
+        # function called with this request when response comes
+        self.on_resolved = None
+
+    def wait(self, timeout=None):
+        '''
+        Waits for response.
+        If timeout expires, request is forgotten and RequestTimeoutError is raised
+        :param timeout: seconds or None to wait client.default_timeout
+        :return: dict
+        '''
+
+        if timeout is None:
+            timeout = self.client.default_timeout
+
+        if not self.event.wait(timeout):
+            self.cancel(RequestTimeoutError('No response to request {} in {} seconds'.format(self.req_id, timeout)))
+
+        if not self.error is None:
+            raise self.error
+
+        return self.response
+
+    def cancel(self, error=None):
+        '''
+        Forgets request. Threads waiting for it get given error
+        :param error: exception, RequestCancelledError by default
+        :return: None
+        '''
+
+        self.client.forget_request(self.req_id)
+
+        if not self.event.is_set():
+            self.fail(RequestCancelledError('Request {} is cancelled'.format(self.req_id))
+                        if error is None else error)
+
+    def fail(self, error):
+        '''
+        Wakes up waiting thread with error
+        :param error: ConnectionLostError
+        :return: None
+        '''
+
+        self.error = error
+        self.event.set()
+
+        if not self.on_resolved is None:
+            self.on_resolved(self)
+
+
+# numbers clients of the process
+CHANNEL_NUMBERS = itertools.count(1)
 
 
 class MultiThreadWSHelper:
@@ -7,117 +98,415 @@ class MultiThreadWSHelper:
         This class helps to manage shared variables between a lot of threads.
         It helps to send, receive and identify requests and responses.
 
+        Each request is one PendingRequest in self.pending.
+        Request id counter, pending table and store of unclaimed responses
+        are guarded by one lock, so request and its response cost
+        one acquire on each side.
+
+        Responses nobody waits for are kept in the store and evicted
+        after response_ttl seconds or when there are more than
+        max_responses of them (oldest first).
+
+        Blocking calls wait for response not longer than given timeout
+        or default_timeout seconds (None to wait forever)
+        and raise RequestTimeoutError after that.
     '''
-    def __init__(self):
+    def __init__(self, max_responses=1000, response_ttl=300, default_timeout=30):
 
+        # use to identify requests
+        self.request_id = 0
 
         '''
-            save responses in dictionary, where
             key - request id
-            value - response
+            value - PendingRequest
         '''
-        self.responses = dict()
-
-        # use to identify requests
-        self.request_id = 0
+        self.pending = dict()
 
         '''
-            Uses to wait for specified response
+            responses nobody waits for, where
             key - request id
-            value - Event object
+            value - tuple(response, receive time)
+            the oldest response is the first one
         '''
-        self.events = dict()
+        self.responses = OrderedDict()
+
+        self.max_responses = max_responses
+        self.response_ttl = response_ttl
 
-        # use to share 'responses' and 'request_id' and 'events' between threads
-        self.lock_get_next_req_id = Lock()
-        self.lock_responses_operations = Lock()
-        self.lock_events = Lock()
+        # statistics of response store
+        self.delivered_count = 0
+        self.evicted_by_ttl = 0
+        self.evicted_by_size = 0
+        self.last_sweep = time.monotonic()
+
+        # use to share 'request_id', 'pending' and 'responses' between threads
+        self.lock = Lock()
         self.ws_lock = Lock()
 
+        # pipeline opened by current thread
+        self.pipeline_local = local()
+
+        self.default_timeout = default_timeout
+
+        # set while connection is opened (and authorized) and requests can be sent
+        self.ready_event = Event()
+        # request is sent either by its thread or by replay on ready connection, not by both
+        self.ready_lock = Lock()
+        self.reconnector = ReconnectManager(self)
+        self.latency = LatencyMonitor(self)
+
+        # requests are sent by client's send_frames according to Binary.com limits
+        self.scheduler = SendScheduler(lambda requests: self.send_frames(requests))
 
-    def get_next_req_id(self):
+        # name of client in traffic log (see traffic_recorder)
+        self.channel = '{}-{}'.format(type(self).__name__, next(CHANNEL_NUMBERS))
+
+    @property
+    def ready(self):
+        return self.ready_event.is_set()
+
+    @ready.setter
+    def ready(self, value):
+        if value:
+            self.ready_event.set()
+        else:
+            self.ready_event.clear()
+
+    def wait_ready(self, timeout=None):
         '''
-        Generates unique request id
-        :return: int
+        Waits until connection is opened (and authorized)
+        :param timeout: seconds or None to wait default_timeout
+        :return: True if connection is ready
         '''
 
-        with self.lock_get_next_req_id:
-            id_to_return  = self.request_id
-            self.request_id+=1
+        return self.ready_event.wait(self.default_timeout if timeout is None else timeout)
+
+    def get_scheduler_stats(self):
+        '''
+        Returns statistics of send scheduler (see _scheduler.SendScheduler)
+        :return: dict
+        '''
 
-        return id_to_return
+        return self.scheduler.get_stats()
 
-    def in_response(self, id):
+    def get_latency_stats(self):
         '''
-        Checks if specified request is already have been processed
-        :param id:
-        :return: bool
+        Returns round-trip time statistics (see _latency.LatencyMonitor)
+        :return: dict
+        '''
+
+        return self.latency.get_stats()
+
+    def request_ping(self):
+        '''
+        Sends ping request without waiting
+        :return: RequestHandle giving raw response
         '''
 
-        with self.lock_responses_operations:
-            value = id in self.responses
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_ping_json(req_id=pending.req_id))
 
-        return value
+        return RequestHandle(pending)
 
-    def add_response(self, response):
+    def get_reconnect_stats(self):
         '''
-        Adds response to response dict
-        :param response: dict
+        Returns statistics of reconnections (see _reconnect.ReconnectManager)
+        :return: dict
+        '''
+
+        return self.reconnector.get_stats()
+
+    def pipeline(self):
+        '''
+        Returns Pipeline to send many requests back-to-back
+        :return: Pipeline
+        '''
+
+        return Pipeline(self)
+
+    def buffer_request(self, request):
+        '''
+        Buffers request if current thread opened pipeline
+        :param request: str
+        :return: True if request is buffered
+        '''
+
+        pipeline = getattr(self.pipeline_local, 'pipeline', None)
+        if pipeline is None:
+            return False
+
+        pipeline.buffer(request)
+        return True
+
+    def register_request(self, idempotent=True):
+        '''
+        Creates pending request with unique id
+        :param idempotent: False for requests which can not be sent twice (buy, sell)
+        :return: PendingRequest
+        '''
+
+        with self.lock:
+            pending = PendingRequest(self, self.request_id, idempotent=idempotent)
+            self.pending[self.request_id] = pending
+            self.request_id += 1
+
+        return pending
+
+    def register_subscription(self, parser=None, mode=Subscription.EVERY_UPDATE,
+                              maxsize=100, listener=None, push_first=False):
+        '''
+        Creates pending request which stays registered
+        and pushes updates into Subscription
+        :param push_first: push the first response into subscription too
+        :param parser: function to convert each update
+        :param mode: Subscription.EVERY_UPDATE or Subscription.LATEST_ONLY
+        :param maxsize: queue size for EVERY_UPDATE mode
+        :param listener: function called with subscription after each update
+        :return: PendingRequest
+        '''
+
+        with self.lock:
+            subscription = Subscription(self, self.request_id, parser=parser, mode=mode,
+                                        maxsize=maxsize, listener=listener)
+            pending = PendingRequest(self, self.request_id, subscription, push_first)
+            self.pending[self.request_id] = pending
+            self.request_id += 1
+
+        return pending
+
+    def subscribe(self, build_request, parser=None, mode=Subscription.EVERY_UPDATE,
+                  maxsize=100, listener=None, push_first=True, timeout=None, **params):
+        '''
+        Sends subscribe request and waits for the first response.
+        If Binary.com rejects subscription, returned subscription
+        is already closed and has error message in 'error' attribute
+        :param build_request: function from _binary_general which takes req_id
+        :param timeout: seconds to wait for the first response
+        :param params: parameters of build_request
+        Other parameters are described in register_subscription
+        :return: tuple(first response, Subscription)
+        '''
+
+        pending = self.register_subscription(parser=parser, mode=mode, maxsize=maxsize,
+                                             listener=listener, push_first=push_first)
+
+        self.send_registered(pending, build_request(req_id=pending.req_id, **params))
+
+        # rejected subscription is failed and forgotten by resolve_response
+        response = pending.wait(timeout)
+
+        return response, pending.subscription
+
+    def send_registered(self, pending, request):
+        '''
+        Sends request of given pending request and keeps its text.
+        While connection is not ready, idempotent request is only kept:
+        it is sent when connection is ready (see _reconnect.ReconnectManager.on_ready)
+        and the other ones are failed at once
+        :param pending: PendingRequest
+        :param request: str
         :return: None
         '''
 
-        with self.lock_responses_operations:
-            self.responses[response['req_id']] = response
+        pending.request = request
+
+        with self.ready_lock:
+            if self.ready:
+                generation = self.reconnector.generation
+                try:
+                    self.send_request(request)
+                    pending.generation = generation
+                    return
+                except:
+                    if not self.reconnect:
+                        self.forget_request(pending.req_id)
+                        raise
 
-    def get_response(self, id):
+        if not pending.idempotent:
+            self.forget_request(pending.req_id)
+            raise ConnectionLostError('Connection to Binary.com is not ready')
+
+    def send_prepared_request(self, prefix, parser=None, idempotent=False):
         '''
-        Returns specified response
-        :param id: int
-        :return: dict
+        Sends request serialized beforehand without req_id
+        (see _binary_general.get_buy_contract_prefix)
+        :param prefix: str
+        :param parser: function to convert response
+        :param idempotent: prepared requests are buys by default
+        :return: RequestHandle
         '''
 
-        self.lock_responses_operations.acquire()
-        value = self.responses[id]
-        self.lock_responses_operations.release()
-        return value
+        pending = self.register_request(idempotent)
+        self.send_registered(pending, bin_api.complete_prepared_request(prefix, pending.req_id))
+
+        return RequestHandle(pending, parser)
 
-    def add_event(self, id, event):
+    def forget_request(self, id):
         '''
-        Adds events to self.events
+        Removes pending request (subscription) by id
         :param id: int
         :return: None
         '''
-        with self.lock_events:
-            self.events[id] = event
 
-    def remove_event(self, id):
+        with self.lock:
+            pending = self.pending.pop(id, None)
+
+        if not pending is None and not pending.subscription is None:
+            pending.subscription.finish()
+
+    def is_pending(self, id):
         '''
-        Removes event from events by id
+        Checks if request (subscription) is still registered
         :param id: int
-        :return:
+        :return: bool
         '''
 
-        with self.lock_events:
-            self.events.pop(id)
+        return id in self.pending
 
-    def set_event(self, id):
+    def pop_pending(self, keep):
         '''
-        Notify that specified event is finished -> response has been taken
-        :param id: int
-        :return:
+        Removes pending requests which should not be kept
+        :param keep: function which takes PendingRequest and returns bool
+        :return: list of removed PendingRequest
         '''
 
-        with self.lock_events:
-            self.events[id].set()
+        with self.lock:
+            removed = [pending for pending in self.pending.values() if not keep(pending)]
+            for pending in removed:
+                self.pending.pop(pending.req_id)
 
-    def in_events(self, id):
+        return removed
+
+    def get_replayable(self, generation):
         '''
-        Check if id is in event
-        :param id: int
-        :return:
+        Returns idempotent requests and alive subscriptions
+        which were not sent by connection of given generation
+        :param generation: int
+        :return: list of PendingRequest
+        '''
+
+        with self.lock:
+            return [pending for pending in self.pending.values()
+                        if not pending.request is None and pending.idempotent and
+                           (pending.generation is None or pending.generation < generation) and
+                           (pending.subscription is None or not pending.subscription.closed)]
+
+    def resolve_response(self, response):
+        '''
+        Hands response to its pending request.
+        Response nobody waits for is put into the store.
+        :param response: dict
+        :return: None
+        '''
+
+        id_ = response.get('req_id')
+        now = time.monotonic()
+
+        with self.lock:
+            pending = self.pending.get(id_)
+
+            if pending is None:
+                self.add_response(id_, response, now)
+                return
+
+            subscription = pending.subscription
+            first = not pending.event.is_set()
+
+            if subscription is None:
+                self.pending.pop(id_)
+            elif first and 'error' in response:
+                # rejected subscription
+                self.pending.pop(id_)
+                subscription.fail(response)
+                subscription = None
+            elif first and not pending.push_first:
+                subscription = None
+
+            if first:
+                pending.response = response
+            self.delivered_count += 1
+
+        if not subscription is None:
+            subscription.push(response)
+        elif first and not pending.subscription is None and 'subscription' in response:
+            pending.subscription.subscription_id = response['subscription']['id']
+
+        if first:
+            pending.event.set()
+
+            if not pending.on_resolved is None:
+                pending.on_resolved(pending)
+
+    def add_response(self, id, response, now):
+        '''
+        Adds unclaimed response to the store.
+        Have to be called under self.lock
+        :return: None
+        '''
+
+        self.responses.pop(id, None)
+        self.responses[id] = (response, now)
+
+        self.sweep_responses(now)
+
+    def sweep_responses(self, now):
+        '''
+        Evicts expired responses and the oldest ones above the limit.
+        Have to be called under self.lock
+        :param now: monotonic time
+        :return: None
+        '''
+
+        # expired responses are the first ones. check them not too often
+        if now - self.last_sweep > 1:
+            self.last_sweep = now
+
+            while len(self.responses) > 0:
+                id_, (response, received) = next(iter(self.responses.items()))
+                if now - received < self.response_ttl:
+                    break
+
+                self.responses.popitem(last=False)
+                self.evicted_by_ttl += 1
+
+        while len(self.responses) > self.max_responses:
+            self.responses.popitem(last=False)
+            self.evicted_by_size += 1
+
+    def get_store_stats(self):
+        '''
+        Returns statistics of response store as dict
+        Keys:
+            - responses - resident unclaimed responses
+            - pending - registered requests and subscriptions
+            - delivered
+            - evicted_by_ttl
+            - evicted_by_size
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'responses' : len(self.responses),
+                'pending' : len(self.pending),
+                'delivered' : self.delivered_count,
+                'evicted_by_ttl' : self.evicted_by_ttl,
+                'evicted_by_size' : self.evicted_by_size
+            }
+
+    def clear_responses(self):
+        '''
+        Drops all stored responses and pending requests
+        :return: None
         '''
 
-        with self.lock_events:
-            value = id in self.events
+        with self.lock:
+            self.responses.clear()
+            pending, self.pending = self.pending, dict()
 
-        return value
+        # wake up waiting threads and consumers of subscriptions
+        for request in pending.values():
+            if not request.subscription is None:
+                request.subscription.finish()
+            elif not request.event.is_set():
+                request.fail(ConnectionLostError('Connection to Binary.com is closed'))
@@ -0,0 +1,189 @@
+from Binary._errors import RequestTimeoutError
+from queue import Queue, Empty
+import time
+
+
+class RequestHandle:
+    '''
+        Request which has been sent, but its response may not have come yet.
+        Returned by request_* methods of Binary and BinaryAccount:
+
+            handle = binary.request_price_proposal(asset='R_100')
+            ...
+            proposal = handle.result(timeout=5)
+
+        Request which is not needed anymore can be cancelled:
+        its waiters get RequestCancelledError and its response is dropped.
+    '''
+
+    def __init__(self, pending, parser=None):
+
+        self.pending = pending
+        self.parser = parser
+
+    @property
+    def req_id(self):
+        return self.pending.req_id
+
+    def done(self):
+        '''
+        :return: True if response has come
+        '''
+        return self.pending.event.is_set()
+
+    def result(self, timeout=None):
+        '''
+        Waits for response and returns it converted by parser.
+        Raises RequestTimeoutError if timeout expires (request is forgotten)
+        :param timeout: seconds or None to wait client.default_timeout
+        :return: result of parser
+        '''
+
+        response = self.pending.wait(timeout)
+
+        return response if self.parser is None else self.parser(response)
+
+    def cancel(self):
+        '''
+        Stops waiting for response
+        :return: None
+        '''
+
+        self.pending.cancel()
+
+
+class HandleSet:
+    '''
+        Set of sent requests which can be gathered or iterated as replies arrive
+    '''
+
+    def __init__(self, handles=None):
+
+        self.handles = [] if handles is None else list(handles)
+
+    def add(self, handle):
+        '''
+        Adds handle to the set
+        :param handle: RequestHandle
+        :return: the same handle
+        '''
+        self.handles.append(handle)
+        return handle
+
+    def __len__(self):
+        return len(self.handles)
+
+    def gather(self, timeout=None):
+        '''
+        Waits for all responses.
+        Raises RequestTimeoutError if timeout expires, the rest requests are cancelled
+        :param timeout: seconds for all the requests or None to wait client.default_timeout for each one
+        :return: list of results in order of adding
+        '''
+
+        if timeout is None:
+            return [handle.result() for handle in self.handles]
+
+        deadline = time.monotonic() + timeout
+        results = []
+        try:
+            for handle in self.handles:
+                # not less than 0 to not wait for default timeout
+                results.append(handle.result(max(deadline - time.monotonic(), 0.0)))
+        except RequestTimeoutError:
+            self.cancel()
+            raise
+
+        return results
+
+    def cancel(self):
+        '''
+        Cancels all requests which are not completed
+        :return: None
+        '''
+
+        for handle in self.handles:
+            if not handle.done():
+                handle.cancel()
+
+    def as_completed(self, timeout=None):
+        '''
+        Yields handles in order of responses arrival.
+        Failed and cancelled requests are yielded too, their result() raises.
+        Raises RequestTimeoutError if timeout expires
+        :param timeout: seconds for all the requests or None to wait forever
+        :return: generator of RequestHandle
+        '''
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        completed = Queue()
+        for handle in self.handles:
+            handle.pending.on_resolved = completed.put
+            # response could come before listener was set
+            if handle.done():
+                completed.put(handle.pending)
+
+        by_pending = {id(handle.pending) : handle for handle in self.handles}
+        yielded = set()
+
+        while len(yielded) < len(self.handles):
+            try:
+                pending = completed.get(timeout=None if deadline is None
+                                                else max(deadline - time.monotonic(), 0.0))
+            except Empty:
+                raise RequestTimeoutError('{} of {} requests are not completed in {} seconds'.format(
+                    len(self.handles) - len(yielded), len(self.handles), timeout))
+
+            if id(pending) in yielded:
+                continue
+
+            yielded.add(id(pending))
+            yield by_pending[id(pending)]
+
+
+class Pipeline(HandleSet):
+    '''
+        Sends all requests made inside 'with' block back-to-back
+        in one socket write sequence:
+
+            with binary.pipeline() as pipeline:
+                pipeline.add(binary.request_price_proposal(type='CALL'))
+                pipeline.add(binary.request_price_proposal(type='PUT'))
+
+            call, put = pipeline.gather()
+
+        Requests are buffered only for the thread which opened pipeline.
+        Use only request_* methods inside the block:
+        get_* methods wait for response which is not sent yet.
+    '''
+
+    def __init__(self, client):
+
+        super().__init__()
+
+        self.client = client
+        self.requests = []
+
+    def __enter__(self):
+
+        self.client.pipeline_local.pipeline = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        self.client.pipeline_local.pipeline = None
+        self.flush()
+
+    def buffer(self, request):
+        self.requests.append(request)
+
+    def flush(self):
+        '''
+        Sends buffered requests
+        :return: None
+        '''
+
+        requests, self.requests = self.requests, []
+        if len(requests) > 0:
+            self.client.send_requests(requests)
@@ -0,0 +1,263 @@
+'''
+    Reconnection of Binary and BinaryAccount.
+
+    Each client has one connection thread driven by ReconnectManager:
+    it runs WebSocketApp and, when connection closes, opens new one
+    after jittered exponential backoff. There is no new thread per reconnection.
+
+    While connection is down:
+        - non-idempotent requests in flight (buy, sell) are failed at once
+          with BuyNotConfirmedError: Binary.com could execute them or not
+        - idempotent requests (reads) and subscriptions wait for reconnection
+
+    If connection is ready again within grace_period (authorized for BinaryAccount),
+    waiting reads are sent again and subscriptions are re-issued
+    with the same req_id, so their consumers keep reading the same Subscription.
+    Otherwise they are failed with ConnectionLostError and subscriptions are finished.
+'''
+
+from Binary._errors import ConnectionLostError, BuyNotConfirmedError
+from threading import Thread, Lock, Event
+import random
+import time
+import logging
+import sys
+import traceback
+
+
+class ReconnectManager:
+    '''
+        Keeps connection of given client (Binary or BinaryAccount).
+
+        Client provides:
+            - create_app() - returns new WebSocketApp
+            - app, ready, reconnect attributes
+            - pending requests of MultiThreadWSHelper
+
+        Statistics:
+            - reconnects - connections restored after loss
+            - attempts - connection attempts after loss
+            - recovery_last / recovery_avg / recovery_max - time to recover in seconds
+            - replayed_subscriptions / retried_requests
+            - failed_in_flight - non-idempotent requests failed by connection loss
+            - lost_requests / lost_subscriptions - failed after grace period
+    '''
+
+    def __init__(self, client, base_delay=0.5, max_delay=30, grace_period=30):
+
+        self.client = client
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.grace_period = grace_period
+
+        self.thread = None
+        self.stopped = Event()
+        self.lock = Lock()
+
+        # monotonic time when connection was lost, None if connection is up
+        self.lost_at = None
+        self.attempt = 0
+
+        # increased on each ready connection, see PendingRequest.generation
+        self.generation = 0
+
+        self.reconnects = 0
+        self.attempts = 0
+        self.recovery_last = 0.0
+        self.recovery_total = 0.0
+        self.recovery_max = 0.0
+        self.replayed_subscriptions = 0
+        self.retried_requests = 0
+        self.failed_in_flight = 0
+        self.lost_requests = 0
+        self.lost_subscriptions = 0
+
+    def start(self):
+        '''
+        Starts connection thread
+        :return: None
+        '''
+
+        with self.lock:
+            if not self.thread is None:
+                return
+            self.thread = Thread(target=self.run, daemon=True)
+
+        self.thread.start()
+
+    def stop(self):
+        '''
+        Stops reconnecting. Connection itself is closed by client
+        :return: None
+        '''
+
+        self.stopped.set()
+
+    def run(self):
+
+        while True:
+            try:
+                self.client.app.run_forever()
+            except:
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+            self.client.ready = False
+
+            if not self.client.reconnect or self.stopped.is_set():
+                return
+
+            self.on_connection_lost()
+
+            if self.stopped.wait(self.get_delay()):
+                return
+
+            self.check_grace_period()
+
+            with self.lock:
+                self.attempt += 1
+                self.attempts += 1
+
+            self.client.app = self.client.create_app()
+
+    def get_delay(self):
+        '''
+        Returns jittered exponential backoff for current attempt
+        :return: seconds
+        '''
+
+        delay = min(self.max_delay, self.base_delay * 2 ** min(self.attempt, 16))
+
+        return random.uniform(delay / 2, delay)
+
+    def on_connection_lost(self):
+        '''
+        Fails non-idempotent requests in flight and requests which can not be sent again
+        :return: None
+        '''
+
+        with self.lock:
+            if self.lost_at is None:
+                self.lost_at = time.monotonic()
+
+        # queued requests of lost connection must not be sent by the next one
+        self.client.scheduler.clear()
+
+        # request without recorded text (authorize, forget) can not be sent again
+        for pending in self.client.pop_pending(lambda p: not p.request is None and p.idempotent):
+            if pending.request is None:
+                pending.fail(ConnectionLostError('Connection to Binary.com was lost'))
+            else:
+                pending.fail(BuyNotConfirmedError('Connection to Binary.com was lost while request '
+                                                  '{} was in flight'.format(pending.req_id)))
+                with self.lock:
+                    self.failed_in_flight += 1
+
+    def check_grace_period(self):
+        '''
+        Fails waiting requests and subscriptions if connection is down too long
+        :return: True if grace period expired
+        '''
+
+        with self.lock:
+            expired = not self.lost_at is None and \
+                      time.monotonic() - self.lost_at > self.grace_period
+
+        if not expired:
+            return False
+
+        requests = 0
+        subscriptions = 0
+        for pending in self.client.pop_pending(lambda p: False):
+            if pending.subscription is None:
+                pending.fail(ConnectionLostError('Connection to Binary.com was not restored '
+                                                 'in {} seconds'.format(self.grace_period)))
+                requests += 1
+            else:
+                pending.subscription.finish()
+                subscriptions += 1
+
+        with self.lock:
+            self.lost_requests += requests
+            self.lost_subscriptions += subscriptions
+
+        return True
+
+    def on_ready(self):
+        '''
+        Called by client when connection is opened (and authorized).
+        Sends again waiting requests and re-issues subscriptions
+        :return: None
+        '''
+
+        with self.lock:
+            lost_at = self.lost_at
+            self.generation += 1
+            generation = self.generation
+
+        # connection could be restored after grace period
+        if not lost_at is None:
+            self.check_grace_period()
+
+        requests = []
+        replayed = 0
+        retried = 0
+
+        # requests registered by other threads meanwhile wait for ready_lock:
+        # they are either in the snapshot or sent by themselves after it
+        with self.client.ready_lock:
+            for pending in self.client.get_replayable(generation):
+                if not pending.subscription is None and pending.event.is_set():
+                    pending.subscription.restart()
+                    pending.event.clear()
+                    replayed += 1
+                else:
+                    retried += 1
+
+                pending.generation = generation
+                requests.append(pending.request)
+
+            if len(requests) > 0:
+                try:
+                    self.client.send_requests(requests)
+                except:
+                    # connection is lost again. requests are still pending
+                    ex_type, ex_val, ex_tb = sys.exc_info()
+                    logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+            # requests sent by other threads from now are sent by themselves
+            self.client.ready = True
+
+        with self.lock:
+            self.attempt = 0
+            self.lost_at = None
+            self.replayed_subscriptions += replayed
+            self.retried_requests += retried
+
+            if not lost_at is None:
+                recovery = time.monotonic() - lost_at
+                self.reconnects += 1
+                self.recovery_last = recovery
+                self.recovery_total += recovery
+                self.recovery_max = max(self.recovery_max, recovery)
+
+    def get_stats(self):
+        '''
+        Returns reconnection statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'reconnects' : self.reconnects,
+                'attempts' : self.attempts,
+                'recovery_last' : self.recovery_last,
+                'recovery_avg' : self.recovery_total / self.reconnects if self.reconnects else 0.0,
+                'recovery_max' : self.recovery_max,
+                'replayed_subscriptions' : self.replayed_subscriptions,
+                'retried_requests' : self.retried_requests,
+                'failed_in_flight' : self.failed_in_flight,
+                'lost_requests' : self.lost_requests,
+                'lost_subscriptions' : self.lost_subscriptions
+            }
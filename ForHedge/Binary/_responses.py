@@ -0,0 +1,386 @@
+'''
+    Converting Binary.com responses into results returned by clients.
+
+    Shared by synchronous (Binary, BinaryAccount) and
+    asynchronous (AsyncBinary, AsyncBinaryAccount) clients,
+    so both return exactly the same structures.
+'''
+
+from operator import itemgetter
+import numpy as np
+
+
+# record of candle in columnar results
+CANDLE_DTYPE = np.dtype([
+    ('epoch', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8')
+])
+
+
+def parse_history(response):
+    '''
+    Returns list of candles as tuple:
+    tuple = (date, open, high, low, close)
+    :param response: dict
+    :return: list
+    '''
+
+    return [(r['epoch'], r['open'], r['high'], r['low'], r['close'])
+                for r in response['candles']
+        ]
+
+
+def parse_history_columns(response):
+    '''
+    Returns candles as one array per field, without tuple per candle
+    Keys (the same as CANDLE_DTYPE fields):
+        - epoch - int64
+        - open, high, low, close - float64
+    :param response: dict
+    :return: dict of numpy arrays
+    '''
+
+    candles = response['candles']
+
+    return {
+        name : np.fromiter(map(itemgetter(name), candles), CANDLE_DTYPE[name], len(candles))
+        for name in CANDLE_DTYPE.names
+    }
+
+
+def parse_history_array(response):
+    '''
+    Returns candles as numpy structured array of CANDLE_DTYPE
+    :param response: dict
+    :return: numpy array
+    '''
+
+    columns = parse_history_columns(response)
+
+    candles = np.empty(len(columns['epoch']), dtype=CANDLE_DTYPE)
+    for name, column in columns.items():
+        candles[name] = column
+
+    return candles
+
+
+'''
+    key - output of history requests
+    value - parser of response
+'''
+HISTORY_PARSERS = {
+    'tuples' : parse_history,
+    'array' : parse_history_array,
+    'columns' : parse_history_columns
+}
+
+
+def get_history_parser(output):
+    '''
+    :param output: 'tuples', 'array' or 'columns'
+    :return: function
+    '''
+
+    if not output in HISTORY_PARSERS:
+        raise ValueError('Unknown history output: {}'.format(output))
+
+    return HISTORY_PARSERS[output]
+
+
+def parse_ohlc(response):
+    '''
+    Returns streamed candle as tuple:
+    tuple = (date, open, high, low, close)
+    :param response: dict
+    :return: tuple
+    '''
+
+    r = response['ohlc']
+
+    return (int(r['open_time']), float(r['open']), float(r['high']),
+            float(r['low']), float(r['close']))
+
+
+def parse_price_proposal(response):
+    '''
+    Returns price proposal for buying an option as dict
+    Keys:
+        - date_start
+        - proposal_id
+        - description
+        - payout
+        - error
+        - err_msg
+    :param response: dict
+    :return: dict
+    '''
+
+    if 'error' in response:
+        return {
+            'date_start' : '',
+            'proposal_id' : '',
+            'description' : response['error']['message'],
+            'payout' : 0,
+            'error' : True,
+            'err_msg' : response['error']['message']
+        }
+
+    return {
+        'date_start' : response['proposal']['date_start'] if 'date_start' in response['proposal'] else '',
+        'proposal_id' : response['proposal']['id'],
+        'description' : response['proposal']['longcode'],
+        'payout' : response['proposal']['payout'],
+        'error' : False,
+        'err_msg' : ''
+    }
+
+
+def parse_balance(response):
+
+    return response['balance']['balance']
+
+
+def parse_portfolio(response):
+    '''
+    Returns current opened positions as list of dict
+    Keys:
+        - price
+        - payout
+        - contract_id
+        - contract_type
+        - date_start
+        - date_end
+        - description
+        - symbol
+    :param response: dict
+    :return: list
+    '''
+
+    return [{
+        'price' : r['buy_price'],
+        'payout' : r['payout'],
+        'contract_id' : r['contract_id'],
+        'contract_type' : r['contract_type'],
+        'date_start' : r['date_start'],
+        'date_end' : r['expiry_time'],
+        'description' : r['longcode'],
+        'symbol' : r['symbol']
+    } for r in response['portfolio']['contracts']]
+
+
+def parse_login_history(response):
+
+    return [
+        r['environment'] for r in response['login_history']
+    ]
+
+
+def parse_profit_table(response):
+    '''
+    Returns list of dict.
+    Keys:
+        - price
+        - potential_payout
+        - sell_price
+        - contract_id
+        - description
+        - purchase_time
+        - sell_time
+    :param response: dict
+    :return: list
+    '''
+
+    return [{
+        'price' : r['buy_price'],
+        'potential_payout' : r['payout'],
+        'sell_price' : r['sell_price'],
+        'contract_id' : r['contract_id'],
+        'purchase_time' : r['purchase_time'],
+        'sell_time' : r['sell_time'],
+        'description' : r['longcode']
+    } for r in response['profit_table']['transactions']]
+
+
+def parse_statement(response):
+    '''
+    Returns list of dict.
+    Keys:
+        - transaction_id
+        - contract_id (None for deposits and withdrawals)
+        - action - buy, sell, deposit, withdrawal...
+        - amount
+        - balance_after
+        - payout
+        - reference_id
+        - transaction_time
+        - description
+    :param response: dict
+    :return: list
+    '''
+
+    return [{
+        'transaction_id' : r['transaction_id'],
+        'contract_id' : r.get('contract_id'),
+        'action' : r['action_type'],
+        'amount' : r['amount'],
+        'balance_after' : r['balance_after'],
+        'payout' : r.get('payout'),
+        'reference_id' : r.get('reference_id'),
+        'transaction_time' : r['transaction_time'],
+        'description' : r.get('longcode', '')
+    } for r in response['statement']['transactions']]
+
+
+def parse_sell(response):
+    '''
+    Keys:
+        - balance_after
+        - sold_for
+        OR
+        - error : err_msg
+    :param response: dict
+    :return: dict
+    '''
+
+    if not 'error' in response:
+        return {
+            'balance_after' : response['sell']['balance_after'],
+            'sold_for' : response['sell']['sold_for']
+        }
+    else:
+        return {
+            'error' : response['error']['message']
+        }
+
+
+def parse_buy(response):
+    '''
+    Keys:
+        - balance_after
+        - buy_price
+        - contract_id
+        - description
+        - payout
+        - start_time
+        OR
+        - error : err_msg
+    :param response: dict
+    :return: dict
+    '''
+
+    if 'error' in response:
+        return {
+            'error' : response['error']['message']
+        }
+    else:
+        return {
+            'balance_after' : response['buy']['balance_after'],
+            'buy_price' : response['buy']['buy_price'],
+            'contract_id' : response['buy']['contract_id'],
+            'description' : response['buy']['longcode'],
+            'payout' : response['buy']['payout'],
+            'start_time' : response['buy']['start_time']
+        }
+
+
+def parse_buy_multiple(response):
+    '''
+    Returns result of buying for multiple accounts as dict
+    where key is token and value is dict with keys:
+        - buy_price
+        - contract_id
+        - description
+        - payout
+        - start_time
+        OR
+        - error : err_msg
+    If the whole request is rejected, returns dict with only keys:
+        - error : err_msg
+        - code : error code of Binary.com
+    :param response: dict
+    :return: dict
+    '''
+
+    if 'error' in response:
+        return {
+            'error' : response['error']['message'],
+            'code' : response['error'].get('code', '')
+        }
+
+    results = {}
+    for r in response['buy_contract_for_multiple_accounts']['result']:
+        if 'contract_id' in r:
+            results[r['token']] = {
+                'buy_price' : r['buy_price'],
+                'contract_id' : r['contract_id'],
+                'description' : r['longcode'],
+                'payout' : r['payout'],
+                'start_time' : r['start_time']
+            }
+        else:
+            results[r['token']] = {
+                'error' : r['message_to_client'] if 'message_to_client' in r else r.get('code', '')
+            }
+
+    return results
+
+
+def parse_contract_proposal(response):
+    '''
+    Returns information about opened position as dict
+    Keys:
+        - buy_price
+        - current_spot
+        - entry_spot
+        - contract_type
+        - symbol
+        - is_valid_to_sell
+        - profit
+        - profit_percentage
+        - contract_id
+        - description
+        - bid_price - price to sell contract now
+        - payout
+        - is_sold
+    :param response: dict
+    :return: dict
+    '''
+
+    resp = response['proposal_open_contract']
+
+    return {
+        'buy_price' : resp['buy_price'],
+        'current_spot' : resp['current_spot'],
+        'entry_spot' : resp['entry_spot'],
+        'contract_type' : resp['contract_type'],
+        'symbol' : resp['display_name'],
+        'is_valid_to_sell' : resp['is_valid_to_sell'],
+        'profit' : resp['profit'],
+        'profit_percentage' : resp['profit_percentage'],
+        'contract_id' : resp['contract_id'],
+        'description' : resp['longcode'],
+        'bid_price' : resp['bid_price'],
+        'payout' : resp['payout'],
+        'is_sold' : resp['is_sold']
+    }
+
+
+def parse_contract_update(response):
+    '''
+    Returns the same dict as parse_contract_proposal
+    with subscription details
+    Additional keys:
+        - subscription_id
+        - req_id
+    :param response: dict
+    :return: dict
+    '''
+
+    proposal = parse_contract_proposal(response)
+    proposal['subscription_id'] = response['subscription']['id']
+    proposal['req_id'] = response['req_id']
+
+    return proposal
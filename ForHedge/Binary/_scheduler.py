@@ -0,0 +1,316 @@
+'''
+    Send scheduler of Binary and BinaryAccount connection.
+
+    Binary.com limits number of calls per minute and per hour
+    for groups of calls (see website_status 'api_call_limits'):
+        - pricing - proposal, proposal_open_contract
+        - outcome - portfolio, statement, profit_table
+        - general - the rest calls
+
+    Each group has token buckets for its limits. Request is sent at once
+    in calling thread if its bucket has a token and there are no waiting
+    requests of the same or higher priority. Otherwise it is queued and sent
+    by scheduler thread as soon as tokens are refilled, higher priority first.
+
+    Priority classes (highest first):
+        - TRADE - buy, sell
+        - CONTROL - authorize, forget, ping
+        - ACCOUNT - balance, portfolio, statement, profit table, contract updates
+        - MARKET - history, ticks, price proposals
+
+    The last reserve tokens of a bucket are left for TRADE,
+    so burst of market data can not take quota of a hedge.
+'''
+
+from collections import deque
+from threading import Thread, Condition
+import logging
+import sys
+import time
+import traceback
+
+
+TRADE = 0
+CONTROL = 1
+ACCOUNT = 2
+MARKET = 3
+
+CLASS_NAMES = ('trade', 'control', 'account', 'market')
+
+PRIORITIES = {
+    'buy' : TRADE,
+    'buy_contract_for_multiple_accounts' : TRADE,
+    'sell' : TRADE,
+    'authorize' : CONTROL,
+    'logout' : CONTROL,
+    'forget' : CONTROL,
+    'forget_all' : CONTROL,
+    'ping' : CONTROL,
+    'balance' : ACCOUNT,
+    'portfolio' : ACCOUNT,
+    'statement' : ACCOUNT,
+    'profit_table' : ACCOUNT,
+    'login_history' : ACCOUNT,
+    'proposal_open_contract' : ACCOUNT
+}
+
+CATEGORIES = {
+    'proposal' : 'pricing',
+    'proposal_open_contract' : 'pricing',
+    'portfolio' : 'outcome',
+    'statement' : 'outcome',
+    'profit_table' : 'outcome'
+}
+
+'''
+    key - call group
+    value - tuple(calls per minute, calls per hour)
+'''
+LIMITS = {
+    'general' : (180, 14400),
+    'outcome' : (35, 1500),
+    'pricing' : (80, 3600)
+}
+
+
+def get_call_name(request):
+    '''
+    Returns name of API call. Requests are built from patterns
+    where the call is the first key, e.g. '{"buy":...'
+    :param request: str
+    :return: str
+    '''
+
+    return request[2:request.find('"', 2)]
+
+
+class TokenBucket:
+    '''
+        capacity tokens, refilled by rate tokens per second
+    '''
+
+    def __init__(self, capacity, rate):
+
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.last = time.monotonic()
+
+    def refill(self, now):
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def time_until(self, tokens):
+        '''
+        Returns seconds until bucket has given number of tokens
+        '''
+
+        return max(tokens - self.tokens, 0) / self.rate
+
+
+class SendScheduler:
+    '''
+        Schedules requests of one connection.
+        send_frames - function which sends list of requests back-to-back
+
+        Statistics per priority class:
+            - sent
+            - queued - requests which waited in queue
+            - depth / max_depth
+            - wait_avg / wait_max - seconds in queue
+        and throttled - throttle events (request had to wait for limits
+        while nothing was queued before it), per call group
+    '''
+
+    def __init__(self, send_frames, limits=LIMITS, reserve=5):
+
+        self.send_frames = send_frames
+        self.reserve = reserve
+
+        self.buckets = {
+            category : [TokenBucket(per_minute, per_minute / 60), TokenBucket(per_hour, per_hour / 3600)]
+            for category, (per_minute, per_hour) in limits.items()
+        }
+
+        # queue of tuple(request, category, queued time) for each priority class
+        self.queues = [deque() for _ in CLASS_NAMES]
+        self.condition = Condition()
+        self.thread = None
+        self.closed = False
+
+        self.sent = [0] * len(CLASS_NAMES)
+        self.queued = [0] * len(CLASS_NAMES)
+        self.max_depth = [0] * len(CLASS_NAMES)
+        self.wait_total = [0.0] * len(CLASS_NAMES)
+        self.wait_max = [0.0] * len(CLASS_NAMES)
+        self.throttled = {category : 0 for category in limits}
+
+    def take_token(self, category, priority, now):
+        '''
+        Takes token from all the buckets of category if it is allowed.
+        Have to be called under self.condition
+        :return: True if token is taken
+        '''
+
+        buckets = self.buckets.get(category, self.buckets['general'])
+        needed = 1 if priority == TRADE else 1 + self.reserve
+
+        for bucket in buckets:
+            bucket.refill(now)
+            # reserve can not be more than bucket itself
+            if bucket.tokens < min(needed, bucket.capacity):
+                return False
+
+        for bucket in buckets:
+            bucket.tokens -= 1
+
+        return True
+
+    def get_delay(self, category, priority):
+        '''
+        Returns seconds until token of category is available for priority.
+        Have to be called under self.condition
+        '''
+
+        buckets = self.buckets.get(category, self.buckets['general'])
+        needed = 1 if priority == TRADE else 1 + self.reserve
+
+        return max(bucket.time_until(min(needed, bucket.capacity)) for bucket in buckets)
+
+    def submit(self, requests):
+        '''
+        Sends requests at once if limits allow, otherwise queues them.
+        Requests sent at once are sent back-to-back in calling thread
+        :param requests: list of str
+        :return: None
+        '''
+
+        now = time.monotonic()
+        ready = []
+
+        with self.condition:
+            for request in requests:
+                name = get_call_name(request)
+                priority = PRIORITIES.get(name, MARKET)
+                category = CATEGORIES.get(name, 'general')
+
+                # requests of the same or higher priority are waiting - keep the order
+                waiting = any(len(self.queues[p]) > 0 for p in range(priority + 1))
+
+                if not waiting and self.take_token(category, priority, now):
+                    ready.append(request)
+                    self.sent[priority] += 1
+                    continue
+
+                if not waiting:
+                    self.throttled[category] = self.throttled.get(category, 0) + 1
+
+                self.queues[priority].append((request, category, now))
+                self.queued[priority] += 1
+                self.max_depth[priority] = max(self.max_depth[priority], len(self.queues[priority]))
+
+                self.start()
+                self.condition.notify()
+
+        if len(ready) > 0:
+            self.send_frames(ready)
+
+    def start(self):
+        '''
+        Starts scheduler thread. Have to be called under self.condition
+        :return: None
+        '''
+
+        if self.thread is None:
+            self.thread = Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+
+        while True:
+            with self.condition:
+                request = None
+                delay = None
+
+                while request is None:
+                    if self.closed:
+                        return
+
+                    now = time.monotonic()
+
+                    # the first request which can be sent, higher priority first
+                    for priority, queue in enumerate(self.queues):
+                        if len(queue) == 0:
+                            continue
+
+                        queued_request, category, queued_at = queue[0]
+                        if self.take_token(category, priority, now):
+                            queue.popleft()
+                            request = queued_request
+                            self.register_wait(priority, now - queued_at)
+                            break
+
+                        wait = self.get_delay(category, priority)
+                        delay = wait if delay is None else min(delay, wait)
+
+                    if request is None:
+                        self.condition.wait(delay)
+                        delay = None
+
+            try:
+                self.send_frames([request])
+            except:
+                # connection is lost. request is sent again after reconnection if it is idempotent
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def register_wait(self, priority, wait):
+
+        self.sent[priority] += 1
+        self.wait_total[priority] += wait
+        self.wait_max[priority] = max(self.wait_max[priority], wait)
+
+    def clear(self):
+        '''
+        Drops queued requests. Uses when connection is lost:
+        requests must not be sent by the next connection
+        :return: None
+        '''
+
+        with self.condition:
+            for queue in self.queues:
+                queue.clear()
+
+    def close(self):
+
+        with self.condition:
+            self.closed = True
+            for queue in self.queues:
+                queue.clear()
+            self.condition.notify_all()
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys:
+            - trade, control, account, market - dict described in class docstring
+            - throttled - dict of call group and number of throttle events
+        :return: dict
+        '''
+
+        with self.condition:
+            stats = {
+                name : {
+                    'sent' : self.sent[priority],
+                    'queued' : self.queued[priority],
+                    'depth' : len(self.queues[priority]),
+                    'max_depth' : self.max_depth[priority],
+                    'wait_avg' : self.wait_total[priority] / self.queued[priority] if self.queued[priority] else 0.0,
+                    'wait_max' : self.wait_max[priority]
+                }
+                for priority, name in enumerate(CLASS_NAMES)
+            }
+            stats['throttled'] = dict(self.throttled)
+
+            return stats
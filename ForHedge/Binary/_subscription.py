@@ -0,0 +1,223 @@
+from Binary._errors import RequestTimeoutError
+from threading import Condition
+from collections import deque
+import logging
+import sys
+import traceback
+
+
+class Subscription:
+    '''
+        Stream of updates of one subscribed request.
+
+        Receiving thread pushes every update into bounded queue,
+        consumer takes them by get() or by iteration:
+
+            with binary_account.subscribe_price_proposal(contract_id) as subscription:
+                for update in subscription:
+                    ...
+
+        Delivery modes:
+            - EVERY_UPDATE - keep up to maxsize updates, the oldest is dropped when full
+            - LATEST_ONLY - keep only the latest update (coalescing)
+
+        Receiving thread never waits for consumer.
+        Dropped and coalesced updates are counted in get_stats().
+
+        If connection is lost, subscription is re-issued after reconnection
+        and the stream goes on. Updates of the downtime are lost, it is counted as a gap.
+
+        close() (or leaving 'with' block) forgets subscription at Binary.com.
+    '''
+
+    EVERY_UPDATE = 'every'
+    LATEST_ONLY = 'latest'
+
+    def __init__(self, client, req_id, parser=None, mode=EVERY_UPDATE, maxsize=100, listener=None):
+        '''
+        :param client: Binary or BinaryAccount which made subscription
+        :param req_id: id of subscribe request
+        :param parser: function to convert each update
+        :param mode: EVERY_UPDATE or LATEST_ONLY
+        :param maxsize: queue size for EVERY_UPDATE mode
+        :param listener: function called with subscription after each update is pushed
+        '''
+
+        self.client = client
+        self.req_id = req_id
+        self.parser = parser
+        self.mode = mode
+        self.listener = listener
+
+        self.queue = deque(maxlen=maxsize if mode == Subscription.EVERY_UPDATE else 1)
+        self.condition = Condition()
+
+        self.subscription_id = None
+        self.error = None
+        self.closed = False
+
+        # backpressure statistics
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.gaps = 0
+
+    def push(self, response):
+        '''
+        Adds update. Called by receiving thread
+        :param response: dict
+        :return: None
+        '''
+
+        with self.condition:
+            if self.closed:
+                return
+
+            if self.subscription_id is None and 'subscription' in response:
+                self.subscription_id = response['subscription']['id']
+
+            if len(self.queue) == self.queue.maxlen:
+                if self.mode == Subscription.LATEST_ONLY:
+                    self.coalesced += 1
+                else:
+                    self.dropped += 1
+
+            self.queue.append(response)
+            self.received += 1
+            self.max_depth = max(self.max_depth, len(self.queue))
+
+            self.condition.notify()
+
+        if not self.listener is None:
+            try:
+                self.listener(self)
+            except:
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def fail(self, response):
+        '''
+        Closes subscription which was rejected by Binary.com.
+        Request is forgotten by client which made it
+        :param response: dict with error
+        :return: None
+        '''
+
+        with self.condition:
+            self.error = response['error']['message']
+            self.queue.clear()
+            self.closed = True
+            self.condition.notify_all()
+
+    def restart(self):
+        '''
+        Prepares subscription to be re-issued after reconnection.
+        New subscription id comes with the first response
+        :return: None
+        '''
+
+        with self.condition:
+            self.subscription_id = None
+            self.gaps += 1
+
+    def finish(self):
+        '''
+        Closes subscription without request to Binary.com.
+        Uses when connection is closed
+        :return: None
+        '''
+
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def get(self, timeout=None):
+        '''
+        Returns next update or None if timeout expired or subscription is closed
+        :param timeout: seconds or None to wait until update comes
+        :return: update converted by parser
+        '''
+
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.queue) > 0 or self.closed, timeout):
+                return None
+
+            if len(self.queue) == 0:
+                return None
+
+            response = self.queue.popleft()
+            self.delivered += 1
+
+        return response if self.parser is None else self.parser(response)
+
+    def get_nowait(self):
+        '''
+        Returns next update or None if there is nothing new
+        '''
+
+        return self.get(timeout=0)
+
+    def __iter__(self):
+
+        while True:
+            update = self.get()
+            if update is None and self.closed:
+                return
+
+            if not update is None:
+                yield update
+
+    def get_stats(self):
+        '''
+        Returns backpressure statistics as dict
+        Keys:
+            - received
+            - delivered
+            - dropped - updates lost because EVERY_UPDATE queue was full
+            - coalesced - updates replaced by newer ones in LATEST_ONLY mode
+            - depth - updates waiting for consumer
+            - max_depth
+            - gaps - reconnections during which updates were lost
+        :return: dict
+        '''
+
+        with self.condition:
+            return {
+                'received' : self.received,
+                'delivered' : self.delivered,
+                'dropped' : self.dropped,
+                'coalesced' : self.coalesced,
+                'depth' : len(self.queue),
+                'max_depth' : self.max_depth,
+                'gaps' : self.gaps
+            }
+
+    def close(self):
+        '''
+        Stops subscription at Binary.com and wakes up consumers
+        :return: None
+        '''
+
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+
+        if self.subscription_id is None:
+            self.client.forget_request(self.req_id)
+        else:
+            try:
+                self.client.forget_subscription(self.subscription_id, event_to_remove=self.req_id)
+            except RequestTimeoutError:
+                # subscription is forgotten locally, updates are dropped
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,293 @@
+'''
+    Asyncio version of Binary and BinaryAccount.
+
+    Same API surface, but methods are coroutines:
+
+        binary = AsyncBinary()
+        await binary.open_app()
+        candles, proposal = await asyncio.gather(
+            binary.get_history(asset='R_100'),
+            binary.get_price_proposal(asset='R_100'))
+
+    One event loop can drive hundreds of concurrent requests and subscriptions
+    over one connection. Results have the same structure as in synchronous clients.
+
+    Binary and BinaryAccount are not built on these clients: they keep their
+    websocket-client transport, which reconnection, send scheduling, latency
+    monitoring and Subscription are built on. Both share request builders
+    (_binary_general) and response parsers (_responses) only.
+'''
+
+import Binary._binary_general as bin_api
+import Binary._async_helper as async_helper
+import Binary._responses as responses
+from Binary._errors import AuthorizationError, ConnectionLostError, RequestTimeoutError
+import logging
+import sys
+import traceback
+
+
+class AsyncBinary(async_helper.AsyncWSHelper):
+    '''
+    Asyncio wrapper of Binary.com API
+    Provides unathorized operations. Authorized scope is in AsyncBinaryAccount
+    '''
+
+    def __init__(self, url=None):
+
+        super().__init__(bin_api.get_binary_url() if url is None else url)
+
+    async def get_history(self, asset = 'frxEURUSD', granularity=3600,
+                          count=50, subscribe=0, style='candles', output='tuples', timeout=None):
+        '''
+        Returns list of candles as tuple:
+        tuple = (date, open, high, low, close)
+        output 'array' or 'columns' gives numpy arrays (see Binary.get_history)
+
+        If subscribe is 1 returns tuple (candles, AsyncSubscription)
+        where subscription streams raw 'ohlc' updates
+        :return: list
+        '''
+
+        parser = responses.get_history_parser(output)
+        params = dict(symbol=asset, style=style, granularity=granularity,
+                      count=count, subscribe=subscribe)
+
+        if subscribe == 1:
+            response, subscription = await self.subscribe(bin_api.get_tick_history_json, timeout=timeout, **params)
+            return parser(response), subscription
+
+        response = await self.request(bin_api.get_tick_history_json, timeout=timeout, **params)
+
+        return parser(response)
+
+    async def get_price_proposal(self, asset = 'frxEURUSD', amount = 1,
+                                 duration = 60, duration_unit = 'm', type='CALL', timeout=None):
+        '''
+        Returns price proposal for buying an option as dict
+        Keys:
+            - date_start
+            - proposal_id
+            - description
+            - payout
+            - error
+            - err_msg
+
+        :return: dict
+        '''
+
+        response = await self.request(bin_api.get_price_proposal_json,
+                                      amount=amount,
+                                      type=type,
+                                      duration=duration,
+                                      duration_unit=duration_unit,
+                                      symbol=asset,
+                                      timeout=timeout)
+
+        return responses.parse_price_proposal(response)
+
+
+class AsyncBinaryAccount(async_helper.AsyncWSHelper):
+    '''
+        Asyncio version of BinaryAccount.
+        Authorizes by given apiToken on open_app.
+    '''
+
+    def __init__(self, apiToken, url=None):
+
+        super().__init__(bin_api.get_binary_url() if url is None else url)
+
+        self.apiToken = apiToken
+        self.authorized = False
+
+    async def open_app(self):
+        '''
+        Opens connection and authorizes
+        :return: None
+        '''
+
+        await super().open_app()
+
+        response = await self.request(bin_api.get_authorize_json, apiToken=self.apiToken)
+        if 'error' in response:
+            await self.close_app()
+            raise AuthorizationError(response['error']['message'])
+
+        self.authorized = True
+
+    def on_app_close(self):
+
+        self.authorized = False
+        super().on_app_close()
+
+    # Account manipulation methods
+
+    async def get_balance(self, timeout=None):
+
+        try:
+            response = await self.request(bin_api.get_balance_json, timeout=timeout)
+
+            return responses.parse_balance(response)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
+
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    async def get_portfolio(self, timeout=None):
+        '''
+        Returns current opened positions as list of dict
+        Keys are described in BinaryAccount.get_portfolio
+        :return: list
+        '''
+
+        try:
+            response = await self.request(bin_api.get_portfolio_json, timeout=timeout)
+
+            return responses.parse_portfolio(response)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
+
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    async def get_login_history(self, limit=25, timeout=None):
+
+        try:
+            response = await self.request(bin_api.get_login_history_json, timeout=timeout, limit=limit)
+
+            return responses.parse_login_history(response)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
+
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    async def get_profit_table(self, limit=10, date_from = None, date_to = None, offset=0, timeout=None):
+        '''
+        Returns list of dict.
+        Keys are described in BinaryAccount.get_profit_table
+        :return: list
+        '''
+
+        try:
+            response = await self.request(bin_api.get_profit_table_json,
+                                          limit=limit,
+                                          offset=offset,
+                                          date_from=date_from,
+                                          date_to=date_to,
+                                          timeout=timeout)
+
+            return responses.parse_profit_table(response)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
+
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    async def get_statement(self, limit=10, date_from = None, date_to = None, offset=0, timeout=None):
+        '''
+        Returns list of dict.
+        Keys are described in BinaryAccount.get_statement
+        :return: list
+        '''
+
+        try:
+            response = await self.request(bin_api.get_statement_json,
+                                          limit=limit,
+                                          offset=offset,
+                                          date_from=date_from,
+                                          date_to=date_to,
+                                          timeout=timeout)
+
+            return responses.parse_statement(response)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
+
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    async def sell_contract(self, contract_id, price=0, timeout=None):
+        '''
+        Sells specified contract and shows the result as dict
+        Keys:
+            - balance_after
+            - sold_for
+            OR
+            - error : err_msg
+        :return: dict
+        '''
+
+        response = await self.request(bin_api.get_sell_contract_json,
+                                      contract_id=contract_id,
+                                      price=price,
+                                      timeout=timeout)
+
+        return responses.parse_sell(response)
+
+    async def buy_contract(self, proposal_id = None,
+                           amount = 1, type='CALL', duration=15, duration_unit='m', symbol='frxEURUSD',
+                           timeout=None):
+        '''
+        Buys contract by proposal_id or by given parameters.
+        To use custom parameters proposal_id HAVE TO BE None
+
+        Returns dict with details
+        Keys are described in BinaryAccount.buy_contract
+        :return: dict
+        '''
+
+        if not proposal_id is None:
+            response = await self.request(bin_api.get_buy_contract_json,
+                                          proposal_id=proposal_id,
+                                          price=amount,
+                                          proposal_parameters=None,
+                                          timeout=timeout)
+        else:
+            proposal_parameters = bin_api.get_price_proposal_dict(amount=amount,
+                                                                  type=type,
+                                                                  duration=duration,
+                                                                  duration_unit=duration_unit,
+                                                                  symbol=symbol)
+            response = await self.request(bin_api.get_buy_contract_json,
+                                          proposal_id=1,
+                                          price=amount,
+                                          proposal_parameters=proposal_parameters,
+                                          timeout=timeout)
+
+        return responses.parse_buy(response)
+
+    async def get_price_proposal(self, contract_id, subscribe=0, timeout=None):
+        '''
+        Returns information about opened position as dict
+        Keys are described in BinaryAccount.get_price_proposal
+
+        If subscribe is 1 returns tuple (dict, AsyncSubscription)
+        where subscription streams the same dicts
+        :return: dict
+        '''
+
+        if subscribe == 1:
+            response, subscription = await self.subscribe(bin_api.get_contract_proposal_json,
+                                                          parser=responses.parse_contract_proposal,
+                                                          contract_id=contract_id,
+                                                          subscribe=1,
+                                                          timeout=timeout)
+            return responses.parse_contract_proposal(response), subscription
+
+        response = await self.request(bin_api.get_contract_proposal_json,
+                                      contract_id=contract_id,
+                                      subscribe=0,
+                                      timeout=timeout)
+
+        return responses.parse_contract_proposal(response)
@@ -1,11 +1,16 @@
 
 import Binary._binary_general as bin_api
+import Binary._codec as codec
 import Binary._multithread_helper as mt_helper
+import Binary._responses as responses
+from Binary._subscription import Subscription
+from Binary._pipeline import RequestHandle
+from Binary._errors import ConnectionLostError
 from websocket import WebSocketApp
-import json
-from threading import Thread, Event
+import traffic_recorder
 import logging
 import sys
+import time
 import traceback
 
 class Binary(mt_helper.MultiThreadWSHelper):
@@ -14,74 +19,106 @@ class Binary(mt_helper.MultiThreadWSHelper):
     Provides unathorized operations. Authorized scope is in binary_account module
     '''
 
-    def __init__(self, ):
+    def __init__(self, url=None):
 
         super().__init__()
-        self.url = bin_api.get_binary_url()
-        self.app = WebSocketApp(url=self.url,
-                                on_open = lambda ws: self.on_app_open(ws),
-                                on_close = lambda ws: self.on_app_close(ws),
-                                on_message = lambda ws, msg: self.on_app_msg(ws, msg),
-                                on_error = lambda ws, err: self.on_app_error(ws, err),
-                                on_ping = lambda ws: self.on_app_ping(ws))
+        self.url = bin_api.get_binary_url() if url is None else url
+        self.app = self.create_app()
 
         self.reconnect = True
 
 
     def send_request(self, request):
         '''
-        Sends request considering sharing between threads.
+        Sends request considering sharing between threads
+        and Binary.com limits (see _scheduler)
+        '''
+
+        if self.buffer_request(request):
+            return
+
+        self.scheduler.submit([request])
+
+    def send_requests(self, requests):
+        '''
+        Sends requests back-to-back without other threads in between
+        (if limits do not make some of them wait)
+        '''
+
+        self.scheduler.submit(requests)
+
+    def send_frames(self, requests):
+        '''
+        Writes requests into socket. Called by self.scheduler.
         Ideally it should be placed into helper,
         but app (WebSocketApp) defined here
         '''
 
         with self.ws_lock:
-            self.app.send(request)
+            for request in requests:
+                self.app.send(request)
+                traffic_recorder.record(self.channel, 'out', request)
 
     def open_app(self):
-        Thread(target=self.app.run_forever).start()
+        '''
+        Starts connection. Doesn't wait for it:
+        requests made before connection is opened are sent as soon as it is.
+        Use wait_ready() to wait for connection
+        '''
+        self.reconnector.start()
+        self.latency.start()
 
     def close_app(self):
-        del self.responses
         self.reconnect = False
+        self.reconnector.stop()
+        self.latency.stop()
+        self.scheduler.close()
+        self.clear_responses()
         self.app.close()
 
+    def create_app(self):
+        '''
+        Creates new WebSocketApp. Called by self.reconnector on each connection
+        :return: WebSocketApp
+        '''
+
+        return WebSocketApp(url=self.url,
+                            on_open = lambda ws: self.on_app_open(ws),
+                            on_close = lambda ws, *args: self.on_app_close(ws),
+                            on_message = lambda ws, msg: self.on_app_msg(ws, msg),
+                            on_error = lambda ws, err: self.on_app_error(ws, err),
+                            on_ping = lambda ws: self.on_app_ping(ws))
+
     # Websockets methods:
 
-    def on_app_open(self):
+    def on_app_open(self, ws):
         '''
-        We have nothing to do here
+        Sends requests which wait for connection
         :return:
         '''
-        pass
+        self.reconnector.on_ready()
 
 
     def on_app_msg(self, ws, msg):
 
+        start = time.perf_counter()
+        traffic_recorder.record(self.channel, 'in', msg)
+
         try:
-            resp = json.loads(msg)
-            self.add_response(resp)
+            resp = codec.loads(msg)
 
-            id_ = resp['req_id']
-            if self.in_events(id_):
-                self.set_event(id_)
+            self.resolve_response(resp)
 
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
 
-        ready = True # line for debug
+        self.latency.add_processing(time.perf_counter() - start)
 
     def on_app_close(self, ws):
 
-        if self.reconnect:
-            self.app = WebSocketApp(url=self.url,
-                                on_open = lambda ws: self.on_app_open(ws),
-                                on_close = lambda ws: self.on_app_close(ws),
-                                on_message = lambda ws, msg: self.on_app_msg(ws, msg),
-                                on_error = lambda ws, err: self.on_app_error(ws, err),
-                                on_ping = lambda ws: self.on_app_ping(ws))
-            Thread(target=self.app.run_forever).start()
+        # new connection is opened by self.reconnector
+        self.ready = False
 
     def on_app_error(self, ws, error):
         pass
@@ -90,35 +127,72 @@ class Binary(mt_helper.MultiThreadWSHelper):
         pass
 
     def get_history(self, asset = 'frxEURUSD', granularity=3600,
-                    count=50, subscribe=0, style='candles'):
+                    count=50, subscribe=0, style='candles', listener=None, timeout=None,
+                    start=1, end='latest', output='tuples'):
         '''
         Returns list of candles as tuple:
-        tuple = (date, open, high, low, close, subscription_id)
+        tuple = (date, open, high, low, close)
+        The latest count candles opened from start to end (epoch or 'latest').
+        Binary.com gives up to 5000 candles by request
+
+        Columnar output for analytics (no Python object per candle):
+            - output='array' - numpy structured array of _responses.CANDLE_DTYPE
+            - output='columns' - dict of numpy array per field (see _responses.parse_history_columns)
+
+        If subscribe is 1 returns tuple (candles, Subscription).
+        Subscription streams the forming candle as tuple
+        each time it changes; new candle has greater date.
+        If Binary.com rejects subscription, returned subscription
+        is already closed and has error message in 'error' attribute
+        :param listener: function called with subscription after each update
+        :param timeout: seconds or None to wait default_timeout. RequestTimeoutError is raised after that
         :return: list
         '''
 
-        curID = self.get_next_req_id()
-        curEvent = Event()
-        self.add_event(curID, curEvent)
-        self.send_request(bin_api.get_tick_history_json(symbol=asset,
-                                                        style=style,
-                                                        granularity=granularity,
-                                                        count=count,
-                                                        subscribe=subscribe,
-                                                        req_id=curID))
+        if subscribe != 1:
+            return self.request_history(asset, granularity, count, style, start, end, output).result(timeout)
 
-        # TODO: subscribe
+        parser = responses.get_history_parser(output)
 
-        curEvent.wait()
+        response, subscription = self.subscribe(bin_api.get_tick_history_json,
+                                                parser=responses.parse_ohlc,
+                                                listener=listener,
+                                                push_first=False,
+                                                timeout=timeout,
+                                                symbol=asset,
+                                                style=style,
+                                                granularity=granularity,
+                                                count=count,
+                                                subscribe=1)
+
+        if 'error' in response:
+            return parser({'candles' : []}), subscription
 
-        response = self.get_response(curID)
-        response = response['candles']
-        return [(r['epoch'], r['open'], r['high'], r['low'], r['close'])
-                    for r in response
-            ]
+        return parser(response), subscription
+
+    def request_history(self, asset = 'frxEURUSD', granularity=3600,
+                        count=50, style='candles', start=1, end='latest', output='tuples'):
+        '''
+        Sends history request without waiting
+        :return: RequestHandle giving the same result as get_history
+        '''
+
+        parser = responses.get_history_parser(output)
+
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_tick_history_json(symbol=asset,
+                                                                    style=style,
+                                                                    granularity=granularity,
+                                                                    count=count,
+                                                                    start=start,
+                                                                    end=end,
+                                                                    subscribe=0,
+                                                                    req_id=pending.req_id))
+
+        return RequestHandle(pending, parser)
 
     def get_price_proposal(self, asset = 'frxEURUSD', amount = 1,
-                          duration = 60, duration_unit = 'm', type='CALL'):
+                          duration = 60, duration_unit = 'm', type='CALL', timeout=None):
         '''
         Returns price proposal for buying an option as dict
         Keys:
@@ -130,51 +204,73 @@ class Binary(mt_helper.MultiThreadWSHelper):
         :return: dict
         '''
 
-        curID = self.get_next_req_id()
-        curEvent = Event()
-        self.add_event(curID, curEvent)
-        self.send_request(bin_api.get_price_proposal_json(amount=amount,
-                                                          type=type,
-                                                          duration=duration,
-                                                          duration_unit=duration_unit,
-                                                          symbol=asset,
-                                                          req_id=curID))
-
-        curEvent.wait()
+        return self.request_price_proposal(asset, amount, duration, duration_unit, type).result(timeout)
 
-        response = self.get_response(curID)
-        if 'error' in response:
-            return {
-                'date_start' : '',
-                'proposal_id' : '',
-                'description' : response['error']['message'],
-                'payout' : 0,
-                'error' : True,
-                'err_msg' : response['error']['message']
-            }
-
-        return {
-            'date_start' : response['proposal']['date_start'] if 'date_start' in response['proposal'] else '',
-            'proposal_id' : response['proposal']['id'],
-            'description' : response['proposal']['longcode'],
-            'payout' : response['proposal']['payout'],
-            'error' : False,
-            'err_msg' : ''
-        }
-
-
-    def forget_subscription(self, subscription_id, event_to_remove = None):
-        '''
-        Makes request to stop receive events by subscription
-        :return:
+    def request_price_proposal(self, asset = 'frxEURUSD', amount = 1,
+                               duration = 60, duration_unit = 'm', type='CALL'):
+        '''
+        Sends price proposal request without waiting.
+        Use with pipeline() to get CALL and PUT proposals in one round trip
+        :return: RequestHandle giving the same dict as get_price_proposal
         '''
 
-        curID = self.get_next_req_id()
-        curEvent = Event()
-        self.add_event(curID, curEvent)
-        self.send_request(bin_api.get_forget_stream_json(subscription_id, req_id=curID))
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_price_proposal_json(amount=amount,
+                                                                      type=type,
+                                                                      duration=duration,
+                                                                      duration_unit=duration_unit,
+                                                                      symbol=asset,
+                                                                      req_id=pending.req_id))
 
-        curEvent.wait()
+        return RequestHandle(pending, responses.parse_price_proposal)
 
-        if not event_to_remove is None:
-            self.remove_event(event_to_remove)
+    def subscribe_price_proposal(self, asset = 'frxEURUSD', amount = 1,
+                                 duration = 60, duration_unit = 'm', type='CALL',
+                                 mode=Subscription.LATEST_ONLY, listener=None, timeout=None):
+        '''
+        Subscribes to price proposal for buying an option.
+        Returns Subscription which gives dicts described in get_price_proposal
+        each time Binary.com reprices the contract.
+
+        If Binary.com rejects subscription, returned subscription
+        is already closed and has error message in 'error' attribute
+        :param mode: Subscription.EVERY_UPDATE or Subscription.LATEST_ONLY
+        :param listener: function called with subscription after each update
+        :return: Subscription
+        '''
+
+        response, subscription = self.subscribe(bin_api.get_price_proposal_json,
+                                                parser=responses.parse_price_proposal,
+                                                mode=mode,
+                                                listener=listener,
+                                                timeout=timeout,
+                                                amount=amount,
+                                                type=type,
+                                                duration=duration,
+                                                duration_unit=duration_unit,
+                                                symbol=asset,
+                                                subscribe=1)
+
+        return subscription
+
+    def forget_subscription(self, subscription_id, event_to_remove = None, timeout=None):
+        '''
+        Makes request to stop receive events by subscription.
+        Subscription is forgotten locally even if RequestTimeoutError is raised
+        :return:
+        '''
+
+        try:
+            # subscriptions are forgotten at Binary.com when connection is lost
+            if self.ready:
+                pending = self.register_request()
+                self.send_request(bin_api.get_forget_stream_json(subscription_id, req_id=pending.req_id))
+
+                try:
+                    pending.wait(timeout)
+                except ConnectionLostError:
+                    pass
+
+        finally:
+            if not event_to_remove is None:
+                self.forget_request(event_to_remove)
@@ -11,12 +11,18 @@
 '''
 
 import Binary._binary_general as bin_api
+import Binary._codec as codec
 import Binary._multithread_helper as mt_helper
+import Binary._responses as responses
+from Binary._subscription import Subscription
+from Binary._pipeline import RequestHandle
+from Binary._errors import ConnectionLostError, RequestTimeoutError, AuthorizationError
 from websocket import WebSocketApp
-import json
-from threading import Thread, Lock, Event
+import traffic_recorder
+from threading import Thread, Event
 import logging
 import sys
+import time
 import traceback
 
 class BinaryAccount(mt_helper.MultiThreadWSHelper):
@@ -33,23 +39,26 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
         And each response has the same ID.
     '''
 
-    def __init__(self, apiToken):
+    def __init__(self, apiToken, url=None):
 
         super().__init__()
 
         self.apiToken = apiToken
-        self.url = bin_api.get_binary_url()
-        self.app = WebSocketApp(url=self.url,
-                                on_open = lambda ws: self.on_app_open(ws),
-                                on_close = lambda ws: self.on_app_close(ws),
-                                on_message = lambda ws, msg: self.on_app_msg(ws, msg),
-                                on_error = lambda ws, err: self.on_app_error(ws, err),
-                                on_ping = lambda ws: self.on_app_ping(ws))
+        self.url = bin_api.get_binary_url() if url is None else url
+        self.app = self.create_app()
 
         self.authorized = False
 
+        # account id given by authorization, e.g. CR123456
+        self.loginid = None
+
+        # set when the first authorize response comes, error message if token is rejected
+        self.authorize_done = Event()
+        self.authorize_error = None
+
         '''
-            If connection closes by any reason, BinaryAccount will create new application.
+            If connection closes by any reason, BinaryAccount will create new application,
+            authorize again and restore subscriptions (see _reconnect).
             If the app is closed and reconnection is not required, it won't.
         '''
         self.reconnect = True
@@ -57,64 +66,129 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
 
     def send_request(self, request):
         '''
-        Sends request considering sharing between threads.
+        Sends request considering sharing between threads
+        and Binary.com limits (see _scheduler)
+        '''
+
+        if self.buffer_request(request):
+            return
+
+        self.scheduler.submit([request])
+
+    def send_requests(self, requests):
+        '''
+        Sends requests back-to-back without other threads in between
+        (if limits do not make some of them wait)
+        '''
+
+        self.scheduler.submit(requests)
+
+    def send_frames(self, requests):
+        '''
+        Writes requests into socket. Called by self.scheduler.
         Ideally it should be placed into helper,
         but app (WebSocketApp) defined here
         '''
 
         with self.ws_lock:
-            self.app.send(request)
+            for request in requests:
+                self.app.send(request)
+                traffic_recorder.record(self.channel, 'out', request)
+
+    def open_app(self, timeout=None):
+        '''
+        Opens connection and waits for authorization.
+        Connection is closed if authorization fails:
+        raises AuthorizationError if token is rejected
+        and RequestTimeoutError if there is no response
+        :param timeout: seconds or None to wait default_timeout
+        '''
+        self.reconnector.start()
+        self.latency.start()
+
+        try:
+            if not self.authorize_done.wait(self.default_timeout if timeout is None else timeout):
+                raise RequestTimeoutError('Binary.com did not authorize in {} seconds'.format(
+                    self.default_timeout if timeout is None else timeout))
 
-    def open_app(self):
-        Thread(target=self.app.run_forever).start()
-        while not self.authorized:
-            pass
+            if not self.authorize_error is None:
+                raise AuthorizationError(self.authorize_error)
+        except:
+            self.close_app()
+            raise
 
     def close_app(self):
-        del self.responses
         self.reconnect = False
+        self.reconnector.stop()
+        self.latency.stop()
+        self.scheduler.close()
+        self.clear_responses()
         self.app.close()
 
+    def create_app(self):
+        '''
+        Creates new WebSocketApp. Called by self.reconnector on each connection
+        :return: WebSocketApp
+        '''
+
+        return WebSocketApp(url=self.url,
+                            on_open = lambda ws: self.on_app_open(ws),
+                            on_close = lambda ws, *args: self.on_app_close(ws),
+                            on_message = lambda ws, msg: self.on_app_msg(ws, msg),
+                            on_error = lambda ws, err: self.on_app_error(ws, err),
+                            on_ping = lambda ws: self.on_app_ping(ws))
+
+    def is_alive(self):
+        '''
+        Checks if session can be used: it is not closed and its token is not rejected.
+        Connection can be restoring at the moment (see _reconnect), use wait_ready
+        :return: bool
+        '''
+
+        return self.reconnect and self.authorize_error is None
+
     # Websockets methods:
 
     def on_app_open(self, ws):
 
-        # Authorize on open
-        curID = self.get_next_req_id()
-        curEvent = Event()
-        self.add_event(curID, curEvent)
-        self.send_request(bin_api.get_authorize_json(self.apiToken, req_id=curID))
+        # Authorize on open. Response is caught in on_app_msg
+        pending = self.register_request()
+        self.send_request(bin_api.get_authorize_json(self.apiToken, req_id=pending.req_id))
 
 
     def on_app_msg(self, ws, msg):
 
+        start = time.perf_counter()
+        traffic_recorder.record(self.channel, 'in', msg)
+
         try:
-            resp = json.loads(msg)
-            self.add_response(resp)
+            resp = codec.loads(msg)
 
             if 'authorize' in resp:
                 self.authorized = True
+                self.loginid = resp['authorize']['loginid']
+                # send requests which wait for authorized connection
+                self.reconnector.on_ready()
+                self.authorize_done.set()
+            elif resp.get('msg_type') == 'authorize' and 'error' in resp:
+                # token is rejected, open_app fails at once
+                self.authorize_error = resp['error']['message']
+                self.authorize_done.set()
 
-            id_ = resp['req_id']
-            if self.in_events(id_):
-                self.set_event(id_)
+            self.resolve_response(resp)
 
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
 
-        ready = True # line for debug
+        self.latency.add_processing(time.perf_counter() - start)
 
     def on_app_close(self, ws):
 
-        if self.reconnect:
-            self.app = WebSocketApp(url=self.url,
-                                on_open = lambda ws: self.on_app_open(ws),
-                                on_close = lambda ws: self.on_app_close(ws),
-                                on_message = lambda ws, msg: self.on_app_msg(ws, msg),
-                                on_error = lambda ws, err: self.on_app_error(ws, err),
-                                on_ping = lambda ws: self.on_app_ping(ws))
-            Thread(target=self.app.run_forever).start()
+        self.authorized = False
+
+        # new connection is opened by self.reconnector
+        self.ready = False
 
     def on_app_error(self, ws, error):
         pass
@@ -123,27 +197,38 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
         pass
 
     # Account manipulation methods
+    #
+    # request_* methods send request and return RequestHandle without waiting,
+    # so many of them can be sent back-to-back (see pipeline()).
+    # get_* and other methods wait for the result.
 
-    def get_balance(self):
+    def request_balance(self):
 
-        try:
-            curID = self.get_next_req_id()
-            curEvent = Event()
-            self.add_event(curID, curEvent)
-            self.send_request(bin_api.get_balance_json(req_id=curID))
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_balance_json(req_id=pending.req_id))
 
-            curEvent.wait()
+        return RequestHandle(pending, responses.parse_balance)
 
-            response = self.get_response(curID)
+    def get_balance(self, timeout=None):
 
-            return response['balance']['balance']
+        try:
+            return self.request_balance().result(timeout)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
 
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
 
+    def request_portfolio(self):
+
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_portfolio_json(req_id=pending.req_id))
+
+        return RequestHandle(pending, responses.parse_portfolio)
 
-    def get_portfolio(self):
+    def get_portfolio(self, timeout=None):
         '''
         Returns current opened positions as list of dict
         Each dict has keys:
@@ -159,32 +244,23 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
         '''
 
         try:
+            return self.request_portfolio().result(timeout)
 
-            curID = self.get_next_req_id()
-            curEvent = Event()
-            self.add_event(curID, curEvent)
-            self.send_request(bin_api.get_portfolio_json(req_id=curID))
-
-            curEvent.wait()
-
-            response = self.get_response(curID)
-
-            return [{
-                'price' : r['buy_price'],
-                'payout' : r['payout'],
-                'contract_id' : r['contract_id'],
-                'contract_type' : r['contract_type'],
-                'date_start' : r['date_start'],
-                'date_end' : r['expiry_time'],
-                'description' : r['longcode'],
-                'symbol' : r['symbol']
-            } for r in response['portfolio']['contracts']]
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
 
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
 
-    def get_login_history(self, limit=25):
+    def request_login_history(self, limit=25):
+
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_login_history_json(limit=limit, req_id=pending.req_id))
+
+        return RequestHandle(pending, responses.parse_login_history)
+
+    def get_login_history(self, limit=25, timeout=None):
         '''
         Returns list of string with description of login
         :param limit: max number of login notes
@@ -192,27 +268,29 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
         '''
 
         try:
+            return self.request_login_history(limit).result(timeout)
 
-            curID = self.get_next_req_id()
-            curEvent = Event()
-            self.add_event(curID, curEvent)
-            self.send_request(bin_api.get_login_history_json(req_id=curID))
-
-            curEvent.wait()
-
-            response = self.get_response(curID)
-
-            return [
-                r['environment'] for r in response['login_history']
-            ]
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
 
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
 
-    def get_profit_table(self, limit=10, date_from = None, date_to = None):
+    def request_profit_table(self, limit=10, date_from = None, date_to = None, offset=0):
+
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_profit_table_json(limit=limit,
+                                                                    offset=offset,
+                                                                    date_from=date_from,
+                                                                    date_to=date_to,
+                                                                    req_id=pending.req_id))
+
+        return RequestHandle(pending, responses.parse_profit_table)
+
+    def get_profit_table(self, limit=10, date_from = None, date_to = None, offset=0, timeout=None):
         '''
-        Returns list of dict.
+        Returns list of dict, the latest sold contract first.
         Keys:
             - price
             - potential_payout
@@ -224,38 +302,61 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
         :param limit:
         :param date_from: int
         :param date_to: int
+        :param offset: number of contracts to skip
         :return:
         '''
 
         try:
+            return self.request_profit_table(limit, date_from, date_to, offset).result(timeout)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
+
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def request_statement(self, limit=10, date_from = None, date_to = None, offset=0):
 
-            curID = self.get_next_req_id()
-            curEvent = Event()
-            self.add_event(curID, curEvent)
+        pending = self.register_request()
+        self.send_registered(pending, bin_api.get_statement_json(limit=limit,
+                                                                 offset=offset,
+                                                                 date_from=date_from,
+                                                                 date_to=date_to,
+                                                                 req_id=pending.req_id))
 
-            self.send_request(bin_api.get_profit_table_json(limit=limit,
-                                                        date_from=date_from,
-                                                        date_to=date_to,
-                                                        req_id=curID))
-            curEvent.wait()
+        return RequestHandle(pending, responses.parse_statement)
 
-            response = self.get_response(curID)
+    def get_statement(self, limit=10, date_from = None, date_to = None, offset=0, timeout=None):
+        '''
+        Returns transactions (buy, sell, deposit, withdrawal...)
+        as list of dict, the latest first.
+        Keys are described in _responses.parse_statement
+        :param limit:
+        :param date_from: int
+        :param date_to: int
+        :param offset: number of transactions to skip
+        :return: list
+        '''
 
-            return [{
-                'price' : r['buy_price'],
-                'potential_payout' : r['payout'],
-                'sell_price' : r['sell_price'],
-                'contract_id' : r['contract_id'],
-                'purchase_time' : r['purchase_time'],
-                'sell_time' : r['sell_time'],
-                'description' : r['longcode']
-            } for r in response['profit_table']['transactions']]
+        try:
+            return self.request_statement(limit, date_from, date_to, offset).result(timeout)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
 
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
 
-    def sell_contract(self, contract_id, price=0):
+    def request_sell_contract(self, contract_id, price=0):
+
+        pending = self.register_request(idempotent=False)
+        self.send_registered(pending, bin_api.get_sell_contract_json(contract_id, price, req_id=pending.req_id))
+
+        return RequestHandle(pending, responses.parse_sell)
+
+    def sell_contract(self, contract_id, price=0, timeout=None):
         '''
         Sells specified contract and shows the result as dict
         Keys:
@@ -263,37 +364,51 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
             - sold_for
             OR
             - error : err_msg
+
+        Raises ConnectionLostError if connection is not ready,
+        BuyNotConfirmedError if it was lost while request was in flight
+        and RequestTimeoutError if response did not come in timeout
         :param contract_id:
         :param price:
         :return:
         '''
 
         try:
+            return self.request_sell_contract(contract_id, price).result(timeout)
 
-            curID = self.get_next_req_id()
-            curEvent = Event()
-            self.add_event(curID, curEvent)
-            self.send_request(bin_api.get_sell_contract_json(contract_id, price, req_id=curID))
-
-            curEvent.wait()
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
 
-            response = self.get_response(curID)
-
-            if not 'error' in response:
-                return {
-                    'balance_after' : response['sell']['balance_after'],
-                    'sold_for' : response['sell']['sold_for']
-                }
-            else:
-                return {
-                    'error' : response['error']['message']
-                }
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
 
+    def request_buy_contract(self, proposal_id = None,
+                             amount = 1, type='CALL', duration=15, duration_unit='m', symbol='frxEURUSD'):
+
+        pending = self.register_request(idempotent=False)
+
+        if not proposal_id is None:
+            self.send_registered(pending, bin_api.get_buy_contract_json(proposal_id=proposal_id,
+                                                                        price=amount,
+                                                                        proposal_parameters=None,
+                                                                        req_id=pending.req_id))
+        else:
+            proposal_parameters = bin_api.get_price_proposal_dict(amount=amount,
+                                                                  type=type,
+                                                                  duration=duration,
+                                                                  duration_unit=duration_unit,
+                                                                  symbol=symbol)
+            self.send_registered(pending, bin_api.get_buy_contract_json(proposal_id=1,
+                                                                        proposal_parameters=proposal_parameters,
+                                                                        price=amount,
+                                                                        req_id=pending.req_id))
+
+        return RequestHandle(pending, responses.parse_buy)
+
     def buy_contract(self, proposal_id = None,
-                     amount = 1, type='CALL', duration=15, duration_unit='m', symbol='frxEURUSD'):
+                     amount = 1, type='CALL', duration=15, duration_unit='m', symbol='frxEURUSD',
+                     timeout=None):
         '''
         Buys contract by proposal_id (the object where all parameters were already passed)
         or by given parameters.
@@ -307,53 +422,79 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
             - description
             - payout
             - start_time
+
+        Raises ConnectionLostError if connection is not ready,
+        BuyNotConfirmedError if it was lost while request was in flight
+        and RequestTimeoutError if response did not come in timeout:
+        in two last cases the contract could be bought, check portfolio before retrying
         :return: dict
         '''
 
         try:
-            curID = self.get_next_req_id()
-            curEvent = Event()
-            self.add_event(curID, curEvent)
-
-            if not proposal_id is None:
-                self.send_request(bin_api.get_buy_contract_json(proposal_id=proposal_id,
-                                                                price=amount,
-                                                                proposal_parameters=None,
-                                                                req_id=curID))
-            else:
-                proposal_parameters = bin_api.get_price_proposal_dict(amount=amount,
-                                                                      type=type,
-                                                                      duration=duration,
-                                                                      duration_unit=duration_unit,
-                                                                      symbol=symbol)
-                self.send_request(bin_api.get_buy_contract_json(proposal_id=1,
-                                                                proposal_parameters=proposal_parameters,
-                                                                price=amount,
-                                                                req_id=curID))
-
-            curEvent.wait()
-
-            response = self.get_response(curID)
-
-            if 'error' in response:
-                return {
-                    'error' : response['error']['message']
-                }
-            else:
-                return {
-                    'balance_after' : response['buy']['balance_after'],
-                    'buy_price' : response['buy']['buy_price'],
-                    'contract_id' : response['buy']['contract_id'],
-                    'description' : response['buy']['longcode'],
-                    'payout' : response['buy']['payout'],
-                    'start_time' : response['buy']['start_time']
-                }
+            return self.request_buy_contract(proposal_id, amount, type, duration, duration_unit, symbol).result(timeout)
+
+        except (ConnectionLostError, RequestTimeoutError):
+            raise
+
         except:
             ex_type, ex_val, ex_tb = sys.exc_info()
             logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
-            print(ex_val)
+            logging.error(ex_val)
+
+    def request_buy_for_accounts(self, tokens, proposal_id = None,
+                                 amount = 1, type='CALL', duration=15, duration_unit='m', symbol='frxEURUSD'):
+
+        pending = self.register_request(idempotent=False)
+
+        proposal_parameters = None
+        if proposal_id is None:
+            proposal_id = 1
+            proposal_parameters = bin_api.get_price_proposal_dict(amount=amount,
+                                                                  type=type,
+                                                                  duration=duration,
+                                                                  duration_unit=duration_unit,
+                                                                  symbol=symbol)
+
+        self.send_registered(pending, bin_api.get_buy_multiple_accounts_json(tokens=tokens,
+                                                                             proposal_id=proposal_id,
+                                                                             price=amount,
+                                                                             proposal_parameters=proposal_parameters,
+                                                                             req_id=pending.req_id))
+
+        return RequestHandle(pending, responses.parse_buy_multiple)
 
-    def get_price_proposal(self, contract_id, subscribe=0):
+    def buy_contract_for_accounts(self, tokens, proposal_id = None,
+                                  amount = 1, type='CALL', duration=15, duration_unit='m', symbol='frxEURUSD',
+                                  timeout=None):
+        '''
+        Buys the same contract for several accounts by one request.
+        This account's token must have 'admin' scope.
+        Parameters are the same as in buy_contract.
+
+        Returns dict where key is token and value is dict like buy_contract returns
+        (without balance_after). If Binary.com rejects the whole request,
+        returns dict with only keys 'error' and 'code'
+        (see SessionPool.buy_for_accounts to fall back to separate buys).
+
+        Raises the same errors as buy_contract
+        :param tokens: list of api tokens
+        :return: dict
+        '''
+
+        return self.request_buy_for_accounts(tokens, proposal_id, amount, type,
+                                             duration, duration_unit, symbol).result(timeout)
+
+    def request_price_proposal(self, contract_id):
+
+        pending = self.register_request()
+
+        self.send_registered(pending, bin_api.get_contract_proposal_json(contract_id=contract_id,
+                                                                         subscribe=0,
+                                                                         req_id=pending.req_id))
+
+        return RequestHandle(pending, responses.parse_contract_proposal)
+
+    def get_price_proposal(self, contract_id, subscribe=0, timeout=None):
         '''
         Returns information about opened position as dict
         Keys:
@@ -367,91 +508,123 @@ class BinaryAccount(mt_helper.MultiThreadWSHelper):
             - profit_percentage
             - contract_id
             - description
+            - bid_price
+            - payout
+            - is_sold
 
             - subscription_id
             - req_id
 
         Last two keys are only available for subscriptions.
+        If subscribe is 1 returns iterator over updates (see subscribe_price_proposal).
         This allows to forget subscription and then remove event
         :return: dict
         '''
 
-        curID = self.get_next_req_id()
-        curEvent = Event()
-        self.add_event(curID, curEvent)
-
-        self.send_request(bin_api.get_contract_proposal_json(contract_id=contract_id,
-                                                             subscribe=subscribe,
-                                                             req_id=curID))
-
         if subscribe == 1:
+            return iter(self.subscribe_price_proposal(contract_id, timeout=timeout))
 
-            saved_response = None
-
-            while True:
-
-                # if subscription had been removed
-                if not self.in_events(curID):
-                    return
-
-                curEvent.wait(10)
-                response = self.get_response(curID)
-                resp = response['proposal_open_contract']
-
-                curEvent.clear()
-
-                if response != saved_response:
-                    saved_response = response
-                    yield {
-                        'buy_price' : resp['buy_price'],
-                        'current_spot' : resp['current_spot'],
-                        'entry_spot' : resp['entry_spot'],
-                        'contract_type' : resp['contract_type'],
-                        'symbol' : resp['display_name'],
-                        'is_valid_to_sell' : resp['is_valid_to_sell'],
-                        'profit' : resp['profit'],
-                        'profit_percentage' : resp['profit_percentage'],
-                        'contract_id' : resp['contract_id'],
-                        'description' : resp['longcode'],
-                        'subscription_id' : response['subscription']['id'],
-                        'req_id' : curID
-                    }
+        return self.request_price_proposal(contract_id).result(timeout)
 
-        else:
+    def subscribe_price_proposal(self, contract_id, mode=Subscription.EVERY_UPDATE,
+                                 maxsize=100, listener=None, timeout=None):
+        '''
+        Subscribes to updates of opened position.
+        Returns Subscription which gives dicts described in get_price_proposal
+        (including subscription_id and req_id).
 
-            curEvent.wait()
+        If Binary.com rejects subscription, returned subscription
+        is already closed and has error message in 'error' attribute
+        :param contract_id:
+        :param mode: Subscription.EVERY_UPDATE or Subscription.LATEST_ONLY
+        :param maxsize: queue size for EVERY_UPDATE mode
+        :param listener: function called with subscription after each update
+        :return: Subscription
+        '''
 
-            response = self.get_response(curID)
-            resp = response['proposal_open_contract']
+        response, subscription = self.subscribe(bin_api.get_contract_proposal_json,
+                                                parser=responses.parse_contract_update,
+                                                mode=mode,
+                                                maxsize=maxsize,
+                                                listener=listener,
+                                                timeout=timeout,
+                                                contract_id=contract_id,
+                                                subscribe=1)
 
-            return {
-                'buy_price' : resp['buy_price'],
-                'current_spot' : resp['current_spot'],
-                'entry_spot' : resp['entry_spot'],
-                'contract_type' : resp['contract_type'],
-                'symbol' : resp['display_name'],
-                'is_valid_to_sell' : resp['is_valid_to_sell'],
-                'profit' : resp['profit'],
-                'profit_percentage' : resp['profit_percentage'],
-                'contract_id' : resp['contract_id'],
-                'description' : resp['longcode']
-            }
+        return subscription
 
-    def forget_subscription(self, subscription_id, event_to_remove = None):
+    def subscribe_open_contracts(self, maxsize=1000, listener=None, timeout=None):
         '''
-        Makes request to stop receive events by subscription
-        :return:
+        Subscribes to updates of all opened positions of account by one stream,
+        including positions bought after subscription.
+        Each update is dict described in get_price_proposal for one contract,
+        the last update of contract has is_sold 1.
+
+        Updates of different contracts share one subscription,
+        so it is always in EVERY_UPDATE mode: maxsize has to hold
+        updates of all the positions between reads (see portfolio_tracker)
+        :param maxsize: queue size
+        :param listener: function called with subscription after each update
+        :return: Subscription
         '''
 
-        curID = self.get_next_req_id()
-        curEvent = Event()
-        self.add_event(curID, curEvent)
-        self.send_request(bin_api.get_forget_stream_json(subscription_id, req_id=curID))
+        # the first response has no contract, only subscription id
+        response, subscription = self.subscribe(bin_api.get_contract_proposal_json,
+                                                parser=responses.parse_contract_update,
+                                                mode=Subscription.EVERY_UPDATE,
+                                                maxsize=maxsize,
+                                                listener=listener,
+                                                push_first=False,
+                                                timeout=timeout,
+                                                subscribe=1)
+
+        return subscription
+
+    def subscribe_buy_proposal(self, asset = 'frxEURUSD', amount = 1,
+                               duration = 15, duration_unit = 'm', type='CALL',
+                               mode=Subscription.LATEST_ONLY, listener=None, timeout=None):
+        '''
+        Subscribes to price proposal for buying an option on this connection,
+        so proposal_id can be bought by buy_contract(proposal_id=...).
+        Subscription gives dicts described in Binary.get_price_proposal
+        :return: Subscription
+        '''
 
-        curEvent.wait()
+        response, subscription = self.subscribe(bin_api.get_price_proposal_json,
+                                                parser=responses.parse_price_proposal,
+                                                mode=mode,
+                                                listener=listener,
+                                                timeout=timeout,
+                                                amount=amount,
+                                                type=type,
+                                                duration=duration,
+                                                duration_unit=duration_unit,
+                                                symbol=asset,
+                                                subscribe=1)
+
+        return subscription
+
+    def forget_subscription(self, subscription_id, event_to_remove = None, timeout=None):
+        '''
+        Makes request to stop receive events by subscription.
+        Subscription is forgotten locally even if RequestTimeoutError is raised
+        :return:
+        '''
 
-        if not event_to_remove is None:
-            self.remove_event(event_to_remove)
+        try:
+            # subscriptions are forgotten at Binary.com when connection is lost
+            if self.ready:
+                pending = self.register_request()
+                self.send_request(bin_api.get_forget_stream_json(subscription_id, req_id=pending.req_id))
+
+                try:
+                    pending.wait(timeout)
+                except ConnectionLostError:
+                    pass
+
+        finally:
+            if not event_to_remove is None:
+                self.forget_request(event_to_remove)
 
 
 
@@ -0,0 +1,434 @@
+'''
+    Local store of candles by (symbol, granularity).
+
+    Candles are kept in memory-mapped NumPy files of fixed-width records
+    (see _responses.CANDLE_DTYPE). Each file (chunk) holds CHUNK_SIZE slots, slot of candle
+    is its open time divided by granularity, so candle is found and written
+    without search. Empty slot has epoch 0.
+
+    Store remembers periods which are fetched completely (ranges.json),
+    so only missing periods are requested from Binary.com. A period
+    without candles (closed market) is covered as well and is not requested again.
+    The forming candle is stored but its period is not covered until it is closed.
+
+    Candles are read straight from files, so chart is drawn without
+    connection and switching symbol or timeframe does not wait for Binary.com.
+
+    Layout:
+        <directory>/<symbol>/<granularity>/<chunk number>.npy
+        <directory>/<symbol>/<granularity>/ranges.json
+
+    Directory is per-user cache directory by default (see get_default_directory).
+
+    Usage:
+        store = CandleStore()
+        series = store.get_series('frxEURUSD', 60)
+        candles = series.get_latest(20, binary)     # fetches only what is missing
+        array = series.read(date_from, date_to)     # numpy structured array
+'''
+
+from Binary._pipeline import HandleSet
+from Binary._responses import CANDLE_DTYPE
+from threading import Lock
+import numpy as np
+import json
+import os
+import time
+import logging
+import sys
+import traceback
+
+
+# slots in one file
+CHUNK_SIZE = 4096
+
+# candles given by one ticks_history request
+MAX_CANDLES = 5000
+
+
+def get_default_directory():
+    '''
+    Returns candles directory in cache of current user:
+        - %LOCALAPPDATA%\\ForHedge\\candles on Windows
+        - $XDG_CACHE_HOME/ForHedge/candles or ~/.cache/ForHedge/candles otherwise
+    :return: str
+    '''
+
+    if os.name == 'nt' and 'LOCALAPPDATA' in os.environ:
+        cache = os.environ['LOCALAPPDATA']
+    else:
+        cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(cache, 'ForHedge', 'candles')
+
+
+def merge_ranges(ranges):
+    '''
+    Merges overlapping and adjacent ranges
+    :param ranges: list of [start, end] with inclusive ends
+    :return: sorted list of [start, end]
+    '''
+
+    merged = []
+    for start, end in sorted(ranges):
+        if len(merged) > 0 and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    return merged
+
+
+class CandleSeries:
+    '''
+        Candles of one symbol and granularity.
+        Times are open times of candles (epoch). Can be used from different threads.
+
+        Statistics:
+            - requests - ticks_history requests made by fetch
+            - fetched - candles received
+            - read - candles read from files
+    '''
+
+    def __init__(self, directory, symbol, granularity):
+
+        self.directory = directory
+        self.symbol = symbol
+        self.granularity = granularity
+
+        self.lock = Lock()
+
+        # key - chunk number, value - numpy memmap
+        self.chunks = dict()
+
+        # covered periods as list of [start, end]
+        self.ranges = []
+
+        self.requests = 0
+        self.fetched = 0
+        self.read_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.load_ranges()
+
+    def get_ranges_path(self):
+        return os.path.join(self.directory, 'ranges.json')
+
+    def load_ranges(self):
+
+        try:
+            with open(self.get_ranges_path()) as file:
+                self.ranges = merge_ranges(json.load(file))
+        except FileNotFoundError:
+            self.ranges = []
+        except ValueError:
+            # ranges are written after candles, so store is only refetched
+            logging.error('Covered periods of {} {} are damaged'.format(self.symbol, self.granularity))
+            self.ranges = []
+
+    def save_ranges(self):
+        '''
+        Writes covered periods. Have to be called under self.lock after candles are flushed
+        '''
+
+        path = self.get_ranges_path()
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.ranges, file)
+        os.replace(path + '.tmp', path)
+
+    def get_chunk(self, number, create=False):
+        '''
+        Returns memmap of chunk. Have to be called under self.lock
+        :return: numpy memmap or None if chunk is not created
+        '''
+
+        chunk = self.chunks.get(number)
+        if not chunk is None:
+            return chunk
+
+        path = os.path.join(self.directory, '{}.npy'.format(number))
+        if os.path.exists(path):
+            chunk = np.lib.format.open_memmap(path, mode='r+')
+        elif create:
+            chunk = np.lib.format.open_memmap(path, mode='w+', dtype=CANDLE_DTYPE, shape=(CHUNK_SIZE,))
+        else:
+            return None
+
+        self.chunks[number] = chunk
+
+        return chunk
+
+    def get_closed_end(self, now=None):
+        '''
+        Returns the latest time which candles are closed by
+        :return: int
+        '''
+
+        now = int(time.time()) if now is None else now
+
+        return now - now % self.granularity - 1
+
+    def write(self, candles, covered_from=None, covered_to=None):
+        '''
+        Writes candles and marks period as covered
+        :param candles: list of tuple(date, open, high, low, close) or array of CANDLE_DTYPE
+        :param covered_from: start of period which all the candles are given for, None to cover nothing
+        :param covered_to: end of that period, it is cut by the forming candle
+        :return: None
+        '''
+
+        candles = np.asarray(candles, dtype=CANDLE_DTYPE) if len(candles) > 0 else \
+                  np.empty(0, dtype=CANDLE_DTYPE)
+        slots = candles['epoch'] // self.granularity
+        numbers = slots // CHUNK_SIZE
+
+        with self.lock:
+            for number in np.unique(numbers):
+                selected = numbers == number
+                chunk = self.get_chunk(int(number), create=True)
+                chunk[slots[selected] % CHUNK_SIZE] = candles[selected]
+                # candles reach the disk before the period is marked covered
+                chunk.flush()
+
+            if not covered_from is None:
+                covered_to = min(covered_to, self.get_closed_end())
+                if covered_from <= covered_to:
+                    self.ranges = merge_ranges(self.ranges + [[covered_from, covered_to]])
+                    self.save_ranges()
+
+    def read(self, date_from, date_to):
+        '''
+        Returns stored candles opened from date_from to date_to
+        :return: numpy array of CANDLE_DTYPE sorted by epoch
+        '''
+
+        first = date_from // self.granularity
+        last = date_to // self.granularity
+
+        parts = []
+        with self.lock:
+            for number in range(first // CHUNK_SIZE, last // CHUNK_SIZE + 1):
+                chunk = self.get_chunk(number)
+                if chunk is None:
+                    continue
+
+                begin = max(first - number * CHUNK_SIZE, 0)
+                end = min(last - number * CHUNK_SIZE + 1, CHUNK_SIZE)
+                part = chunk[begin:end]
+                parts.append(part[part['epoch'] != 0])
+
+        candles = np.concatenate(parts) if len(parts) > 0 else np.empty(0, dtype=CANDLE_DTYPE)
+        self.read_count += len(candles)
+
+        return candles
+
+    def read_latest(self, count, date_to):
+        '''
+        Returns the latest count stored candles opened by date_to
+        :return: numpy array of CANDLE_DTYPE sorted by epoch
+        '''
+
+        parts = []
+        found = 0
+        last = date_to // self.granularity
+
+        with self.lock:
+            numbers = sorted((int(name[:-4]) for name in os.listdir(self.directory)
+                              if name.endswith('.npy') and name[:-4].lstrip('-').isdigit()), reverse=True)
+
+        for number in numbers:
+            if number > last // CHUNK_SIZE:
+                continue
+
+            part = self.read(number * CHUNK_SIZE * self.granularity,
+                             min(date_to, ((number + 1) * CHUNK_SIZE - 1) * self.granularity))
+            parts.append(part)
+            found += len(part)
+            if found >= count:
+                break
+
+        if len(parts) == 0:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+
+        return np.concatenate(parts[::-1])[-count:]
+
+    def get_missing(self, date_from, date_to):
+        '''
+        Returns periods from date_from to date_to which are not covered
+        :return: list of tuple(start, end)
+        '''
+
+        missing = []
+        start = date_from
+
+        with self.lock:
+            for covered_from, covered_to in self.ranges:
+                if covered_to < start:
+                    continue
+                if covered_from > date_to:
+                    break
+                if covered_from > start:
+                    missing.append((start, covered_from - 1))
+                start = covered_to + 1
+
+        if start <= date_to:
+            missing.append((start, date_to))
+
+        return missing
+
+    def get_covered_start(self, date_to):
+        '''
+        Returns start of covered period which contains date_to
+        :return: int or None if date_to is not covered
+        '''
+
+        with self.lock:
+            for covered_from, covered_to in self.ranges:
+                if covered_from <= date_to <= covered_to:
+                    return covered_from
+
+        return None
+
+    def fetch(self, binary, date_from, date_to, timeout=None):
+        '''
+        Requests candles of periods which are not covered.
+        Periods are split by MAX_CANDLES candles and requested concurrently
+        :param binary: opened Binary
+        :return: number of candles received
+        '''
+
+        # from open time of candle which contains date_from
+        date_from -= date_from % self.granularity
+
+        pages = []
+        for start, end in self.get_missing(date_from, date_to):
+            # candles opened from start to end, the forming one is requested anyway
+            start = start + (-start) % self.granularity
+            while start <= end:
+                page_end = min(start + MAX_CANDLES * self.granularity - 1, end)
+                pages.append((start, page_end))
+                start = page_end + 1
+
+        if len(pages) == 0:
+            return 0
+
+        handles = HandleSet([binary.request_history(asset=self.symbol, granularity=self.granularity,
+                                                    count=MAX_CANDLES, start=start, end=end, output='array')
+                             for start, end in pages])
+        results = handles.gather(timeout)
+        self.requests += len(pages)
+
+        received = 0
+        for (start, end), candles in zip(pages, results):
+            if candles is None:
+                continue
+            self.write(candles, start, end)
+            received += len(candles)
+
+        self.fetched += received
+
+        return received
+
+    def fetch_before(self, binary, count, date_to, timeout=None):
+        '''
+        Requests count candles opened before date_to
+        (e.g. the last candles before closed market)
+        :return: number of candles received
+        '''
+
+        candles = binary.get_history(asset=self.symbol, granularity=self.granularity,
+                                     count=count, end=date_to, timeout=timeout, output='array')
+        self.requests += 1
+        if candles is None:
+            return 0
+
+        # the first candle given is the start of covered period, whole period if there are less of them
+        self.write(candles, int(candles['epoch'][0]) if len(candles) == count else 1, date_to)
+        self.fetched += len(candles)
+
+        return len(candles)
+
+    def get_latest(self, count, binary=None, timeout=None):
+        '''
+        Returns the latest count candles including the forming one.
+        Missing candles are fetched if binary is given,
+        otherwise stored ones are returned
+        :param binary: opened Binary or None to read only stored candles
+        :return: list of tuple(date, open, high, low, close) like Binary.get_history
+        '''
+
+        now = int(time.time())
+
+        if not binary is None:
+            try:
+                last_open = now - now % self.granularity
+                self.fetch(binary, last_open - (count - 1) * self.granularity, now, timeout)
+
+                # market was closed - take candles before the window
+                stored = len(self.read_latest(count, now))
+                covered_from = self.get_covered_start(last_open - 1)
+                if stored < count and not covered_from is None and covered_from > 1:
+                    self.fetch_before(binary, count - stored, covered_from - 1, timeout)
+            except:
+                # stored candles are shown without connection
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+        return self.read_latest(count, now).tolist()
+
+    def close(self):
+
+        with self.lock:
+            for chunk in self.chunks.values():
+                chunk.flush()
+            self.chunks = dict()
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        return {
+            'requests' : self.requests,
+            'fetched' : self.fetched,
+            'read' : self.read_count,
+            'ranges' : len(self.ranges)
+        }
+
+
+class CandleStore:
+    '''
+        Directory of CandleSeries by symbol and granularity
+    '''
+
+    def __init__(self, directory=None):
+        '''
+        :param directory: str or None to use get_default_directory()
+        '''
+
+        self.directory = get_default_directory() if directory is None else directory
+        self.lock = Lock()
+
+        # key - tuple(symbol, granularity), value - CandleSeries
+        self.series = dict()
+
+    def get_series(self, symbol, granularity):
+        '''
+        :return: CandleSeries
+        '''
+
+        with self.lock:
+            key = (symbol, granularity)
+            if not key in self.series:
+                self.series[key] = CandleSeries(os.path.join(self.directory, symbol, str(granularity)),
+                                                symbol, granularity)
+            return self.series[key]
+
+    def close(self):
+
+        with self.lock:
+            for series in self.series.values():
+                series.close()
+            self.series = dict()
@@ -0,0 +1,281 @@
+'''
+    Warm cache of hedge proposals.
+
+    Hedge bought by parameters makes Binary.com price the contract inside buy request.
+    HedgeProposalCache keeps live CALL and PUT proposals for each hedged symbol
+    at hedge stake and duration, and buy requests serialized beforehand.
+    When MetaTrader order comes, hedge is one 'buy' frame by proposal id.
+
+    Usage:
+        cache = HedgeProposalCache(account, ['frxEURUSD'], amount=1, duration=120)
+        cache.start()
+        ...
+        result = cache.buy('frxEURUSD', 'PUT')
+'''
+
+import Binary._binary_general as bin_api
+import Binary._responses as responses
+from Binary._errors import ConnectionLostError, BuyNotConfirmedError
+from threading import Thread, Lock
+import time
+import logging
+import sys
+import traceback
+
+
+class HedgeProposalCache:
+    '''
+        Keeps live proposals for each (symbol, contract type) on given BinaryAccount.
+
+        Proposal is used if it is not older than max_age seconds,
+        otherwise (or if Binary.com rejects it) hedge is bought by parameters.
+
+        Statistics:
+            - armed_buys / fallback_buys
+            - expired - proposals which were too old to buy
+            - armed_latency / fallback_latency - average buy time in seconds
+            - saved_last / saved_total - latency saved by armed buys
+              compared with average buy by parameters
+              (or with fallback_latency until there are fallback buys)
+    '''
+
+    CONTRACT_TYPES = ('CALL', 'PUT')
+
+    def __init__(self, account, symbols, amount, duration, duration_unit='m', max_age=5,
+                 fallback_latency=None, buy_timeout=None):
+        '''
+        :param fallback_latency: seconds of buy by parameters measured before cache was armed,
+                                 None if unknown
+        :param buy_timeout: seconds to wait for buy response, None to wait default_timeout of account
+        '''
+
+        self.account = account
+        self.symbols = list(symbols)
+        self.amount = amount
+        self.duration = duration
+        self.duration_unit = duration_unit
+        self.max_age = max_age
+        self.buy_timeout = buy_timeout
+
+        '''
+            key - tuple(symbol, contract type)
+            value - Subscription
+        '''
+        self.subscriptions = dict()
+
+        '''
+            key - tuple(symbol, contract type)
+            value - dict with keys:
+                - proposal_id
+                - payout
+                - received - monotonic time
+                - buy_prefix - buy request without req_id
+        '''
+        self.proposals = dict()
+
+        self.lock = Lock()
+        self.closed = False
+
+        self.armed_buys = 0
+        self.fallback_buys = 0
+        self.expired = 0
+        self.armed_time = 0.0
+        self.fallback_time = 0.0
+        self.saved_last = 0.0
+        self.saved_total = 0.0
+        self.fallback_latency = fallback_latency
+
+    def matches(self, account, amount, duration):
+        '''
+        Checks if cache was armed for given session and hedge settings
+        :return: bool
+        '''
+        return self.account is account and self.amount == amount and self.duration == duration
+
+    def start(self):
+        '''
+        Subscribes to proposals in background
+        :return: None
+        '''
+        Thread(target=self.arm, daemon=True).start()
+
+    def arm(self):
+        '''
+        Subscribes to all the proposals. Blocks until first proposals come
+        :return: None
+        '''
+
+        for symbol in self.symbols:
+            for type in HedgeProposalCache.CONTRACT_TYPES:
+                if self.closed:
+                    return
+
+                try:
+                    subscription = self.account.subscribe_buy_proposal(asset=symbol,
+                                                                       amount=self.amount,
+                                                                       duration=self.duration,
+                                                                       duration_unit=self.duration_unit,
+                                                                       type=type,
+                                                                       listener=lambda subscription, key=(symbol, type):
+                                                                                self.on_update(key, subscription))
+                except:
+                    ex_type, ex_val, ex_tb = sys.exc_info()
+                    logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+                    continue
+
+                if not subscription.error is None:
+                    logging.error('Hedge proposal {} {}: {}'.format(symbol, type, subscription.error))
+                    continue
+
+                with self.lock:
+                    self.subscriptions[(symbol, type)] = subscription
+
+    def on_update(self, key, subscription):
+        '''
+        Listener of proposal subscriptions. Keeps the latest proposal and its buy request
+        :param key: tuple(symbol, contract type)
+        :param subscription: Subscription
+        :return: None
+        '''
+
+        proposal = subscription.get_nowait()
+        if proposal is None or proposal['error']:
+            return
+
+        buy_prefix = bin_api.get_buy_contract_prefix(proposal['proposal_id'], self.amount)
+
+        with self.lock:
+            self.proposals[key] = {
+                'proposal_id' : proposal['proposal_id'],
+                'payout' : proposal['payout'],
+                'received' : time.monotonic(),
+                'buy_prefix' : buy_prefix
+            }
+
+    def get_armed(self, symbol, type):
+        '''
+        Returns fresh proposal or None
+        :return: dict
+        '''
+
+        with self.lock:
+            proposal = self.proposals.get((symbol, type))
+            subscription = self.subscriptions.get((symbol, type))
+
+            if proposal is None or subscription is None or subscription.closed:
+                return None
+
+            if time.monotonic() - proposal['received'] > self.max_age:
+                self.expired += 1
+                return None
+
+            # proposal can be bought only once
+            self.proposals.pop((symbol, type))
+
+        return proposal
+
+    def buy(self, symbol, type, timeout=None):
+        '''
+        Buys hedge by armed proposal or by parameters if there is no fresh one
+        (or armed buy could not be sent).
+        Returns the same dict as BinaryAccount.buy_contract with additional key:
+            - armed - True if hedge was bought by armed proposal
+
+        BuyNotConfirmedError and RequestTimeoutError are raised as by BinaryAccount.buy_contract:
+        the contract could be bought, so it is not bought again
+        :param symbol: str
+        :param type: 'CALL' or 'PUT'
+        :param timeout: seconds to wait for each buy response or None to wait buy_timeout
+        :return: dict
+        '''
+
+        timeout = self.buy_timeout if timeout is None else timeout
+        proposal = self.get_armed(symbol, type)
+
+        if not proposal is None:
+            start = time.perf_counter()
+            try:
+                result = self.account.send_prepared_request(proposal['buy_prefix'],
+                                                            responses.parse_buy).result(timeout)
+            except BuyNotConfirmedError:
+                raise
+            except ConnectionLostError as e:
+                # request was not sent, so buying by parameters can not double it
+                result = {'error' : str(e)}
+            elapsed = time.perf_counter() - start
+
+            if not 'error' in result:
+                self.register_buy(True, elapsed)
+                result['armed'] = True
+                return result
+
+            logging.error('Armed hedge was not bought: ' + result['error'])
+
+        start = time.perf_counter()
+        result = self.account.buy_contract(amount=self.amount,
+                                           type=type,
+                                           duration=self.duration,
+                                           duration_unit=self.duration_unit,
+                                           symbol=symbol,
+                                           timeout=timeout)
+        self.register_buy(False, time.perf_counter() - start)
+
+        if not result is None:
+            result['armed'] = False
+
+        return result
+
+    def register_buy(self, armed, elapsed):
+
+        with self.lock:
+            if armed:
+                self.armed_buys += 1
+                self.armed_time += elapsed
+
+                # compare with average buy by parameters or with the one measured before
+                baseline = self.fallback_time / self.fallback_buys if self.fallback_buys > 0 \
+                           else self.fallback_latency
+                if not baseline is None:
+                    self.saved_last = baseline - elapsed
+                    self.saved_total += self.saved_last
+            else:
+                self.fallback_buys += 1
+                self.fallback_time += elapsed
+
+    def get_stats(self):
+        '''
+        Returns cache statistics as dict
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'armed_proposals' : len(self.proposals),
+                'armed_buys' : self.armed_buys,
+                'fallback_buys' : self.fallback_buys,
+                'expired' : self.expired,
+                'armed_latency' : self.armed_time / self.armed_buys if self.armed_buys else 0.0,
+                'fallback_latency' : self.fallback_time / self.fallback_buys if self.fallback_buys else 0.0,
+                'saved_last' : self.saved_last,
+                'saved_total' : self.saved_total
+            }
+
+    def close(self):
+        '''
+        Forgets all proposal subscriptions
+        :return: None
+        '''
+
+        self.closed = True
+
+        with self.lock:
+            subscriptions = list(self.subscriptions.values())
+            self.subscriptions.clear()
+            self.proposals.clear()
+
+        for subscription in subscriptions:
+            try:
+                subscription.close()
+            except:
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
@@ -0,0 +1,372 @@
+'''
+    Local copy of account statement and profit table.
+
+    HistorySync pulls the whole statement and profit table of BinaryAccount
+    by pages requested concurrently, and after the first sync only
+    transactions since the last synced time. HistoryStore keeps them in
+    SQLite indexed by contract_id and time, so reports over months of history
+    are local queries instead of hundreds of API calls.
+
+    Usage:
+        store = HistoryStore('history.sqlite')
+        HistorySync(account, store).sync()
+        store.get_profit_summary(account.loginid, date_from=month_start)
+'''
+
+from Binary._pipeline import HandleSet
+from threading import Lock
+import sqlite3
+import time
+import logging
+import sys
+import traceback
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS statement (
+    account TEXT NOT NULL,
+    transaction_id INTEGER NOT NULL,
+    contract_id INTEGER,
+    action TEXT,
+    amount REAL,
+    balance_after REAL,
+    payout REAL,
+    reference_id INTEGER,
+    transaction_time INTEGER NOT NULL,
+    description TEXT,
+    PRIMARY KEY (account, transaction_id)
+);
+CREATE INDEX IF NOT EXISTS statement_time ON statement (account, transaction_time);
+CREATE INDEX IF NOT EXISTS statement_contract ON statement (account, contract_id);
+
+CREATE TABLE IF NOT EXISTS profit_table (
+    account TEXT NOT NULL,
+    contract_id INTEGER NOT NULL,
+    price REAL,
+    potential_payout REAL,
+    sell_price REAL,
+    purchase_time INTEGER,
+    sell_time INTEGER NOT NULL,
+    description TEXT,
+    PRIMARY KEY (account, contract_id)
+);
+CREATE INDEX IF NOT EXISTS profit_table_time ON profit_table (account, sell_time, contract_id);
+CREATE INDEX IF NOT EXISTS profit_table_purchase_time ON profit_table (account, purchase_time, contract_id);
+CREATE INDEX IF NOT EXISTS profit_table_profit ON profit_table (account, sell_price - price, contract_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    account TEXT NOT NULL,
+    name TEXT NOT NULL,
+    synced_to INTEGER NOT NULL,
+    PRIMARY KEY (account, name)
+);
+'''
+
+STATEMENT_COLUMNS = ('transaction_id', 'contract_id', 'action', 'amount', 'balance_after',
+                     'payout', 'reference_id', 'transaction_time', 'description')
+
+PROFIT_TABLE_COLUMNS = ('contract_id', 'price', 'potential_payout', 'sell_price',
+                        'purchase_time', 'sell_time', 'description')
+
+'''
+    key - sort key of get_profit_table
+    value - SQL expression
+'''
+PROFIT_TABLE_ORDER = {
+    'contract_id' : 'contract_id',
+    'price' : 'price',
+    'potential_payout' : 'potential_payout',
+    'sell_price' : 'sell_price',
+    'profit' : 'sell_price - price',
+    'purchase_time' : 'purchase_time',
+    'sell_time' : 'sell_time',
+    'description' : 'description'
+}
+
+
+class HistoryStore:
+    '''
+        SQLite store of statements and profit tables of accounts.
+        Account is loginid given by authorization (tokens are not stored).
+        Rows are returned in the same dicts as BinaryAccount.get_statement
+        and BinaryAccount.get_profit_table, the latest first.
+        Can be used from different threads.
+    '''
+
+    def __init__(self, path=':memory:'):
+
+        self.path = path
+        self.lock = Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            # readers (windows) do not block sync
+            self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+
+        with self.lock:
+            self.connection.close()
+
+    def insert(self, table, columns, account, rows):
+        '''
+        Inserts rows which are not stored yet
+        :return: number of inserted rows
+        '''
+
+        query = 'INSERT OR IGNORE INTO {} (account, {}) VALUES ({})'.format(
+            table, ', '.join(columns), ', '.join('?' * (len(columns) + 1)))
+
+        with self.lock:
+            before = self.connection.total_changes
+            self.connection.executemany(query, [(account,) + tuple(row[c] for c in columns) for row in rows])
+            self.connection.commit()
+
+            return self.connection.total_changes - before
+
+    def insert_statement(self, account, rows):
+        return self.insert('statement', STATEMENT_COLUMNS, account, rows)
+
+    def insert_profit_table(self, account, rows):
+        return self.insert('profit_table', PROFIT_TABLE_COLUMNS, account, rows)
+
+    def select(self, table, columns, time_column, account, date_from=None, date_to=None,
+               limit=None, offset=0, where='', parameters=(), order_by=None, descending=True):
+
+        query = 'SELECT {} FROM {} WHERE account = ?'.format(', '.join(columns), table)
+        arguments = [account]
+
+        if not date_from is None:
+            query += ' AND {} >= ?'.format(time_column)
+            arguments.append(date_from)
+        if not date_to is None:
+            query += ' AND {} <= ?'.format(time_column)
+            arguments.append(date_to)
+
+        # id breaks ties of the same value
+        direction = 'DESC' if descending else 'ASC'
+        query += where + ' ORDER BY {0} {1}, {2} {1}'.format(time_column if order_by is None else order_by,
+                                                             direction, columns[0])
+        arguments.extend(parameters)
+
+        if not limit is None:
+            query += ' LIMIT ? OFFSET ?'
+            arguments.extend((limit, offset))
+
+        with self.lock:
+            return [dict(zip(columns, row)) for row in self.connection.execute(query, arguments)]
+
+    def get_statement(self, account, date_from=None, date_to=None, limit=None, offset=0):
+        '''
+        Returns transactions of account by transaction_time
+        :return: list of dict
+        '''
+
+        return self.select('statement', STATEMENT_COLUMNS, 'transaction_time',
+                           account, date_from, date_to, limit, offset)
+
+    def get_profit_table(self, account, date_from=None, date_to=None, limit=None, offset=0,
+                         order_by='sell_time', descending=True):
+        '''
+        Returns sold contracts of account sold in period
+        :param order_by: key of PROFIT_TABLE_ORDER
+        :return: list of dict
+        '''
+
+        return self.select('profit_table', PROFIT_TABLE_COLUMNS, 'sell_time',
+                           account, date_from, date_to, limit, offset,
+                           order_by=PROFIT_TABLE_ORDER[order_by], descending=descending)
+
+    def count_profit_table(self, account, date_from=None, date_to=None):
+        '''
+        Returns number of contracts sold in period
+        :return: int
+        '''
+
+        return self.get_profit_summary(account, date_from, date_to)['contracts']
+
+    def get_contract_transactions(self, account, contract_id):
+        '''
+        Returns statement transactions of one contract (buy, sell)
+        :return: list of dict
+        '''
+
+        return self.select('statement', STATEMENT_COLUMNS, 'transaction_time', account,
+                           where=' AND contract_id = ?', parameters=(contract_id,))
+
+    def get_profit_summary(self, account, date_from=None, date_to=None):
+        '''
+        Returns totals of contracts sold in period as dict
+        Keys:
+            - contracts
+            - bought - sum of buy prices
+            - sold - sum of sell prices
+            - profit
+            - won - contracts sold with profit
+        :return: dict
+        '''
+
+        query = 'SELECT COUNT(*), TOTAL(price), TOTAL(sell_price), TOTAL(sell_price > price) ' \
+                'FROM profit_table WHERE account = ?'
+        arguments = [account]
+
+        if not date_from is None:
+            query += ' AND sell_time >= ?'
+            arguments.append(date_from)
+        if not date_to is None:
+            query += ' AND sell_time <= ?'
+            arguments.append(date_to)
+
+        with self.lock:
+            contracts, bought, sold, won = self.connection.execute(query, arguments).fetchone()
+
+        return {
+            'contracts' : contracts,
+            'bought' : bought,
+            'sold' : sold,
+            'profit' : sold - bought,
+            'won' : int(won)
+        }
+
+    def count(self, table, account):
+
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM {} WHERE account = ?'.format(table),
+                                           (account,)).fetchone()[0]
+
+    def get_synced_to(self, account, name):
+        '''
+        Returns time of the latest synced row of statement or profit_table
+        :return: int, 0 if it was never synced
+        '''
+
+        with self.lock:
+            row = self.connection.execute('SELECT synced_to FROM sync_state WHERE account = ? AND name = ?',
+                                          (account, name)).fetchone()
+
+        return 0 if row is None else row[0]
+
+    def set_synced_to(self, account, name, synced_to):
+
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO sync_state (account, name, synced_to) VALUES (?, ?, ?)',
+                                    (account, name, synced_to))
+            self.connection.commit()
+
+
+class HistorySync:
+    '''
+        Copies statement and profit table of opened BinaryAccount into HistoryStore.
+
+        Pages of page_size rows are requested concurrently by concurrency
+        requests at once (Binary.com allows up to 999 rows per page).
+        Period is fixed by sync start time, so offsets do not shift
+        when new transactions come during sync. The next sync requests
+        transactions from the latest synced time: rows of that second are
+        requested again and skipped by the store.
+        Profit table is synced by sell time.
+
+        Statistics:
+            - syncs
+            - requests - pages requested
+            - inserted - new rows
+            - last_duration - seconds of the last sync
+    '''
+
+    def __init__(self, account, store, page_size=500, concurrency=4, timeout=60):
+
+        self.account = account
+        self.store = store
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        self.syncs = 0
+        self.requests = 0
+        self.inserted = 0
+        self.last_duration = 0.0
+
+    def sync(self, tables=('statement', 'profit_table')):
+        '''
+        Fetches new transactions of statement and profit table
+        :param tables: names of tables to sync
+        :return: dict - number of new rows by table name,
+                 None if the table failed to sync
+        '''
+
+        start = time.perf_counter()
+
+        result = dict()
+        if 'statement' in tables:
+            result['statement'] = self.sync_table('statement', self.account.request_statement,
+                                                  self.store.insert_statement, 'transaction_time')
+        if 'profit_table' in tables:
+            result['profit_table'] = self.sync_table('profit_table', self.account.request_profit_table,
+                                                     self.store.insert_profit_table, 'sell_time')
+
+        self.syncs += 1
+        self.last_duration = time.perf_counter() - start
+
+        return result
+
+    def sync_table(self, name, request, insert, time_key):
+        '''
+        Fetches pages of one table until the last one
+        :return: number of new rows or None if sync failed
+        '''
+
+        account = self.account.loginid
+        synced_to = self.store.get_synced_to(account, name)
+
+        # date range is applied only if both bounds are set
+        date_from = max(synced_to, 1)
+        date_to = int(time.time()) + 1
+
+        inserted = 0
+        latest = synced_to
+        offset = 0
+
+        try:
+            while True:
+                handles = HandleSet([request(limit=self.page_size,
+                                             date_from=date_from,
+                                             date_to=date_to,
+                                             offset=offset + i * self.page_size)
+                                     for i in range(self.concurrency)])
+                pages = handles.gather(self.timeout)
+                self.requests += len(pages)
+
+                rows = [row for page in pages for row in page]
+                inserted += insert(account, rows)
+                latest = max([latest] + [row[time_key] for row in rows])
+
+                if any(len(page) < self.page_size for page in pages):
+                    break
+
+                offset += self.concurrency * self.page_size
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error('Sync of {} failed: {}\n'.format(name, ex_val)+'\n'.join(traceback.format_tb(ex_tb)))
+            return None
+
+        # all the rows up to latest are stored - the next sync starts from here
+        self.store.set_synced_to(account, name, latest)
+        self.inserted += inserted
+
+        return inserted
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        return {
+            'syncs' : self.syncs,
+            'requests' : self.requests,
+            'inserted' : self.inserted,
+            'last_duration' : self.last_duration
+        }
@@ -0,0 +1,103 @@
+'''
+    Export of connection statistics in Prometheus text format.
+
+    Usage:
+        samples = metrics.collect(binary_account, {'session' : '1'})
+        metrics.write_metrics('binary.prom', samples)
+
+    File can be read by node_exporter textfile collector
+    or just looked at when hedge is slow:
+    high binary_rtt_seconds means network or Binary.com,
+    high binary_processing_seconds means our own process.
+'''
+
+import os
+
+
+def collect(client, labels=None):
+    '''
+    Returns statistics of Binary or BinaryAccount connection
+    :param client: Binary or BinaryAccount
+    :param labels: dict of labels added to each sample
+    :return: list of tuple(name, labels, value)
+    '''
+
+    labels = dict() if labels is None else labels
+    samples = []
+
+    def add(name, value, **extra):
+        sample_labels = dict(labels)
+        sample_labels.update(extra)
+        samples.append((name, sample_labels, value))
+
+    latency = client.get_latency_stats()
+    for quantile, key in (('0.5', 'rtt_p50'), ('0.9', 'rtt_p90'), ('0.99', 'rtt_p99'), ('1', 'rtt_max')):
+        add('binary_rtt_seconds', latency[key], quantile=quantile)
+    for quantile, key in (('0.5', 'processing_p50'), ('0.99', 'processing_p99'), ('1', 'processing_max')):
+        add('binary_processing_seconds', latency[key], quantile=quantile)
+
+    # histogram buckets are cumulative
+    total = 0
+    for bound, count in client.latency.get_histogram():
+        total += count
+        add('binary_rtt_window_bucket', total, le='+Inf' if bound == float('inf') else str(bound))
+
+    add('binary_pings_total', latency['pings'])
+    add('binary_ping_timeouts_total', latency['timeouts'])
+    add('binary_connection_degraded', int(latency['degraded']))
+    add('binary_connection_ready', int(client.ready))
+
+    reconnect = client.get_reconnect_stats()
+    add('binary_reconnects_total', reconnect['reconnects'])
+    add('binary_recovery_seconds', reconnect['recovery_last'], stat='last')
+    add('binary_recovery_seconds', reconnect['recovery_max'], stat='max')
+    add('binary_failed_in_flight_total', reconnect['failed_in_flight'])
+    add('binary_lost_requests_total', reconnect['lost_requests'])
+    add('binary_lost_subscriptions_total', reconnect['lost_subscriptions'])
+
+    scheduler = client.get_scheduler_stats()
+    for category, count in scheduler.pop('throttled').items():
+        add('binary_throttled_requests_total', count, group=category)
+    for name, stats in scheduler.items():
+        add('binary_scheduler_depth', stats['depth'], priority=name)
+        add('binary_scheduler_wait_seconds', stats['wait_avg'], priority=name, stat='avg')
+        add('binary_scheduler_wait_seconds', stats['wait_max'], priority=name, stat='max')
+        add('binary_scheduler_sent_total', stats['sent'], priority=name)
+
+    store = client.get_store_stats()
+    add('binary_pending_requests', store['pending'])
+    add('binary_unclaimed_responses', store['responses'])
+
+    return samples
+
+
+def format_metrics(samples):
+    '''
+    Formats samples in Prometheus text format
+    :param samples: list of tuple(name, labels, value)
+    :return: str
+    '''
+
+    lines = []
+    for name, labels, value in samples:
+        if len(labels) > 0:
+            name += '{' + ','.join('{}="{}"'.format(k, v) for k, v in sorted(labels.items())) + '}'
+        lines.append('{} {}'.format(name, value))
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path, samples):
+    '''
+    Writes samples into file. File is replaced at once,
+    so reader never sees half-written file
+    :param path: str
+    :param samples: list of tuple(name, labels, value)
+    :return: None
+    '''
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(format_metrics(samples))
+
+    os.replace(tmp_path, path)
@@ -0,0 +1,301 @@
+'''
+    Live opened positions of BinaryAccount.
+
+    Portfolio is loaded once, then all the positions are updated by one
+    proposal_open_contract stream of the whole account (see
+    BinaryAccount.subscribe_open_contracts) instead of a stream
+    and a polling thread per contract. Totals are kept incrementally:
+    each update changes them by difference of its contract only.
+
+    Consumer (e.g. window timer) takes changed positions by take_changes(),
+    so a contract updated several times between reads is painted once.
+
+    Usage:
+        tracker = PortfolioTracker(account)
+        tracker.start()
+        ...
+        changed, sold = tracker.take_changes()
+        totals = tracker.get_totals()
+        ...
+        tracker.stop()
+'''
+
+from threading import Thread, Lock
+import logging
+import sys
+import traceback
+
+
+class PortfolioTracker:
+    '''
+        Opened positions by contract_id, dicts with keys:
+            - contract_id
+            - symbol
+            - contract_type
+            - description
+            - buy_price
+            - payout
+            - date_end - epoch, None if position is bought after start
+            - bid_price - None until the first update
+            - profit - None until the first update
+            - current_spot
+            - is_sold
+
+        If connection is lost, updates of downtime are lost:
+        portfolio is reloaded when the stream is restored, positions
+        sold meanwhile are reported as sold with their last state.
+
+        Statistics:
+            - updates - contract updates applied
+            - coalesced - updates replaced by newer ones before they were taken
+            - reloads - portfolio loads
+    '''
+
+    def __init__(self, account, maxsize=5000):
+        '''
+        :param account: opened BinaryAccount
+        :param maxsize: updates kept by subscription between reads of receiving thread
+        '''
+
+        self.account = account
+        self.maxsize = maxsize
+        self.subscription = None
+        self.error = None
+
+        self.lock = Lock()
+
+        # key - contract_id, value - position dict
+        self.positions = dict()
+
+        # positions changed and sold since the last take_changes
+        self.changed = dict()
+        self.sold = dict()
+
+        self.invested = 0.0
+        self.profit = 0.0
+        self.realized = 0.0
+
+        # reconnections of subscription seen by tracker
+        self.gaps = 0
+
+        self.updates = 0
+        self.coalesced = 0
+        self.reloads = 0
+
+    def start(self, timeout=None):
+        '''
+        Subscribes to updates and loads current portfolio
+        :return: True if both succeeded, error is kept in 'error' attribute
+        '''
+
+        # subscription goes first, so updates of loading time are not lost
+        self.subscription = self.account.subscribe_open_contracts(maxsize=self.maxsize,
+                                                                  listener=self.on_update,
+                                                                  timeout=timeout)
+        if not self.subscription.error is None:
+            self.error = self.subscription.error
+            return False
+
+        return self.load(timeout)
+
+    def stop(self):
+
+        if not self.subscription is None:
+            self.subscription.close()
+
+    def load(self, timeout=None):
+        '''
+        Adds positions of portfolio which are not tracked yet
+        and drops tracked ones which are not opened anymore
+        :return: True if portfolio is loaded
+        '''
+
+        # contracts bought while portfolio is requested are not in it, they must not be dropped
+        with self.lock:
+            tracked = set(self.positions)
+
+        portfolio = self.account.get_portfolio(timeout)
+        if portfolio is None:
+            self.error = 'Portfolio is not loaded'
+            return False
+
+        opened = set(p['contract_id'] for p in portfolio)
+
+        with self.lock:
+            self.reloads += 1
+
+            for p in portfolio:
+                if p['contract_id'] in self.positions:
+                    continue
+
+                position = {
+                    'contract_id' : p['contract_id'],
+                    'symbol' : p['symbol'],
+                    'contract_type' : p['contract_type'],
+                    'description' : p['description'],
+                    'buy_price' : p['price'],
+                    'payout' : p['payout'],
+                    'date_end' : p['date_end'],
+                    'bid_price' : None,
+                    'profit' : None,
+                    'current_spot' : None,
+                    'is_sold' : 0
+                }
+                self.positions[p['contract_id']] = position
+                self.invested += position['buy_price']
+                self.changed[p['contract_id']] = position
+
+            for contract_id in [c for c in self.positions if c in tracked and not c in opened]:
+                # sold while updates were lost, the last state is reported
+                self.remove(self.positions[contract_id])
+
+        return True
+
+    def on_update(self, subscription):
+        '''
+        Listener of subscription, called by receiving thread
+        '''
+
+        while True:
+            update = subscription.get_nowait()
+            if update is None:
+                break
+            self.apply(update)
+
+        if subscription.gaps != self.gaps:
+            # updates of downtime are lost, receiving thread must not wait for portfolio
+            self.gaps = subscription.gaps
+            Thread(target=self.reload, daemon=True).start()
+
+    def reload(self):
+
+        try:
+            self.load()
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def apply(self, update):
+        '''
+        Applies update of one contract
+        :param update: dict described in BinaryAccount.get_price_proposal
+        :return: None
+        '''
+
+        contract_id = update['contract_id']
+
+        with self.lock:
+            self.updates += 1
+
+            position = self.positions.get(contract_id)
+            if position is None:
+                if update['is_sold']:
+                    # sold before it was tracked
+                    return
+
+                # bought after start
+                position = {
+                    'contract_id' : contract_id,
+                    'symbol' : update['symbol'],
+                    'contract_type' : update['contract_type'],
+                    'description' : update['description'],
+                    'buy_price' : update['buy_price'],
+                    'payout' : update['payout'],
+                    'date_end' : None,
+                    'bid_price' : None,
+                    'profit' : None,
+                    'current_spot' : None,
+                    'is_sold' : 0
+                }
+                self.positions[contract_id] = position
+                self.invested += position['buy_price']
+
+            previous = position['profit'] or 0.0
+
+            position['bid_price'] = update['bid_price']
+            position['profit'] = update['profit']
+            position['current_spot'] = update['current_spot']
+            self.profit += update['profit'] - previous
+
+            if update['is_sold']:
+                position['is_sold'] = 1
+                self.realized += update['profit']
+                self.remove(position)
+                return
+
+            if contract_id in self.changed:
+                self.coalesced += 1
+            self.changed[contract_id] = position
+
+    def remove(self, position):
+        '''
+        Moves position to sold ones. Have to be called under self.lock
+        :return: None
+        '''
+
+        contract_id = position['contract_id']
+
+        self.positions.pop(contract_id)
+        self.changed.pop(contract_id, None)
+        self.sold[contract_id] = position
+
+        self.invested -= position['buy_price']
+        self.profit -= position['profit'] or 0.0
+
+    def take_changes(self):
+        '''
+        Returns positions changed and sold since the previous call
+        :return: tuple(list of changed positions, list of sold positions)
+        '''
+
+        with self.lock:
+            changed = [dict(p) for p in self.changed.values()]
+            sold = [dict(p) for p in self.sold.values()]
+            self.changed.clear()
+            self.sold.clear()
+
+        return changed, sold
+
+    def get_positions(self):
+        '''
+        Returns copies of all opened positions
+        :return: list of dict
+        '''
+
+        with self.lock:
+            return [dict(p) for p in self.positions.values()]
+
+    def get_totals(self):
+        '''
+        Returns totals of opened positions as dict
+        Keys:
+            - positions
+            - invested - sum of buy prices
+            - value - sum of bid prices (buy price until the first update)
+            - profit - mark-to-market profit of opened positions
+            - realized - profit of positions sold since start
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'positions' : len(self.positions),
+                'invested' : self.invested,
+                'value' : self.invested + self.profit,
+                'profit' : self.profit,
+                'realized' : self.realized
+            }
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'updates' : self.updates,
+                'coalesced' : self.coalesced,
+                'reloads' : self.reloads
+            }
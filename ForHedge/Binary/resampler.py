@@ -0,0 +1,426 @@
+'''
+    Local OHLC resampling of one base candle stream into greater timeframes.
+
+    CandleHub keeps one base-granularity (1 minute) candle stream per symbol
+    and derives candles of any granularity which is a multiple of it
+    (5m, 15m, 30m, 1h, 4h, 1d) locally:
+        - history is resampled from base candles of CandleStore
+        - forming candle of each timeframe is updated incrementally by Resampler
+          on each base update
+    Any number of charts of the same symbol share one upstream subscription,
+    and changing timeframe needs no requests to Binary.com: base history is
+    loaded for the longest timeframe once, then it is extended by the stream.
+
+    Candles are aligned by epoch (UTC), as Binary.com aligns its candles.
+    Periods without trading give no candles.
+
+    Usage:
+        hub = CandleHub(CandleStore())
+        candles, stream = hub.subscribe('frxEURUSD', 3600, count=20)
+        candle = stream.get()       # forming or new 1h candle tuple
+        ...
+        stream.close()
+        hub.close()
+'''
+
+from Binary.binary import Binary
+from Binary._responses import CANDLE_DTYPE
+from Binary._subscription import Subscription
+from threading import Lock, Event
+import numpy as np
+import time
+import logging
+import sys
+import traceback
+
+
+# granularity of base stream, seconds
+BASE_GRANULARITY = 60
+
+# granularities offered by chart, history of the longest one is loaded with the stream
+TIMEFRAMES = (60, 300, 900, 1800, 3600, 14400, 86400)
+
+
+def resample(candles, granularity):
+    '''
+    Returns candles of greater granularity
+    :param candles: numpy array of CANDLE_DTYPE sorted by epoch
+    :param granularity: seconds
+    :return: numpy array of CANDLE_DTYPE
+    '''
+
+    if len(candles) == 0:
+        return np.empty(0, dtype=CANDLE_DTYPE)
+
+    buckets = candles['epoch'] - candles['epoch'] % granularity
+
+    # first and last candle of each bucket
+    firsts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    lasts = np.r_[firsts[1:], len(candles)] - 1
+
+    result = np.empty(len(firsts), dtype=CANDLE_DTYPE)
+    result['epoch'] = buckets[firsts]
+    result['open'] = candles['open'][firsts]
+    result['high'] = np.maximum.reduceat(candles['high'], firsts)
+    result['low'] = np.minimum.reduceat(candles['low'], firsts)
+    result['close'] = candles['close'][lasts]
+
+    return result
+
+
+class Resampler:
+    '''
+        Forming candle of one granularity built from base candle updates.
+
+        Closed base candles of the current period are folded into one aggregate,
+        so each update is combined with it in constant time.
+    '''
+
+    def __init__(self, granularity):
+
+        self.granularity = granularity
+
+        # open time of forming candle
+        self.bucket = None
+
+        # tuple (open, high, low, close) of closed base candles of the period, None if there are none
+        self.closed = None
+
+        # the latest base candle
+        self.forming = None
+
+    def add(self, candle):
+        '''
+        Applies update of base candle
+        :param candle: tuple (date, open, high, low, close) of forming or new base candle
+        :return: tuple (date, open, high, low, close) - forming candle of granularity
+        '''
+
+        date = candle[0]
+        bucket = date - date % self.granularity
+
+        if not self.forming is None and self.forming[0] < date and self.forming[0] >= bucket:
+            # previous base candle of the period is closed
+            self.closed = self.fold(self.closed, self.forming)
+
+        if bucket != self.bucket:
+            self.bucket = bucket
+            self.closed = None
+
+        self.forming = candle
+
+        if self.closed is None:
+            return (bucket, candle[1], candle[2], candle[3], candle[4])
+
+        open_, high, low, close = self.closed
+
+        return (bucket, open_, max(high, candle[2]), min(low, candle[3]), candle[4])
+
+    def fold(self, aggregate, candle):
+
+        if aggregate is None:
+            return (candle[1], candle[2], candle[3], candle[4])
+
+        return (aggregate[0], max(aggregate[1], candle[2]), min(aggregate[2], candle[3]), candle[4])
+
+
+class CandleHub:
+    '''
+        Shared base candle streams by symbol, see module docstring.
+
+        Streams given by subscribe() are Subscription objects which give
+        candle tuples, so they are used as Binary.get_history streams.
+        Base streams stay opened until close(), so charts can switch
+        timeframes and assets back without new subscriptions.
+
+        Statistics:
+            - base_updates - updates of base streams
+            - pushed - derived candles pushed to streams
+            - symbols - opened base streams
+    '''
+
+    def __init__(self, store, base_granularity=BASE_GRANULARITY, timeframes=TIMEFRAMES, history_count=20):
+        '''
+        :param store: CandleStore which keeps base candles
+        :param history_count: candles of the longest timeframe loaded with base stream
+        '''
+
+        self.store = store
+        self.base_granularity = base_granularity
+        self.timeframes = timeframes
+        self.history_count = history_count
+
+        self.binary = None
+        self.lock = Lock()
+
+        '''
+            key - symbol
+            value - dict with keys:
+                - subscription - base stream
+                - series - CandleSeries of base granularity
+                - forming - the latest base candle
+                - gaps - reconnections of base stream seen
+                - resamplers - dict of granularity and Resampler
+                - loaded - Event set when history is loaded
+        '''
+        self.symbols = dict()
+
+        '''
+            key - id of stream given by subscribe
+            value - tuple(symbol, granularity, Subscription)
+        '''
+        self.streams = dict()
+        self.stream_id = 1
+
+        self.base_updates = 0
+        self.pushed = 0
+
+    def open(self):
+        '''
+        Opens connection with Binary.com if it is not opened
+        :return: Binary
+        '''
+
+        with self.lock:
+            if self.binary is None:
+                self.binary = Binary()
+                self.binary.open_app()
+
+            return self.binary
+
+    def close(self):
+        '''
+        Closes all the streams and connection
+        :return: None
+        '''
+
+        with self.lock:
+            streams = [stream for _, _, stream in self.streams.values()]
+            symbols = list(self.symbols.values())
+            binary = self.binary
+
+            self.streams = dict()
+            self.symbols = dict()
+            self.binary = None
+
+        for stream in streams:
+            stream.finish()
+        for symbol in symbols:
+            if not symbol['subscription'] is None:
+                symbol['subscription'].close()
+        if not binary is None:
+            binary.close_app()
+
+    def check_granularity(self, granularity):
+
+        if granularity < self.base_granularity or granularity % self.base_granularity != 0:
+            raise ValueError('Granularity {} is not a multiple of base granularity {}'.format(
+                granularity, self.base_granularity))
+
+    def get_stored(self, symbol, granularity, count=20):
+        '''
+        Returns the latest candles resampled from stored base candles without requests
+        :return: list of tuple (date, open, high, low, close)
+        '''
+
+        self.check_granularity(granularity)
+
+        series = self.store.get_series(symbol, self.base_granularity)
+        now = int(time.time())
+        start = now - now % granularity - (count - 1) * granularity
+
+        return resample(series.read(start, now), granularity)[-count:].tolist()
+
+    def open_symbol(self, symbol, timeout=None):
+        '''
+        Subscribes to base stream of symbol and loads its history
+        for the longest timeframe. Called once for symbol
+        :return: dict - state of symbol
+        '''
+
+        binary = self.open()
+
+        state = {
+            'subscription' : None,
+            'series' : self.store.get_series(symbol, self.base_granularity),
+            'forming' : None,
+            'gaps' : 0,
+            'resamplers' : dict(),
+            'loaded' : Event()
+        }
+
+        with self.lock:
+            if symbol in self.symbols:
+                # opened by another thread meanwhile
+                return self.symbols[symbol]
+            self.symbols[symbol] = state
+
+        try:
+            # stream goes first, so candles of loading time are not lost
+            candles, subscription = binary.get_history(asset=symbol,
+                                                       granularity=self.base_granularity,
+                                                       count=1,
+                                                       subscribe=1,
+                                                       style='candles',
+                                                       listener=lambda s: self.on_base_update(symbol, s),
+                                                       timeout=timeout)
+            if not subscription.error is None:
+                # closed market - only history is shown
+                logging.error(subscription.error)
+
+            with self.lock:
+                state['subscription'] = subscription
+                if state['forming'] is None and len(candles) > 0:
+                    state['forming'] = candles[-1]
+
+            now = int(time.time())
+            span = max(self.timeframes) * self.history_count
+            state['series'].fetch(binary, now - now % max(self.timeframes) - span, now, timeout)
+        except:
+            # the next subscribe tries again
+            with self.lock:
+                self.symbols.pop(symbol, None)
+            if not state['subscription'] is None:
+                state['subscription'].close()
+            raise
+        finally:
+            state['loaded'].set()
+
+        return state
+
+    def subscribe(self, symbol, granularity, count=20, listener=None, timeout=None):
+        '''
+        Returns the latest candles of granularity and stream of forming and new candles.
+        Requests are sent only if symbol is not streamed yet
+        :param listener: function called with stream after each update
+        :return: tuple(list of tuple (date, open, high, low, close), Subscription)
+        '''
+
+        self.check_granularity(granularity)
+
+        with self.lock:
+            state = self.symbols.get(symbol)
+
+        if state is None:
+            state = self.open_symbol(symbol, timeout)
+        else:
+            state['loaded'].wait(timeout)
+
+        if granularity * count > max(self.timeframes) * self.history_count:
+            # longer history than loaded with stream
+            now = int(time.time())
+            state['series'].fetch(self.open(), now - granularity * count, now, timeout)
+
+        now = int(time.time())
+        start = now - now % granularity - (count - 1) * granularity
+
+        with self.lock:
+            # closed base candles are stored under the same lock
+            base = state['series'].read(start, now)
+
+            stream = Subscription(self, self.stream_id, listener=listener)
+            self.streams[self.stream_id] = (symbol, granularity, stream)
+            self.stream_id += 1
+
+            forming = state['forming']
+            if not forming is None:
+                # stored forming candle can be older than streamed one
+                base = base[base['epoch'] < forming[0]]
+
+            candles = resample(base, granularity)[-count:].tolist()
+
+            if not granularity in state['resamplers']:
+                resampler = Resampler(granularity)
+                bucket = now - now % granularity
+                for candle in base[base['epoch'] >= bucket].tolist():
+                    resampler.add(candle)
+                state['resamplers'][granularity] = resampler
+
+            if not forming is None:
+                candle = state['resamplers'][granularity].add(forming)
+                if len(candles) > 0 and candles[-1][0] == candle[0]:
+                    candles[-1] = candle
+                else:
+                    candles.append(candle)
+
+        return candles[-count:], stream
+
+    def on_base_update(self, symbol, subscription):
+        '''
+        Listener of base stream, called by receiving thread
+        '''
+
+        try:
+            candle = subscription.get_nowait()
+            while not candle is None:
+                self.apply(symbol, subscription, candle)
+                candle = subscription.get_nowait()
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def apply(self, symbol, subscription, candle):
+        '''
+        Stores closed base candle and pushes derived candles to streams
+        '''
+
+        with self.lock:
+            state = self.symbols.get(symbol)
+            if state is None:
+                return
+
+            self.base_updates += 1
+            previous = state['forming']
+            state['forming'] = candle
+
+            derived = {granularity : resampler.add(candle)
+                       for granularity, resampler in state['resamplers'].items()}
+            streams = [(granularity, stream) for s, granularity, stream in self.streams.values() if s == symbol]
+
+            # updates of reconnection time are lost
+            contiguous = state['gaps'] == subscription.gaps
+            state['gaps'] = subscription.gaps
+
+            if not previous is None and previous[0] < candle[0]:
+                self.store_closed(state['series'], previous, contiguous)
+
+        for granularity, stream in streams:
+            stream.push(derived[granularity])
+
+        with self.lock:
+            self.pushed += len(streams)
+
+    def store_closed(self, series, candle, contiguous):
+        '''
+        Writes closed base candle. It extends covered period
+        if all the candles since it are streamed
+        '''
+
+        date = candle[0]
+        if contiguous and not series.get_covered_start(date - 1) is None:
+            series.write([candle], date, date + self.base_granularity - 1)
+        else:
+            series.write([candle])
+
+    def forget_request(self, stream_id):
+        '''
+        Removes stream closed by chart. Base stream stays opened
+        '''
+
+        with self.lock:
+            self.streams.pop(stream_id, None)
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'base_updates' : self.base_updates,
+                'pushed' : self.pushed,
+                'symbols' : len(self.symbols),
+                'streams' : len(self.streams)
+            }
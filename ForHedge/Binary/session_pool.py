@@ -0,0 +1,414 @@
+'''
+    Process-wide pool of long-lived authorized BinaryAccount sessions.
+
+    Opening BinaryAccount costs TLS handshake and authorize round trip.
+    Pool keeps one opened and authorized session per api token,
+    so hedges and manual trades receive ready session without connecting.
+
+    Usage:
+        acc = session_pool.get_pool().get_session(apiToken)
+        acc.buy_contract(...)
+
+    Session is shared between threads (BinaryAccount is thread safe),
+    so there is nothing to return into the pool after usage.
+
+    The same contract for several accounts:
+        results = session_pool.get_pool().buy_for_accounts(tokens, type='PUT', ...)
+'''
+
+from Binary.binary_account import BinaryAccount
+from Binary._errors import ConnectionLostError, BuyNotConfirmedError, RequestTimeoutError
+from Binary import metrics
+from threading import Thread, Lock, Event
+import time
+import logging
+import sys
+import traceback
+
+
+# errors of buy_contract_for_multiple_accounts which mean the call is not available,
+# so contracts are bought by separate requests
+MULTI_BUY_UNSUPPORTED = ('PermissionDenied', 'UnrecognisedRequest')
+
+
+class SessionPool:
+    '''
+        Keeps opened and authorized BinaryAccount sessions by api token.
+
+        Statistics:
+            - hits - session was ready when requested
+            - misses - session had to be opened by caller
+            - replaced - dead sessions which were reopened
+            - checkout latency (last, average, max) in seconds
+            - fan-out buys: multi-account calls, fallbacks to separate buys
+              and latency (last, average) in seconds
+    '''
+
+    def __init__(self, health_check_interval=15):
+
+        '''
+            key - api token
+            value - BinaryAccount
+        '''
+        self.sessions = dict()
+
+        '''
+            Lock per token to not open two sessions
+            for one token from different threads
+        '''
+        self.token_locks = dict()
+
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.replaced = 0
+        self.checkout_count = 0
+        self.checkout_total = 0.0
+        self.checkout_max = 0.0
+        self.checkout_last = 0.0
+
+        self.fanout_multi = 0
+        self.fanout_fallback = 0
+        self.fanout_total = 0.0
+        self.fanout_last = 0.0
+
+        self.health_check_interval = health_check_interval
+        self.health_checker = None
+        self.stopped = Event()
+
+    def get_token_lock(self, apiToken):
+
+        with self.lock:
+            if not apiToken in self.token_locks:
+                self.token_locks[apiToken] = Lock()
+            return self.token_locks[apiToken]
+
+    def get_session(self, apiToken, timeout=None):
+        '''
+        Returns opened and authorized BinaryAccount for given token.
+        Opens new session if there is no alive one (it is closed or token is rejected).
+        Session which is reconnecting is kept with its subscriptions:
+        checkout waits until it is ready again
+        :param apiToken: str
+        :param timeout: seconds to wait for reconnection or None to wait default_timeout
+        :return: BinaryAccount
+        '''
+
+        start = time.perf_counter()
+
+        with self.lock:
+            session = self.sessions.get(apiToken)
+
+        hit = not session is None and session.is_alive()
+
+        if not hit:
+            with self.get_token_lock(apiToken):
+                # session could be opened by another thread meanwhile
+                with self.lock:
+                    session = self.sessions.get(apiToken)
+
+                if session is None or not session.is_alive():
+                    session = self.open_session(apiToken, session)
+
+        if not session.wait_ready(timeout):
+            raise RequestTimeoutError('Session was not reconnected in {} seconds'.format(
+                session.default_timeout if timeout is None else timeout))
+
+        self.register_checkout(hit, time.perf_counter() - start)
+
+        return session
+
+    def warm_up(self, apiToken):
+        '''
+        Opens session in background to make first checkout fast
+        :param apiToken: str
+        :return: None
+        '''
+        if apiToken is None or apiToken == '':
+            return
+
+        Thread(target=self.warm_up_session, args=(apiToken,), daemon=True).start()
+        self.start_health_checker()
+
+    def warm_up_session(self, apiToken):
+
+        try:
+            self.get_session(apiToken)
+        except:
+            # caller gets the error on checkout
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def open_session(self, apiToken, dead_session=None):
+        '''
+        Opens new session instead of dead one (if given).
+        Session which failed to open is closed and not kept
+        :return: BinaryAccount
+        '''
+
+        if not dead_session is None:
+            self.close_session(dead_session)
+
+        session = BinaryAccount(apiToken)
+        try:
+            session.open_app()
+        except:
+            self.close_session(session)
+            if not dead_session is None:
+                with self.lock:
+                    if self.sessions.get(apiToken) is dead_session:
+                        del self.sessions[apiToken]
+            raise
+
+        with self.lock:
+            self.sessions[apiToken] = session
+            if not dead_session is None:
+                self.replaced += 1
+
+        return session
+
+    def get_sessions(self, tokens):
+        '''
+        Returns sessions for given tokens. Sessions which are not opened
+        are opened in parallel
+        :param tokens: list of api tokens
+        :return: list of BinaryAccount in the same order
+        '''
+
+        sessions = [None] * len(tokens)
+
+        def checkout(i):
+            try:
+                sessions[i] = self.get_session(tokens[i])
+            except:
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+        threads = [Thread(target=checkout, args=(i,), daemon=True) for i in range(len(tokens))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return sessions
+
+    def buy_for_accounts(self, tokens, amount = 1, type='CALL', duration=15,
+                         duration_unit='m', symbol='frxEURUSD', timeout=None):
+        '''
+        Buys the same contract for all given accounts.
+        Uses one buy_contract_for_multiple_accounts request by session of the first token.
+        If the call is not available (token has no 'admin' scope, see MULTI_BUY_UNSUPPORTED)
+        or the request could not be sent, buys are sent at once over pooled session
+        of each token and gathered.
+        Either way hedging N accounts costs about one round trip.
+
+        Rejections of single accounts (e.g. insufficient balance) are returned as they are.
+        Other rejections of the whole request are returned for each token.
+        Connection errors while multi-account request was in flight and timeouts are raised,
+        because the contracts could be bought
+        :param tokens: list of api tokens
+        :return: dict where key is token and value is dict like BinaryAccount.buy_contract returns
+        '''
+
+        start = time.perf_counter()
+        contract = dict(amount=amount, type=type, duration=duration,
+                        duration_unit=duration_unit, symbol=symbol)
+
+        try:
+            results = self.get_session(tokens[0]).buy_contract_for_accounts(tokens, timeout=timeout, **contract)
+        except BuyNotConfirmedError:
+            raise
+        except ConnectionLostError as e:
+            # request was not sent
+            results = {'error' : str(e), 'code' : 'ConnectionLost'}
+
+        multi = not 'error' in results
+
+        if not multi and results['code'] != 'ConnectionLost' and \
+                not results['code'] in MULTI_BUY_UNSUPPORTED:
+            # contract itself is rejected, separate buys would be rejected too
+            results = {token : {'error' : results['error']} for token in tokens}
+            multi = True
+
+        if not multi:
+            logging.error('Multi-account buy is not available: ' + results['error'])
+
+            handles = {}
+            results = {}
+            for token, session in zip(tokens, self.get_sessions(tokens)):
+                if session is None:
+                    results[token] = {'error' : 'Session is not opened'}
+                    continue
+                try:
+                    handles[token] = session.request_buy_contract(**contract)
+                except Exception as e:
+                    results[token] = {'error' : str(e)}
+
+            for token, handle in handles.items():
+                try:
+                    results[token] = handle.result(timeout)
+                except Exception as e:
+                    results[token] = {'error' : str(e)}
+
+        self.register_fanout(multi, time.perf_counter() - start)
+
+        return results
+
+    def register_fanout(self, multi, latency):
+
+        with self.lock:
+            if multi:
+                self.fanout_multi += 1
+            else:
+                self.fanout_fallback += 1
+
+            self.fanout_total += latency
+            self.fanout_last = latency
+
+    def close_session(self, session):
+
+        try:
+            session.close_app()
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def register_checkout(self, hit, latency):
+
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+            self.checkout_count += 1
+            self.checkout_total += latency
+            self.checkout_last = latency
+            self.checkout_max = max(self.checkout_max, latency)
+
+    def get_stats(self):
+        '''
+        Returns pool statistics as dict
+        Keys:
+            - sessions
+            - hits
+            - misses
+            - replaced
+            - checkout_last
+            - checkout_avg
+            - checkout_max
+            - fanout_multi
+            - fanout_fallback
+            - fanout_last
+            - fanout_avg
+        :return: dict
+        '''
+
+        with self.lock:
+            fanouts = self.fanout_multi + self.fanout_fallback
+
+            return {
+                'sessions' : len(self.sessions),
+                'hits' : self.hits,
+                'misses' : self.misses,
+                'replaced' : self.replaced,
+                'checkout_last' : self.checkout_last,
+                'checkout_avg' : self.checkout_total / self.checkout_count if self.checkout_count else 0.0,
+                'checkout_max' : self.checkout_max,
+                'fanout_multi' : self.fanout_multi,
+                'fanout_fallback' : self.fanout_fallback,
+                'fanout_last' : self.fanout_last,
+                'fanout_avg' : self.fanout_total / fanouts if fanouts else 0.0
+            }
+
+    def collect_metrics(self):
+        '''
+        Returns statistics of pool and its sessions for metrics export.
+        Sessions are labeled by number to not expose api tokens
+        :return: list of tuple(name, labels, value)
+        '''
+
+        stats = self.get_stats()
+
+        with self.lock:
+            sessions = list(self.sessions.values())
+
+        samples = [
+            ('binary_pool_sessions', {}, stats['sessions']),
+            ('binary_pool_hits_total', {}, stats['hits']),
+            ('binary_pool_misses_total', {}, stats['misses']),
+            ('binary_pool_replaced_total', {}, stats['replaced']),
+            ('binary_pool_checkout_seconds', {'stat' : 'avg'}, stats['checkout_avg']),
+            ('binary_pool_checkout_seconds', {'stat' : 'max'}, stats['checkout_max'])
+        ]
+
+        for number, session in enumerate(sessions):
+            samples += metrics.collect(session, {'session' : str(number)})
+
+        return samples
+
+    def start_health_checker(self):
+
+        with self.lock:
+            if not self.health_checker is None:
+                return
+            self.health_checker = Thread(target=self.check_health, daemon=True)
+
+        self.health_checker.start()
+
+    def check_health(self):
+        '''
+        Reopens closed sessions and sessions with rejected token in background,
+        so callers do not pay for it. Lost connections are restored by sessions themselves
+        :return:
+        '''
+
+        while not self.stopped.wait(self.health_check_interval):
+
+            with self.lock:
+                sessions = list(self.sessions.items())
+
+            for apiToken, session in sessions:
+                if session.is_alive():
+                    continue
+
+                try:
+                    with self.get_token_lock(apiToken):
+                        if not self.sessions.get(apiToken) is session:
+                            continue
+                        self.open_session(apiToken, session)
+                except:
+                    ex_type, ex_val, ex_tb = sys.exc_info()
+                    logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def close_all(self):
+        '''
+        Closes all sessions. Uses on application exit
+        :return:
+        '''
+
+        self.stopped.set()
+
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+
+        for session in sessions:
+            self.close_session(session)
+
+
+_POOL = None
+_POOL_LOCK = Lock()
+
+def get_pool():
+    '''
+    Returns process-wide SessionPool
+    :return: SessionPool
+    '''
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SessionPool()
+        return _POOL
@@ -0,0 +1,1126 @@
+'''
+    Local stand-in of Binary.com WebSocket API for tests and benchmarks.
+
+    Speaks the subset of API used by the project:
+        authorize, ticks_history (candles, subscribe), ticks, proposal (subscribe),
+        buy, buy_contract_for_multiple_accounts, sell, portfolio, profit_table,
+        statement, balance, proposal_open_contract (subscribe), login_history,
+        ping, forget, forget_all
+
+    Market is a seeded random walk, so runs are reproducible.
+    Network is simulated by:
+        - latency + uniform jitter before each response
+        - error_rate - part of requests answered by error
+        - drop_rate - part of requests never answered
+        - disconnect_every - seconds between dropping all connections
+    Errors and disconnects can be also injected on demand.
+
+    Usage:
+        server = FakeBinaryServer(latency=0.02, jitter=0.01)
+        server.start()
+        bin_api.set_binary_url(server.url)    # all clients connect to server
+        ...
+        server.stop()
+
+    Or run standalone and point the application at it by BINARY_URL environment variable:
+        python -m Binary.test_server [port]
+'''
+
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import traceback
+from threading import Thread, Event, Lock
+
+import websockets
+
+import Binary._binary_general as bin_api
+
+
+GRANULARITIES = (60, 120, 180, 300, 600, 900, 1800, 3600, 7200, 14400, 28800, 86400)
+
+DURATION_UNITS = {
+    't' : 2,
+    's' : 1,
+    'm' : 60,
+    'h' : 3600,
+    'd' : 86400
+}
+
+PAYOUT_RATE = 1.95
+
+# candles given by one ticks_history request
+MAX_CANDLES = 5000
+
+# calls which need authorized connection
+AUTHORIZED_CALLS = ('buy', 'buy_contract_for_multiple_accounts', 'sell', 'portfolio',
+                    'profit_table', 'statement', 'balance', 'proposal_open_contract',
+                    'login_history', 'logout')
+
+
+class FakeAccount:
+    '''
+        Account of one api token: balance, opened contracts and transactions
+    '''
+
+    def __init__(self, token, loginid, balance):
+
+        self.token = token
+        self.loginid = loginid
+        self.balance = balance
+
+        '''
+            key - contract_id
+            value - dict in portfolio format with additional
+            keys: entry_spot, direction, purchase_time
+        '''
+        self.contracts = dict()
+
+        # statement transactions, the latest last
+        self.transactions = []
+
+        # sold contracts in profit_table format, the latest last
+        self.sold = []
+
+
+class Connection:
+    '''
+        State of one client connection
+    '''
+
+    def __init__(self, ws):
+
+        self.ws = ws
+        self.account = None
+
+        '''
+            key - subscription id
+            value - tuple(call, request, req_id)
+        '''
+        self.subscriptions = dict()
+
+        '''
+            key - id of subscription to all opened contracts
+            value - set of contract ids opened at the last update
+        '''
+        self.open_contracts = dict()
+
+
+class FakeBinaryServer:
+    '''
+        WebSocket server running its own event loop in background thread.
+        All the public methods can be called from any thread.
+
+        tokens - dict of api token and balance, None to accept any token
+        admin_tokens - tokens allowed to buy for multiple accounts, None for any
+
+        Statistics:
+            - connections / disconnects
+            - requests - dict of call name and number of requests
+            - errors / dropped
+            - pushed - subscription updates sent
+    '''
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, drop_rate=0.0, disconnect_every=None,
+                 tick_interval=1.0, tokens=None, admin_tokens=None, seed=1):
+
+        self.host = host
+        self.port = port
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.disconnect_every = disconnect_every
+        self.tick_interval = tick_interval
+
+        self.tokens = tokens
+        self.admin_tokens = admin_tokens
+
+        self.random = random.Random(seed)
+
+        # key - symbol, value - current spot
+        self.spots = dict()
+
+        # key - api token, value - FakeAccount
+        self.accounts = dict()
+
+        # key - call, value - list of tuple(code, message), see inject_error
+        self.injected = dict()
+
+        self.connections = set()
+
+        self.next_id = 1000
+        self.proposals = dict()
+
+        self.loop = None
+        self.thread = None
+        self.started = Event()
+        self.stopping = None
+        self.lock = Lock()
+
+        self.connections_count = 0
+        self.disconnects = 0
+        self.requests = dict()
+        self.errors = 0
+
+        # key - tuple(symbol, granularity), value - forming candle, its high and low only widen
+        self.forming = dict()
+        self.dropped = 0
+        self.pushed = 0
+
+    @property
+    def url(self):
+        return 'ws://{}:{}/websockets/v3?app_id={}'.format(self.host, self.port, bin_api.APP_ID)
+
+    def start(self, timeout=10):
+        '''
+        Starts server and waits until it listens
+        :return: None
+        '''
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+        if not self.started.wait(timeout):
+            raise TimeoutError('Fake Binary.com server did not start in {} seconds'.format(timeout))
+
+    def stop(self):
+        '''
+        Closes all connections and stops server
+        :return: None
+        '''
+
+        if self.loop is None:
+            return
+
+        self.loop.call_soon_threadsafe(lambda: self.stopping.done() or self.stopping.set_result(None))
+        self.thread.join()
+        self.loop = None
+
+    def run(self):
+
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.serve())
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+        finally:
+            self.started.set()
+            self.loop.close()
+
+    async def serve(self):
+
+        self.stopping = self.loop.create_future()
+
+        async with websockets.serve(self.handle, self.host, self.port) as server:
+            self.port = list(server.sockets)[0].getsockname()[1]
+            self.started.set()
+
+            tasks = [asyncio.ensure_future(self.tick())]
+            if not self.disconnect_every is None:
+                tasks.append(asyncio.ensure_future(self.disconnect_periodically()))
+
+            await self.stopping
+
+            for task in tasks:
+                task.cancel()
+
+    # Control from tests
+
+    def disconnect_all(self):
+        '''
+        Drops all client connections, the way network failure does
+        :return: None
+        '''
+
+        self.loop.call_soon_threadsafe(self.close_connections)
+
+    def inject_error(self, call, message='Injected error', code='InjectedError', count=1):
+        '''
+        Answers the next count requests of given call by error
+        :param call: str, e.g. 'buy'
+        :return: None
+        '''
+
+        with self.lock:
+            self.injected.setdefault(call, []).extend([(code, message)] * count)
+
+    def set_spot(self, symbol, spot):
+
+        with self.lock:
+            self.spots[symbol] = spot
+
+    def get_account(self, token):
+        '''
+        Returns FakeAccount of token (created on first usage)
+        :return: FakeAccount
+        '''
+
+        with self.lock:
+            if not token in self.accounts:
+                balance = 10000.0 if self.tokens is None else float(self.tokens[token])
+                self.accounts[token] = FakeAccount(token, 'VRTC{}'.format(1000000 + len(self.accounts)), balance)
+            return self.accounts[token]
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'connections' : self.connections_count,
+                'disconnects' : self.disconnects,
+                'requests' : dict(self.requests),
+                'errors' : self.errors,
+                'dropped' : self.dropped,
+                'pushed' : self.pushed
+            }
+
+    # Connections
+
+    async def handle(self, ws, path=None):
+
+        connection = Connection(ws)
+        self.connections.add(connection)
+        with self.lock:
+            self.connections_count += 1
+
+        try:
+            async for message in ws:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    continue
+
+                # responses are independent, so jitter can reorder them as on real server
+                asyncio.ensure_future(self.respond(connection, request))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.connections.discard(connection)
+
+    def close_connections(self):
+
+        for connection in list(self.connections):
+            self.connections.discard(connection)
+            connection.subscriptions.clear()
+            asyncio.ensure_future(connection.ws.close())
+
+            with self.lock:
+                self.disconnects += 1
+
+    async def disconnect_periodically(self):
+
+        while True:
+            await asyncio.sleep(self.disconnect_every)
+            self.close_connections()
+
+    async def send(self, connection, response, delay=True):
+
+        if delay:
+            wait = self.latency + (self.random.uniform(0, self.jitter) if self.jitter > 0 else 0)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        try:
+            await connection.ws.send(json.dumps(response))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def respond(self, connection, request):
+
+        try:
+            response = self.process(connection, request)
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+            response = self.get_error(request, 'InternalServerError', str(ex_val))
+
+        if not response is None:
+            await self.send(connection, response)
+
+    # Requests
+
+    def get_call(self, request):
+
+        for key in request:
+            if not key in ('req_id', 'passthrough', 'subscribe'):
+                return key
+
+        return ''
+
+    def get_response(self, request, value, subscription_id=None):
+
+        call = self.get_call(request)
+        response = {
+            'echo_req' : request,
+            'msg_type' : call,
+            call : value
+        }
+        if 'req_id' in request:
+            response['req_id'] = request['req_id']
+        if not subscription_id is None:
+            response['subscription'] = {'id' : subscription_id}
+
+        return response
+
+    def get_error(self, request, code, message):
+
+        with self.lock:
+            self.errors += 1
+
+        response = {
+            'echo_req' : request,
+            'msg_type' : self.get_call(request),
+            'error' : {'code' : code, 'message' : message}
+        }
+        if 'req_id' in request:
+            response['req_id'] = request['req_id']
+
+        return response
+
+    def get_next_id(self):
+
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def process(self, connection, request):
+        '''
+        Returns response to request or None if request is dropped
+        :return: dict
+        '''
+
+        call = self.get_call(request)
+
+        with self.lock:
+            self.requests[call] = self.requests.get(call, 0) + 1
+            injected = self.injected.get(call)
+            injected = injected.pop(0) if injected else None
+
+        if not injected is None:
+            return self.get_error(request, *injected)
+
+        if call != 'ping' and self.drop_rate > 0 and self.random.random() < self.drop_rate:
+            with self.lock:
+                self.dropped += 1
+            return None
+
+        if call != 'ping' and self.error_rate > 0 and self.random.random() < self.error_rate:
+            return self.get_error(request, 'RateLimit', 'You have reached the rate limit for {}.'.format(call))
+
+        handler = getattr(self, 'on_' + call, None)
+        if handler is None:
+            return self.get_error(request, 'UnrecognisedRequest', 'Unrecognised request.')
+
+        if call in AUTHORIZED_CALLS and connection.account is None:
+            return self.get_error(request, 'AuthorizationRequired', 'Please log in.')
+
+        return handler(connection, request)
+
+    def subscribe(self, connection, request):
+        '''
+        Registers subscription of request if it asks for it
+        :return: subscription id or None
+        '''
+
+        if request.get('subscribe') != 1:
+            return None
+
+        subscription_id = '{:032x}'.format(self.get_next_id())
+        connection.subscriptions[subscription_id] = (self.get_call(request), request, request.get('req_id'))
+
+        return subscription_id
+
+    def on_ping(self, connection, request):
+
+        return self.get_response(request, 'pong')
+
+    def on_authorize(self, connection, request):
+
+        token = request['authorize']
+        if not self.tokens is None and not token in self.tokens:
+            return self.get_error(request, 'InvalidToken', 'The token is invalid.')
+
+        connection.account = self.get_account(token)
+
+        return self.get_response(request, {
+            'balance' : connection.account.balance,
+            'currency' : 'USD',
+            'email' : 'test@example.com',
+            'is_virtual' : 1,
+            'loginid' : connection.account.loginid,
+            'scopes' : ['read', 'trade', 'admin'] if self.is_admin(token) else ['read', 'trade']
+        })
+
+    def on_logout(self, connection, request):
+
+        connection.account = None
+
+        return self.get_response(request, 1)
+
+    def on_forget(self, connection, request):
+
+        removed = connection.subscriptions.pop(request['forget'], None)
+        connection.open_contracts.pop(request['forget'], None)
+
+        return self.get_response(request, 0 if removed is None else 1)
+
+    def on_forget_all(self, connection, request):
+
+        call = request['forget_all']
+        calls = call if isinstance(call, list) else [call]
+        # ticks_history streams are 'candles' or 'ticks'
+        removed = [subscription_id for subscription_id, (name, req, _) in connection.subscriptions.items()
+                   if name in calls or (name == 'ticks_history' and req.get('style', 'ticks') in calls)]
+
+        for subscription_id in removed:
+            connection.subscriptions.pop(subscription_id)
+
+        return self.get_response(request, removed)
+
+    # Market
+
+    def get_spot(self, symbol):
+
+        with self.lock:
+            if not symbol in self.spots:
+                self.spots[symbol] = 100.0 if symbol.startswith('R_') else 1.1
+            return self.spots[symbol]
+
+    def move_spots(self):
+
+        with self.lock:
+            for symbol, spot in self.spots.items():
+                self.spots[symbol] = round(spot * (1 + self.random.gauss(0, 0.0005)), 5)
+
+    def get_candles(self, symbol, granularity, count, end, start=0):
+        '''
+        Returns the latest count candles opened from start to end.
+        Candle depends only on symbol, granularity and open time,
+        so requests of overlapping periods give the same candles.
+        The forming candle closes by current spot, its high and low
+        keep extremes of the spot seen since it was opened
+        :return: list of dict
+        '''
+
+        spot = self.get_spot(symbol)
+        now = int(time.time())
+        last_open_time = min(end, now) - min(end, now) % granularity
+        first_open_time = max(start + (-start) % granularity, last_open_time - (count - 1) * granularity)
+
+        candles = []
+        for open_time in range(first_open_time, last_open_time + 1, granularity):
+            generator = random.Random('{}{}{}'.format(symbol, granularity, open_time))
+            base = 100.0 if symbol.startswith('R_') else 1.1
+            open_ = round(base * (1 + 0.01 * generator.uniform(-1, 1)), 5)
+            close = spot if open_time + granularity > now else \
+                    round(open_ * (1 + generator.gauss(0, 0.001)), 5)
+            candles.append({
+                'epoch' : open_time,
+                'open' : open_,
+                'high' : round(max(open_, close) * (1 + abs(generator.gauss(0, 0.0005))), 5),
+                'low' : round(min(open_, close) * (1 - abs(generator.gauss(0, 0.0005))), 5),
+                'close' : close
+            })
+
+        if len(candles) > 0 and candles[-1]['epoch'] + granularity > now:
+            candles[-1] = self.widen_forming(symbol, granularity, candles[-1])
+
+        return candles
+
+    def widen_forming(self, symbol, granularity, candle):
+        '''
+        Merges forming candle with its previous state
+        :return: dict
+        '''
+
+        with self.lock:
+            previous = self.forming.get((symbol, granularity))
+            if not previous is None and previous['epoch'] == candle['epoch']:
+                candle['high'] = max(candle['high'], previous['high'])
+                candle['low'] = min(candle['low'], previous['low'])
+            self.forming[(symbol, granularity)] = candle
+
+        return dict(candle)
+
+    def on_ticks_history(self, connection, request):
+
+        symbol = request['ticks_history']
+        now = int(time.time())
+
+        if request.get('style', 'ticks') != 'candles':
+            ticks = [self.get_spot(symbol)] * int(request.get('count', 10))
+            response = self.get_response(request, None, self.subscribe(connection, request))
+            response.pop('ticks_history')
+            response['msg_type'] = 'history'
+            response['history'] = {
+                'prices' : ticks,
+                'times' : list(range(now - len(ticks) + 1, now + 1))
+            }
+            return response
+
+        granularity = int(request.get('granularity', 60))
+        if not granularity in GRANULARITIES:
+            return self.get_error(request, 'InputValidationFailed', 'Input validation failed: granularity')
+
+        response = self.get_response(request, None, self.subscribe(connection, request))
+        response.pop('ticks_history')
+        response['msg_type'] = 'candles'
+        end = request.get('end', 'latest')
+        response['candles'] = self.get_candles(symbol, granularity,
+                                               min(int(request.get('count', 10)), MAX_CANDLES),
+                                               now if end == 'latest' else int(end),
+                                               int(request.get('start', 0)))
+
+        return response
+
+    def on_ticks(self, connection, request):
+
+        symbol = request['ticks']
+        response = self.get_response(request, None, self.subscribe(connection, request))
+        response['msg_type'] = 'tick'
+        response.pop('ticks')
+        response['tick'] = self.get_tick(symbol, response.get('subscription'))
+
+        return response
+
+    def get_tick(self, symbol, subscription=None):
+
+        spot = self.get_spot(symbol)
+        tick = {
+            'ask' : spot,
+            'bid' : spot,
+            'epoch' : int(time.time()),
+            'quote' : spot,
+            'symbol' : symbol
+        }
+        if not subscription is None:
+            tick['id'] = subscription['id']
+
+        return tick
+
+    def get_ohlc(self, request):
+
+        symbol = request['ticks_history']
+        granularity = int(request.get('granularity', 60))
+        now = int(time.time())
+
+        # the forming candle keeps its open, high and low widen by spot
+        candle = self.get_candles(symbol, granularity, 1, now)[-1]
+
+        return {
+            'epoch' : now,
+            'granularity' : granularity,
+            'open_time' : candle['epoch'],
+            'open' : str(candle['open']),
+            'high' : str(candle['high']),
+            'low' : str(candle['low']),
+            'close' : str(candle['close']),
+            'symbol' : symbol
+        }
+
+    # Contracts
+
+    def get_longcode(self, parameters):
+
+        return 'Win payout if {} is strictly {} than entry spot at {} {} after contract start time.'.format(
+            parameters['symbol'], 'higher' if parameters['contract_type'] == 'CALL' else 'lower',
+            parameters['duration'], parameters['duration_unit'])
+
+    def get_proposal(self, request):
+
+        parameters = {
+            'amount' : float(request.get('amount', 1)),
+            'contract_type' : request.get('contract_type', 'CALL'),
+            'duration' : int(request.get('duration', 60)),
+            'duration_unit' : request.get('duration_unit', 's'),
+            'symbol' : request.get('symbol', 'frxEURUSD')
+        }
+
+        proposal_id = '{:08x}-0000-0000-0000-{:012x}'.format(self.get_next_id(), self.get_next_id())
+        with self.lock:
+            self.proposals[proposal_id] = parameters
+
+        return {
+            'ask_price' : parameters['amount'],
+            'date_start' : int(time.time()),
+            'display_value' : str(parameters['amount']),
+            'id' : proposal_id,
+            'longcode' : self.get_longcode(parameters),
+            'payout' : round(parameters['amount'] * PAYOUT_RATE, 2),
+            'spot' : self.get_spot(parameters['symbol']),
+            'spot_time' : int(time.time())
+        }
+
+    def on_proposal(self, connection, request):
+
+        if not request.get('contract_type') in ('CALL', 'PUT'):
+            return self.get_error(request, 'ContractCreationFailure', 'Contract type is not supported.')
+        if not request.get('duration_unit', 's') in DURATION_UNITS:
+            return self.get_error(request, 'InputValidationFailed', 'Input validation failed: duration_unit')
+
+        return self.get_response(request, self.get_proposal(request), self.subscribe(connection, request))
+
+    def get_parameters(self, request, proposal_id):
+        '''
+        Returns parameters of proposal which is bought
+        :return: dict or None if proposal is unknown
+        '''
+
+        if proposal_id == 1 and isinstance(request.get('parameters'), dict):
+            parameters = request['parameters']
+            return {
+                'amount' : float(parameters.get('amount', 1)),
+                'contract_type' : parameters.get('contract_type', 'CALL'),
+                'duration' : int(parameters.get('duration', 60)),
+                'duration_unit' : parameters.get('duration_unit', 's'),
+                'symbol' : parameters.get('symbol', 'frxEURUSD')
+            }
+
+        with self.lock:
+            return self.proposals.get(proposal_id)
+
+    def open_contract(self, account, parameters):
+        '''
+        Buys contract for account
+        :return: dict - contract in portfolio format
+        '''
+
+        now = int(time.time())
+        contract_id = self.get_next_id()
+        transaction_id = self.get_next_id()
+        price = parameters['amount']
+
+        contract = {
+            'buy_price' : price,
+            'payout' : round(price * PAYOUT_RATE, 2),
+            'contract_id' : contract_id,
+            'contract_type' : parameters['contract_type'],
+            'currency' : 'USD',
+            'date_start' : now,
+            'expiry_time' : now + parameters['duration'] * DURATION_UNITS[parameters['duration_unit']],
+            'longcode' : self.get_longcode(parameters),
+            'symbol' : parameters['symbol'],
+            'transaction_id' : transaction_id,
+            'entry_spot' : self.get_spot(parameters['symbol']),
+            'purchase_time' : now
+        }
+
+        with self.lock:
+            account.balance = round(account.balance - price, 2)
+            account.contracts[contract_id] = contract
+            account.transactions.append({
+                'action_type' : 'buy',
+                'amount' : -price,
+                'balance_after' : account.balance,
+                'contract_id' : contract_id,
+                'longcode' : contract['longcode'],
+                'payout' : contract['payout'],
+                'reference_id' : transaction_id,
+                'transaction_id' : transaction_id,
+                'transaction_time' : now
+            })
+
+        return contract
+
+    def get_bid_price(self, contract):
+
+        spot = self.get_spot(contract['symbol'])
+        direction = 1 if contract['contract_type'] == 'CALL' else -1
+        move = direction * (spot - contract['entry_spot']) / contract['entry_spot']
+        probability = min(max(0.5 + move * 500, 0.01), 0.99)
+
+        return round(contract['payout'] * probability, 2)
+
+    def close_contract(self, account, contract, sell_price):
+
+        now = int(time.time())
+        transaction_id = self.get_next_id()
+
+        with self.lock:
+            if account.contracts.pop(contract['contract_id'], None) is None:
+                return None
+
+            account.balance = round(account.balance + sell_price, 2)
+            account.transactions.append({
+                'action_type' : 'sell',
+                'amount' : sell_price,
+                'balance_after' : account.balance,
+                'contract_id' : contract['contract_id'],
+                'longcode' : contract['longcode'],
+                'payout' : contract['payout'],
+                'reference_id' : contract['transaction_id'],
+                'transaction_id' : transaction_id,
+                'transaction_time' : now
+            })
+            account.sold.append({
+                'buy_price' : contract['buy_price'],
+                'contract_id' : contract['contract_id'],
+                'longcode' : contract['longcode'],
+                'payout' : contract['payout'],
+                'purchase_time' : contract['purchase_time'],
+                'sell_price' : sell_price,
+                'sell_time' : now,
+                'shortcode' : '{}_{}'.format(contract['contract_type'], contract['symbol']),
+                'transaction_id' : transaction_id
+            })
+
+            return transaction_id
+
+    def settle_expired(self):
+        '''
+        Closes expired contracts of all accounts by their payout
+        :return: None
+        '''
+
+        now = int(time.time())
+        with self.lock:
+            expired = [(account, contract) for account in self.accounts.values()
+                       for contract in account.contracts.values() if contract['expiry_time'] <= now]
+
+        for account, contract in expired:
+            won = self.get_bid_price(contract) > contract['payout'] / 2
+            self.close_contract(account, contract, contract['payout'] if won else 0)
+
+    def on_buy(self, connection, request):
+
+        parameters = self.get_parameters(request, request['buy'])
+        if parameters is None:
+            return self.get_error(request, 'InvalidContractProposal', 'Price has changed, please try again.')
+        if float(request.get('price', 0)) < parameters['amount']:
+            return self.get_error(request, 'ContractBuyValidationError', 'Contract price is above your limit.')
+
+        account = connection.account
+        if account.balance < parameters['amount']:
+            return self.get_error(request, 'InsufficientBalance', 'Your account balance is insufficient.')
+
+        contract = self.open_contract(account, parameters)
+
+        return self.get_response(request, {
+            'balance_after' : account.balance,
+            'buy_price' : contract['buy_price'],
+            'contract_id' : contract['contract_id'],
+            'longcode' : contract['longcode'],
+            'payout' : contract['payout'],
+            'purchase_time' : contract['purchase_time'],
+            'shortcode' : '{}_{}'.format(contract['contract_type'], contract['symbol']),
+            'start_time' : contract['date_start'],
+            'transaction_id' : contract['transaction_id']
+        })
+
+    def is_admin(self, token):
+
+        return self.admin_tokens is None or token in self.admin_tokens
+
+    def on_buy_contract_for_multiple_accounts(self, connection, request):
+
+        if not self.is_admin(connection.account.token):
+            return self.get_error(request, 'PermissionDenied', 'Permission denied, requires admin scope.')
+
+        parameters = self.get_parameters(request, request['buy_contract_for_multiple_accounts'])
+        if parameters is None:
+            return self.get_error(request, 'InvalidContractProposal', 'Price has changed, please try again.')
+
+        results = []
+        for token in request.get('tokens', []):
+            if not self.tokens is None and not token in self.tokens:
+                results.append({'token' : token, 'code' : 'InvalidToken',
+                                'message_to_client' : 'Invalid token'})
+                continue
+
+            account = self.get_account(token)
+            if account.balance < parameters['amount']:
+                results.append({'token' : token, 'code' : 'InsufficientBalance',
+                                'message_to_client' : 'Your account balance is insufficient.'})
+                continue
+
+            contract = self.open_contract(account, parameters)
+            results.append({
+                'token' : token,
+                'buy_price' : contract['buy_price'],
+                'contract_id' : contract['contract_id'],
+                'longcode' : contract['longcode'],
+                'payout' : contract['payout'],
+                'shortcode' : '{}_{}'.format(contract['contract_type'], contract['symbol']),
+                'start_time' : contract['date_start'],
+                'transaction_id' : contract['transaction_id']
+            })
+
+        return self.get_response(request, {'result' : results})
+
+    def on_sell(self, connection, request):
+
+        account = connection.account
+        with self.lock:
+            contract = account.contracts.get(request['sell'])
+
+        if contract is None:
+            return self.get_error(request, 'InvalidSellContractProposal', 'This contract has been sold.')
+
+        bid_price = self.get_bid_price(contract)
+        if float(request.get('price', 0)) > bid_price:
+            return self.get_error(request, 'InvalidtoSell', 'Contract price is below your limit.')
+
+        transaction_id = self.close_contract(account, contract, bid_price)
+        if transaction_id is None:
+            return self.get_error(request, 'InvalidSellContractProposal', 'This contract has been sold.')
+
+        return self.get_response(request, {
+            'balance_after' : account.balance,
+            'contract_id' : contract['contract_id'],
+            'reference_id' : contract['transaction_id'],
+            'sold_for' : bid_price,
+            'transaction_id' : transaction_id
+        })
+
+    def get_contract_proposal(self, contract_id):
+        '''
+        Returns state of opened or sold contract in proposal_open_contract format
+        :return: dict or None if contract is unknown
+        '''
+
+        with self.lock:
+            for account in self.accounts.values():
+                if contract_id in account.contracts:
+                    contract, sell_price = account.contracts[contract_id], None
+                    break
+                sold = [s for s in account.sold if s['contract_id'] == contract_id]
+                if len(sold) > 0:
+                    contract = sold[0]
+                    sell_price = sold[0]['sell_price']
+                    break
+            else:
+                return None
+
+        if sell_price is None:
+            bid_price = self.get_bid_price(contract)
+            symbol = contract['symbol']
+            contract_type = contract['contract_type']
+        else:
+            bid_price = sell_price
+            contract_type, symbol = contract['shortcode'].split('_', 1)
+
+        profit = round(bid_price - contract['buy_price'], 2)
+
+        return {
+            'bid_price' : bid_price,
+            'buy_price' : contract['buy_price'],
+            'contract_id' : contract_id,
+            'contract_type' : contract_type,
+            'current_spot' : self.get_spot(symbol),
+            'display_name' : symbol,
+            'entry_spot' : contract.get('entry_spot', self.get_spot(symbol)),
+            'is_expired' : 0 if sell_price is None else 1,
+            'is_sold' : 0 if sell_price is None else 1,
+            'is_valid_to_sell' : 1 if sell_price is None else 0,
+            'longcode' : contract['longcode'],
+            'payout' : contract['payout'],
+            'profit' : profit,
+            'profit_percentage' : round(profit / contract['buy_price'] * 100, 2),
+            'status' : 'open' if sell_price is None else ('won' if profit > 0 else 'lost')
+        }
+
+    def on_proposal_open_contract(self, connection, request):
+
+        if request.get('contract_id') is None:
+            # stream of all opened contracts: updates come by ticks
+            subscription_id = self.subscribe(connection, request)
+            if not subscription_id is None:
+                connection.open_contracts[subscription_id] = set()
+            return self.get_response(request, dict(), subscription_id)
+
+        proposal = self.get_contract_proposal(request.get('contract_id'))
+        if proposal is None:
+            return self.get_error(request, 'ContractNotFound', 'Contract not found.')
+
+        return self.get_response(request, proposal, self.subscribe(connection, request))
+
+    # Account
+
+    def on_balance(self, connection, request):
+
+        return self.get_response(request, {
+            'balance' : connection.account.balance,
+            'currency' : 'USD',
+            'loginid' : connection.account.loginid
+        }, self.subscribe(connection, request))
+
+    def on_portfolio(self, connection, request):
+
+        self.settle_expired()
+
+        with self.lock:
+            contracts = [dict(c) for c in connection.account.contracts.values()]
+
+        for contract in contracts:
+            contract.pop('entry_spot')
+            contract.pop('purchase_time')
+
+        return self.get_response(request, {'contracts' : contracts})
+
+    def get_page(self, request, transactions, time_key):
+        '''
+        Returns the latest first page of transactions filtered by request
+        date_from, date_to, limit and offset
+        :return: list
+        '''
+
+        date_from = int(request.get('date_from', 0) or 0)
+        date_to = int(request.get('date_to', 0) or 0)
+        limit = int(request.get('limit', 50))
+        offset = int(request.get('offset', 0))
+
+        selected = [t for t in reversed(transactions)
+                    if t[time_key] >= date_from and (date_to == 0 or t[time_key] <= date_to)]
+
+        return selected[offset:offset + limit]
+
+    def on_statement(self, connection, request):
+
+        self.settle_expired()
+
+        with self.lock:
+            transactions = self.get_page(request, connection.account.transactions, 'transaction_time')
+
+        return self.get_response(request, {'count' : len(transactions), 'transactions' : transactions})
+
+    def on_profit_table(self, connection, request):
+
+        self.settle_expired()
+
+        with self.lock:
+            transactions = self.get_page(request, connection.account.sold, 'sell_time')
+
+        return self.get_response(request, {'count' : len(transactions), 'transactions' : transactions})
+
+    def on_login_history(self, connection, request):
+
+        now = int(time.time())
+
+        return self.get_response(request, [{
+            'action' : 'login',
+            'environment' : 'IP=127.0.0.1 IP_COUNTRY=1 User_AGENT=FakeBinaryServer LANG=EN',
+            'status' : 1,
+            'time' : now
+        }])
+
+    # Streams
+
+    async def tick(self):
+        '''
+        Moves market and pushes updates of all subscriptions each tick_interval
+        '''
+
+        while True:
+            await asyncio.sleep(self.tick_interval)
+
+            try:
+                self.move_spots()
+                self.settle_expired()
+
+                for connection in list(self.connections):
+                    for subscription_id, (call, request, req_id) in list(connection.subscriptions.items()):
+                        for update in self.get_updates(connection, call, request, req_id, subscription_id):
+                            with self.lock:
+                                self.pushed += 1
+                            asyncio.ensure_future(self.send(connection, update))
+            except:
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def get_updates(self, connection, call, request, req_id, subscription_id):
+        '''
+        Returns the next updates of subscription
+        :return: list of dict
+        '''
+
+        if call == 'proposal_open_contract' and request.get('contract_id') is None:
+            return [self.get_update(connection, call, dict(request, contract_id=contract_id), req_id, subscription_id)
+                    for contract_id in self.get_streamed_contracts(connection, subscription_id)]
+
+        update = self.get_update(connection, call, request, req_id, subscription_id)
+
+        return [] if update is None else [update]
+
+    def get_streamed_contracts(self, connection, subscription_id):
+        '''
+        Returns ids of contracts opened now or at the previous update
+        of stream of all opened contracts, so sold ones get the last update
+        :return: list
+        '''
+
+        with self.lock:
+            opened = set(connection.account.contracts) if not connection.account is None else set()
+
+        previous = connection.open_contracts.get(subscription_id, set())
+        connection.open_contracts[subscription_id] = opened
+
+        return sorted(opened | previous)
+
+    def get_update(self, connection, call, request, req_id, subscription_id):
+        '''
+        Returns the next update of subscription
+        :return: dict or None if there is nothing to push
+        '''
+
+        subscription = {'id' : subscription_id}
+
+        if call == 'ticks_history':
+            if request.get('style', 'ticks') == 'candles':
+                response = {'msg_type' : 'ohlc', 'ohlc' : self.get_ohlc(request)}
+                response['ohlc']['id'] = subscription_id
+            else:
+                response = {'msg_type' : 'tick', 'tick' : self.get_tick(request['ticks_history'], subscription)}
+        elif call == 'ticks':
+            response = {'msg_type' : 'tick', 'tick' : self.get_tick(request['ticks'], subscription)}
+        elif call == 'proposal':
+            response = {'msg_type' : 'proposal', 'proposal' : self.get_proposal(request)}
+        elif call == 'proposal_open_contract':
+            proposal = self.get_contract_proposal(request.get('contract_id'))
+            if proposal is None:
+                return None
+            if proposal['is_sold'] and not subscription_id in connection.open_contracts:
+                # the last update of sold contract finishes the stream
+                connection.subscriptions.pop(subscription_id, None)
+            response = {'msg_type' : 'proposal_open_contract', 'proposal_open_contract' : proposal}
+        elif call == 'balance':
+            response = {'msg_type' : 'balance', 'balance' : {
+                'balance' : connection.account.balance,
+                'currency' : 'USD',
+                'loginid' : connection.account.loginid
+            }}
+        else:
+            return None
+
+        response['echo_req'] = request
+        response['subscription'] = subscription
+        if not req_id is None:
+            response['req_id'] = req_id
+
+        return response
+
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.INFO)
+
+    server = FakeBinaryServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    server.start()
+    print('Fake Binary.com server:', server.url)
+    print('Run application with BINARY_URL={}'.format(server.url))
+
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,233 @@
+'''
+    Candlestick chart which keeps its artists between updates.
+
+    Each candle slot has a wick (Line2D) and a body (Rectangle) created once.
+    Closed candles are drawn into cached background of axes,
+    the forming candle is animated: a tick restores background,
+    draws the forming candle only and blits axes.
+    Figure is redrawn completely only when a new candle comes
+    (dates are shifted), price leaves the axes or canvas is resized.
+
+    Works with any matplotlib canvas, blitting is used where it is supported
+    (FigureCanvasQTAgg), see Benchmarks.chart_benchmark for frame times.
+'''
+
+from collections import deque
+from datetime import datetime
+import time
+
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
+
+from Binary._latency import get_percentile
+
+
+class CandleRenderer:
+    '''
+        Renders the latest size candles given as tuple (date, open, high, low, close)
+
+        Statistics:
+            - frames - updates rendered
+            - full_draws - updates which redrew figure
+            - frame_p50 / frame_p99 / frame_max - seconds of the latest frames
+    '''
+
+    def __init__(self, canvas, ax, size=20, colorup='#13c585', colordown='#f71857',
+                 width=0.3, margin=0.1, time_format='%H:%M'):
+        '''
+        :param canvas: matplotlib canvas of axes
+        :param ax: axes with styles applied, they are not cleared
+        :param margin: part of price range added above and below candles
+        '''
+
+        self.canvas = canvas
+        self.ax = ax
+        self.size = size
+        self.colorup = colorup
+        self.colordown = colordown
+        self.width = width
+        self.margin = margin
+        self.time_format = time_format
+
+        self.wicks = []
+        self.bodies = []
+        for i in range(size):
+            wick = Line2D([i + 1, i + 1], [0, 0], linewidth=0.5, visible=False)
+            body = Rectangle((i + 1 - width / 2, 0), width, 0, visible=False)
+            ax.add_line(wick)
+            ax.add_patch(body)
+            self.wicks.append(wick)
+            self.bodies.append(body)
+
+        ax.set_xlim(0, size + 1)
+
+        # shown candles
+        self.candles = []
+
+        # key - date, value - label on x axis
+        self.labels = dict()
+
+        # axes without the forming candle, None until the first draw
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        self.frames = 0
+        self.full_draws = 0
+        self.frame_times = deque(maxlen=1000)
+
+    def reset(self):
+        '''
+        Hides candles, e.g. when asset or timeframe is changed
+        :return: None
+        '''
+
+        self.candles = []
+        self.labels = dict()
+
+        for wick, body in zip(self.wicks, self.bodies):
+            wick.set_visible(False)
+            body.set_visible(False)
+
+        self.canvas.draw_idle()
+
+    def set_candle(self, slot, candle):
+        '''
+        Changes geometry and color of candle slot
+        :return: None
+        '''
+
+        date, open_, high, low, close = candle[:5]
+        color = self.colorup if close >= open_ else self.colordown
+
+        wick = self.wicks[slot]
+        wick.set_ydata([low, high])
+        wick.set_color(color)
+        wick.set_visible(True)
+
+        body = self.bodies[slot]
+        body.set_y(min(open_, close))
+        body.set_height(abs(close - open_))
+        body.set_facecolor(color)
+        body.set_edgecolor(color)
+        body.set_visible(True)
+
+    def get_label(self, date):
+        '''
+        Returns label of date formatted once
+        '''
+
+        label = self.labels.get(date)
+        if label is None:
+            label = datetime.fromtimestamp(date).strftime(self.time_format)
+            self.labels[date] = label
+
+        return label
+
+    def is_inside(self, candle):
+        '''
+        Returns True if candle fits price range of axes
+        '''
+
+        bottom, top = self.ax.get_ylim()
+
+        return bottom <= candle[3] and candle[2] <= top
+
+    def update(self, candles):
+        '''
+        Shows candles. Only the forming candle is drawn if the others are not changed
+        :param candles: list of tuple (date, open, high, low, close), the latest last
+        :return: None
+        '''
+
+        start = time.perf_counter()
+
+        candles = list(candles[-self.size:])
+        if len(candles) == 0:
+            return
+
+        closed_changed = len(candles) != len(self.candles) or candles[:-1] != self.candles[:-1]
+
+        if self.background is None or closed_changed or not self.is_inside(candles[-1]):
+            self.draw_all(candles)
+        else:
+            self.set_candle(len(candles) - 1, candles[-1])
+            self.candles = candles
+            self.blit()
+
+        self.frames += 1
+        self.frame_times.append(time.perf_counter() - start)
+
+    def draw_all(self, candles):
+        '''
+        Places all candles, dates and price range and redraws figure
+        :return: None
+        '''
+
+        for slot, candle in enumerate(candles):
+            self.set_candle(slot, candle)
+            # closed candles are drawn into background
+            self.wicks[slot].set_animated(False)
+            self.bodies[slot].set_animated(False)
+
+        for slot in range(len(candles), self.size):
+            self.wicks[slot].set_visible(False)
+            self.bodies[slot].set_visible(False)
+
+        self.wicks[len(candles) - 1].set_animated(True)
+        self.bodies[len(candles) - 1].set_animated(True)
+
+        low = min(candle[3] for candle in candles)
+        high = max(candle[2] for candle in candles)
+        padding = (high - low) * self.margin or abs(high) * 0.0001 or 1
+        self.ax.set_ylim(low - padding, high + padding)
+
+        self.ax.set_xticks(range(1, len(candles) + 1))
+        self.ax.set_xticklabels([self.get_label(candle[0]) for candle in candles])
+
+        # labels of dates which are not shown are not kept
+        dates = set(candle[0] for candle in candles)
+        self.labels = {date : label for date, label in self.labels.items() if date in dates}
+
+        self.candles = candles
+        self.full_draws += 1
+
+        # background is taken by on_draw
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        '''
+        Takes background after figure is drawn (also on resize)
+        and draws the forming candle over it
+        '''
+
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_forming()
+
+    def draw_forming(self):
+
+        if len(self.candles) > 0:
+            self.ax.draw_artist(self.wicks[len(self.candles) - 1])
+            self.ax.draw_artist(self.bodies[len(self.candles) - 1])
+
+    def blit(self):
+
+        self.canvas.restore_region(self.background)
+        self.draw_forming()
+        self.canvas.blit(self.ax.bbox)
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        frame_times = sorted(self.frame_times)
+
+        return {
+            'frames' : self.frames,
+            'full_draws' : self.full_draws,
+            'frame_p50' : get_percentile(frame_times, 50),
+            'frame_p99' : get_percentile(frame_times, 99),
+            'frame_max' : frame_times[-1] if len(frame_times) > 0 else 0.0
+        }
@@ -5,15 +5,19 @@ from PyQt5.QtWidgets import *
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from mpl_finance import candlestick_ohlc
 
-import time
-from datetime import datetime
+import sys
+from threading import Event
 import re
 import logging
 import traceback
 from Binary.binary import Binary
-from Binary.binary_account import BinaryAccount
+from Binary._subscription import Subscription
+import Binary._responses as responses
+from Binary import session_pool
+from Binary.candle_store import CandleStore
+from Binary.resampler import CandleHub
+from GUI.candle_renderer import CandleRenderer
 
 import GUI._common_features as _common_features
 
@@ -25,14 +29,20 @@ class PriceDispatcher(QtCore.QThread):
     price_updated = QtCore.pyqtSignal(list)
     price_proposal_updated = QtCore.pyqtSignal(float, float, str, str, bool, str, bool, str)
 
-    def __init__(self, asset, duration, amount):
+    def __init__(self, asset, duration, amount, candle_hub=None):
         super(PriceDispatcher, self).__init__()
 
         self.asset = asset
         self.duration = duration
         self.amount = amount
 
-        self.last_proposal_update = 0
+        # candles are shown from store at once and streamed by shared base stream of asset,
+        # proposals are streamed by connection of the hub shared by all the charts
+        self.candle_hub = candle_hub
+
+        # set by subscriptions when update comes and by set_amount
+        self.updated = Event()
+        self.proposals_outdated = False
 
         self.killed = False
 
@@ -61,6 +71,36 @@ class PriceDispatcher(QtCore.QThread):
         :return:
         '''
         self.killed = True
+        self.updated.set()
+
+    def set_amount(self, amount):
+        '''
+        Changes trade amount. Proposal streams are resubscribed with new amount
+        :param amount: float
+        :return:
+        '''
+        self.amount = amount
+        self.proposals_outdated = True
+        self.updated.set()
+
+    def notify(self, subscription):
+        '''
+        Listener of all subscriptions: wakes up dispatcher loop
+        '''
+        self.updated.set()
+
+    def subscribe_proposals(self, binary):
+        '''
+        Opens live CALL and PUT proposal streams for current asset, duration and amount
+        :return: dict: contract type -> Subscription
+        '''
+
+        return {
+            type : binary.subscribe_price_proposal(asset=self.asset, amount=self.amount, type=type,
+                                                   duration=self.get_granularity()//60, duration_unit='m',
+                                                   mode=Subscription.LATEST_ONLY, listener=self.notify)
+            for type in ('CALL', 'PUT')
+        }
 
     def run(self):
         # Forex assets starts with 'frx' prefix
@@ -70,49 +110,143 @@ class PriceDispatcher(QtCore.QThread):
             if 'VOL100' in self.asset:
                 self.asset = 'R_100'
 
-        # init connection with Binary.com
-        binary = Binary()
-        binary.open_app()
-        time.sleep(1) # SORRY FOR THIS
+        if not self.candle_hub is None:
+            # stored candles are shown before connection is opened
+            candles = self.candle_hub.get_stored(self.asset, self.get_granularity(), 20)
+            if len(candles) > 0:
+                self.price_updated.emit(list(candles))
 
-        while not self.killed:
-            try:
-                # get history of prices
-                price = binary.get_history(asset=self.asset,
-                                          granularity=self.get_granularity(),
-                                          count=20,
-                                          subscribe=0,
-                                          style='candles')
-
-                # send signal about updated price
-                self.price_updated.emit(price)
-
-                # update proposal. but not too fast or Binary wont response
-                if time.time()-self.last_proposal_update>1.5:
-                    # send requests to get proposals for given asset
-                    proposal_up = binary.get_price_proposal(asset=self.asset, amount=self.amount, type='CALL',
-                                                            duration=self.get_granularity()//60, duration_unit='m')
-                    proposal_down = binary.get_price_proposal(asset=self.asset, amount=self.amount, type='PUT',
-                                                            duration=self.get_granularity()//60, duration_unit='m')
-
-                    self.price_proposal_updated.emit(proposal_up['payout'], proposal_down['payout'],
-                                                     proposal_up['proposal_id'], proposal_down['proposal_id'],
-                                                     proposal_up['error'], proposal_up['err_msg'],
-                                                     proposal_down['error'], proposal_down['err_msg'],
-                                                     )
-                    # save update time
-                    self.last_proposal_update = time.time()
-
-                # IT'S ENOUGH TO GET FRESH RESULTS AND NOT OVERLOAD COMPUTER AND SERVER
-                time.sleep(0.8)
+        if not self.candle_hub is None:
+            # connection of the hub is shared and closed by the hub
+            binary = self.candle_hub.open()
+        else:
+            # init connection with Binary.com
+            binary = Binary()
+            # requests are sent as soon as connection is opened
+            binary.open_app()
 
+        candle_stream = None
+        proposal_streams = {}
+
+        try:
+            if not self.candle_hub is None:
+                # candles of timeframe are resampled locally, requests are sent for new asset only
+                candles, candle_stream = self.candle_hub.subscribe(self.asset, self.get_granularity(), 20,
+                                                                   listener=self.notify)
+            else:
+                # get history of prices once, then only forming candle is streamed
+                candles, candle_stream = binary.get_history(asset=self.asset,
+                                                            granularity=self.get_granularity(),
+                                                            count=20,
+                                                            subscribe=1,
+                                                            style='candles',
+                                                            listener=self.notify)
+                if not candle_stream.error is None:
+                    # streaming is not allowed (closed market) - show history without updates
+                    logging.error(candle_stream.error)
+                    candles = binary.get_history(asset=self.asset,
+                                                 granularity=self.get_granularity(),
+                                                 count=20,
+                                                 subscribe=0,
+                                                 style='candles')
+
+            # send signal about loaded prices
+            self.price_updated.emit(list(candles))
+
+            # payout on Trade buttons is updated as soon as Binary.com reprices contracts
+            proposal_streams = self.subscribe_proposals(binary)
+            proposals = {
+                type : responses.parse_price_proposal({'error' : {'message' : stream.error}})
+                        if not stream.error is None else None
+                for type, stream in proposal_streams.items()
+            }
+            proposals_changed = True
+
+            while not self.killed:
+                try:
+                    if not proposals_changed:
+                        self.updated.wait()
+                    self.updated.clear()
+
+                    if self.killed:
+                        break
+
+                    # amount was changed - subscribe to new proposals
+                    if self.proposals_outdated:
+                        self.proposals_outdated = False
+                        for stream in proposal_streams.values():
+                            stream.close()
+                        proposal_streams = self.subscribe_proposals(binary)
+                        for type, stream in proposal_streams.items():
+                            if not stream.error is None:
+                                proposals[type] = responses.parse_price_proposal({'error' : {'message' : stream.error}})
+                                proposals_changed = True
+
+                    # take all the candle updates
+                    candles_changed = False
+                    candle = candle_stream.get_nowait()
+                    while not candle is None:
+                        self.merge_candle(candles, candle)
+                        candles_changed = True
+                        candle = candle_stream.get_nowait()
+
+                    if candles_changed:
+                        # send signal about updated price
+                        self.price_updated.emit(list(candles))
+
+                    # take the latest proposals
+                    for type, stream in proposal_streams.items():
+                        proposal = stream.get_nowait()
+                        if not proposal is None:
+                            proposals[type] = proposal
+                            proposals_changed = True
+
+                    if proposals_changed and not proposals['CALL'] is None and not proposals['PUT'] is None:
+                        proposal_up, proposal_down = proposals['CALL'], proposals['PUT']
+                        self.price_proposal_updated.emit(proposal_up['payout'], proposal_down['payout'],
+                                                         proposal_up['proposal_id'], proposal_down['proposal_id'],
+                                                         proposal_up['error'], proposal_up['err_msg'],
+                                                         proposal_down['error'], proposal_down['err_msg'],
+                                                         )
+                    proposals_changed = False
+
+                except:
+                    ex_type, ex_val, ex_tb = sys.exc_info()
+                    logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+                    logging.error(ex_val)
+
+        except:
+            # no connection with Binary.com
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+        finally:
+            # close streams and own connection when requested or lost
+            try:
+                if not candle_stream is None:
+                    candle_stream.close()
+                for stream in proposal_streams.values():
+                    stream.close()
             except:
                 ex_type, ex_val, ex_tb = sys.exc_info()
                 logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
-                logging.error(ex_val)
+            if self.candle_hub is None:
+                binary.close_app()
+
+    def merge_candle(self, candles, candle):
+        '''
+        Replaces forming candle or appends new one keeping window size
+        :param candles: list of tuples returned by binary.get_history
+        :param candle: streamed tuple (date, open, high, low, close)
+        :return: None
+        '''
 
-        # close connection when requested
-        binary.close_app()
+        if len(candles) > 0 and candles[-1][0] == candle[0]:
+            candles[-1] = candle
+        elif len(candles) == 0 or candles[-1][0] < candle[0]:
+            candles.append(candle)
+            if len(candles) > 20:
+                candles.pop(0)
 
 class Chart_window(QWidget):
     '''
@@ -125,6 +259,13 @@ class Chart_window(QWidget):
 
         self.settings_dispatcher = settings_dispatcher
 
+        candle_dir = self.settings_dispatcher.get_value('candle_dir')                     \
+                        if not self.settings_dispatcher is None and                      \
+                           self.settings_dispatcher.is_param('candle_dir') else None
+        self.candle_store = CandleStore(candle_dir)
+        # one base candle stream per asset for all timeframes
+        self.candle_hub = CandleHub(self.candle_store)
+
         self.setWindowTitle('Chart and Trade')
 
         _common_features.init_styles(self)
@@ -188,6 +329,9 @@ class Chart_window(QWidget):
         self.figure.subplots_adjust(left=0.09, bottom=0.20, right=0.94, top=0.90, wspace=0.2, hspace=0)
         #self.ax.autoscale(tight=True)
 
+        # figure and candle artists are kept for all assets and timeframes
+        self.renderer = CandleRenderer(self.chart_view, self.ax, size=20)
+
         grid.addWidget(self.chart_view, 1, 0, 1, 2)
 
         #--------------------------------------------------------------------------------
@@ -246,13 +390,11 @@ class Chart_window(QWidget):
             QMessageBox.information(self, 'Trade failed',"Set valid amount")
             return
 
-        # if all the parameters are ok - buy an option
-        acc = BinaryAccount(apiToken)
-        acc.open_app()
-        time.sleep(1)
-
         # get result and show message
         try:
+            # if all the parameters are ok - buy an option
+            acc = session_pool.get_pool().get_session(apiToken)
+
             res = acc.buy_contract(amount=amount, type='CALL', duration=self.price_disp.get_granularity()//60,
                                duration_unit='m', symbol=self.price_disp.asset)
 
@@ -263,8 +405,6 @@ class Chart_window(QWidget):
                                 (str(res['balance_after']) if 'balance_after' in res else '-'))
         except Exception as e:
             QMessageBox.warning(self, "Error", str(e))
-        finally:
-            acc.close_app()
 
     def trade_down(self):
         '''
@@ -288,12 +428,11 @@ class Chart_window(QWidget):
             QMessageBox.information(self, 'Trade failed',"Set valid amount")
             return
 
-        # if all the parameters are ok - buy an option
-        acc = BinaryAccount(apiToken)
-        acc.open_app()
-
         # get result and show message
         try:
+            # if all the parameters are ok - buy an option
+            acc = session_pool.get_pool().get_session(apiToken)
+
             res = acc.buy_contract(amount=amount, type='PUT', duration=self.price_disp.get_granularity()//60,
                                duration_unit='m', symbol=self.price_disp.asset)
 
@@ -304,8 +443,6 @@ class Chart_window(QWidget):
                                 (str(res['balance_after']) if 'balance_after' in res else '-'))
         except Exception as e:
             QMessageBox.warning(self, "Error", str(e))
-        finally:
-            acc.close_app()
 
     def amount_changed(self, text):
         '''
@@ -316,26 +453,14 @@ class Chart_window(QWidget):
         if not self.price_disp is None:
             try:
                 amount = float(text)
-                self.price_disp.amount = amount
+                self.price_disp.set_amount(amount)
             except:
                 self.trade_amount_editor.clear()
 
     def start_updater(self):
 
-        # Init chart widgets and start price dispatcher (updater)
-        self.grid.removeWidget(self.chart_view)
-
-        self.figure = Figure(figsize=(20,15), facecolor='#141523', edgecolor='#141523')
-        self.chart_view = FigureCanvas(self.figure)
-
-        self.ax = self.figure.add_subplot(facecolor='#141523')
-        self.ax.tick_params(grid_color='#797987', colors='#797987', bottom=False, labelcolor='w')
-
-        self.ax.grid()
-        self.figure.autofmt_xdate()
-        self.figure.subplots_adjust(left=0.09, bottom=0.20, right=0.94, top=0.90, wspace=0.2, hspace=0)
-
-        self.grid.addWidget(self.chart_view, 1, 0, 1, 2)
+        # Clear chart and start price dispatcher (updater)
+        self.renderer.reset()
         #----------------------------------------------------------------------------------------------
 
         if not self.price_disp is None:
@@ -348,7 +473,12 @@ class Chart_window(QWidget):
             amount = 1
             self.trade_amount_editor.setText('1')
 
-        self.price_disp = PriceDispatcher(self.asset_box.currentText(), self.time_box.currentText(), amount)
+        # open account session beforehand to trade without connecting
+        apiToken = self.settings_dispatcher.get_value('api_token')
+        session_pool.get_pool().warm_up(apiToken)
+
+        self.price_disp = PriceDispatcher(self.asset_box.currentText(), self.time_box.currentText(), amount,
+                                          candle_hub=self.candle_hub)
         self.price_disp.price_updated.connect(self.update_chart)
         self.price_disp.price_proposal_updated.connect(self.payout_updated)
         self.price_disp.start()
@@ -356,11 +486,24 @@ class Chart_window(QWidget):
     def stop_updater(self):
 
         self.price_disp.stop()
-        time.sleep(2) # SORRY FOR THIS
+        # thread finishes as soon as it is woken up
+        self.price_disp.wait(2000)
         del self.price_disp
 
         self.price_disp = None
 
+        logging.info('Chart frame times: {}'.format(self.renderer.get_stats()))
+
+    def close_(self):
+
+        if not self.price_disp is None:
+            self.stop_updater()
+
+        logging.info('Chart candle streams: {}'.format(self.candle_hub.get_stats()))
+        self.candle_hub.close()
+        self.candle_store.close()
+        self.close()
+
     def payout_updated(self, up, down, up_id, down_id, err_up, err_msg_up, err_down, err_msg_down):
         '''
         Update PAYOUT information on tooltips on Trade buttons
@@ -391,34 +534,15 @@ class Chart_window(QWidget):
         Redraw chart with new data
         candle_data is list that was returned by binary.get_history
         this is list of tuples :
-        tuple = (date, open, high, low, close, subscription_id)
+        tuple = (date, open, high, low, close)
 
+        Only the forming candle is redrawn while the others are the same
+        (see GUI.candle_renderer)
         :param candle_data:
         :return:
         '''
 
-        self.ax.clear()
-        self.ax.tick_params(grid_color='#797987', colors='#797987', bottom=False, labelcolor='w')
-
-        self.ax.grid()
-
-        dates = list(map(
-            lambda x: datetime.fromtimestamp(x[0]).strftime('%H:%M'),
-            candle_data))
-        i = 0
-        def I():
-            nonlocal i
-            i+=1
-            return i
-
-        candle_data = list(map(lambda x: (I(), x[1], x[2], x[3], x[4]), candle_data))
-        candlestick_ohlc(self.ax, candle_data, colorup='#13c585', colordown='#f71857', width=0.3)
-
-        self.ax.set_xticklabels(dates)
-        # remove subscription id from tuples
-
-        self.ax.set_xticklabels(dates)
-        self.chart_view.draw()
+        self.renderer.update(candle_data)
 
 if __name__ == '__main__':
 
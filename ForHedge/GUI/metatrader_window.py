@@ -13,7 +13,13 @@ from PyQt5.QtCore import Qt, QThread
 from GUI import _common_features
 from MetaTrader.mt_account import MetaTraderAccount
 from datetime import datetime
-from Binary import binary_account
+from threading import Thread, Lock
+import logging
+import sys
+import time
+import traceback
+from Binary import session_pool
+from Binary.hedge_cache import HedgeProposalCache
 
 class TransactionListener(QThread):
     '''
@@ -25,6 +31,10 @@ class MTWindow(QWidget):
     '''
 
     '''
+
+    # symbols which hedge proposals are armed for if 'hedge_symbols' is not set
+    hedge_symbols = ['frxEURUSD', 'frxAUDUSD', 'frxEURJPY', 'frxUSDCAD', 'frxEURCHF']
+
     def __init__(self, settings_dispatcher):
         '''
             Initializes local variables
@@ -39,6 +49,9 @@ class MTWindow(QWidget):
         self.monitoring_flag = False
         self.settings_dispatcher = settings_dispatcher
         self.mt_listener = None
+        self.hedge_cache = None
+        # hedge cache is replaced by one thread at a time
+        self.hedge_cache_lock = Lock()
 
         _common_features.init_styles(self)
         self.init_widgets()
@@ -121,9 +134,9 @@ class MTWindow(QWidget):
         #--------------------------------------------------------------------------------------
 
         self.transactions_table = QTableWidget()
-        self.transactions_table.setColumnCount(8)
+        self.transactions_table.setColumnCount(9)
         self.transactions_table.setHorizontalHeaderLabels([
-            'Rcv Time', 'Asset', 'Type', 'Price', 'Volume', 'Take profit', 'Stop loss', 'Binary Hedge'
+            'Rcv Time', 'Asset', 'Type', 'Price', 'Volume', 'Take profit', 'Stop loss', 'Binary Hedge', 'Latency'
         ])
 
         self.transactions_table.horizontalHeader().setStyleSheet(label_stylesheet)
@@ -167,10 +180,77 @@ class MTWindow(QWidget):
                 return
 
         # reached when server started successfully
+        # open binary session beforehand to not connect on the first hedge
+        if self.settings_dispatcher.is_param('api_token'):
+            session_pool.get_pool().warm_up(self.settings_dispatcher.get_value('api_token'))
+            self.arm_hedge_cache()
+
         self.set_monitor_button_on()
         self.monitoring_button.setText("Monitoring: {}:{}".format(self.mt_listener.host, self.mt_listener.port))
         self.monitoring_button.setEnabled(False)
 
+    def get_hedge_settings(self):
+        '''
+            Returns parameters which allow to buy an option at binary.com
+        :return: tuple(token, hedge_amount, hedge_time)
+        '''
+
+        token = self.settings_dispatcher.get_value('api_token')     \
+                if self.settings_dispatcher.is_param('api_token')   \
+                else ''
+
+        hedge_amount = self.settings_dispatcher.get_value('hedge_amount')     \
+                if self.settings_dispatcher.is_param('hedge_amount')   \
+                else 0
+
+        hedge_time = self.settings_dispatcher.get_value('hedge_time')     \
+                if self.settings_dispatcher.is_param('hedge_time')   \
+                else 0
+
+        return token, hedge_amount, hedge_time
+
+    def arm_hedge_cache(self, fallback_latency=None):
+        '''
+            Subscribes to hedge proposals in background,
+            so received order is hedged by one 'buy' request
+        :param fallback_latency: seconds of the latest hedge bought by parameters
+        :return:
+        '''
+
+        Thread(target=self.replace_hedge_cache, args=(fallback_latency,), daemon=True).start()
+
+    def replace_hedge_cache(self, fallback_latency):
+        '''
+            Opens session and arms new hedge cache instead of the current one.
+            Called in background: forgetting old proposals takes round trips
+        :return:
+        '''
+
+        token, hedge_amount, hedge_time = self.get_hedge_settings()
+        if token == '' or hedge_amount == 0 or hedge_time == 0:
+            return
+
+        symbols = self.settings_dispatcher.get_value('hedge_symbols')     \
+                if self.settings_dispatcher.is_param('hedge_symbols')   \
+                else self.hedge_symbols
+
+        try:
+            with self.hedge_cache_lock:
+                old_cache = self.hedge_cache
+
+                self.hedge_cache = HedgeProposalCache(account=session_pool.get_pool().get_session(token),
+                                                      symbols=symbols,
+                                                      amount=hedge_amount,
+                                                      duration=hedge_time,
+                                                      fallback_latency=fallback_latency)
+                self.hedge_cache.start()
+
+                if not old_cache is None:
+                    old_cache.close()
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
     def set_monitor_button_on(self):
         '''
             Changes design of Monitoring button when Monitoring is disabled
@@ -195,21 +275,14 @@ class MTWindow(QWidget):
         :param t: dict returned by mt_account after receiving order event
         :return:
         '''
+        # hedge time and round trip time of connection
+        latency = ''
+
         try:
             if self.transaction_checker.isChecked():
 
                 # get parameters which allows to buy an option at binary.com
-                token = self.settings_dispatcher.get_value('api_token')     \
-                        if self.settings_dispatcher.is_param('api_token')   \
-                        else ''
-
-                hedge_amount = self.settings_dispatcher.get_value('hedge_amount')     \
-                        if self.settings_dispatcher.is_param('hedge_amount')   \
-                        else 0
-
-                hedge_time = self.settings_dispatcher.get_value('hedge_time')     \
-                        if self.settings_dispatcher.is_param('hedge_time')   \
-                        else 0
+                token, hedge_amount, hedge_time = self.get_hedge_settings()
 
                 # check parameters. if ok - buy option
                 if token == '':
@@ -219,22 +292,58 @@ class MTWindow(QWidget):
                 elif hedge_time == 0:
                     msg = 'Enter token to enable hedging'
                 else:
-                    # connect to binary account
-                    bin_acc = binary_account.BinaryAccount(token)
-                    bin_acc.open_app()
-
-                    # buy option in opposite direction
-                    resp = bin_acc.buy_contract(
-                        amount=hedge_amount,
-                        duration=hedge_time,
-                        duration_unit='m',
-                        symbol=t['symbol'],
-                        type='CALL' if t['type']=='SELL' else 'PUT'
-                    )
+                    # take ready authorized session
+                    bin_acc = session_pool.get_pool().get_session(token)
+
+                    type = 'CALL' if t['type']=='SELL' else 'PUT'
+                    start = time.perf_counter()
+
+                    # the same hedge for other accounts of the shop
+                    hedge_tokens = self.settings_dispatcher.get_value('hedge_tokens')     \
+                            if self.settings_dispatcher.is_param('hedge_tokens')   \
+                            else []
+                    hedge_tokens = [tok for tok in hedge_tokens if tok != token]
+                    accounts = ''
+
+                    if len(hedge_tokens) > 0:
+                        results = session_pool.get_pool().buy_for_accounts([token] + hedge_tokens,
+                                                                           amount=hedge_amount,
+                                                                           type=type,
+                                                                           duration=hedge_time,
+                                                                           duration_unit='m',
+                                                                           symbol=t['symbol'])
+                        resp = results[token] if token in results else {'error' : 'No result'}
+
+                        failed = [r['error'] for r in results.values() if 'error' in r]
+                        accounts = ' ({} of {} accounts hedged)'.format(len(results) - len(failed), len(results))
+                        if len(failed) > 0:
+                            logging.error('Hedge failed for {} of {} accounts: {}'.format(
+                                len(failed), len(results), failed))
+                    elif not self.hedge_cache is None and \
+                            self.hedge_cache.matches(bin_acc, hedge_amount, hedge_time):
+                        # buy option in opposite direction by armed proposal
+                        resp = self.hedge_cache.buy(t['symbol'], type)
+                    else:
+                        # buy option in opposite direction
+                        resp = bin_acc.buy_contract(
+                            amount=hedge_amount,
+                            duration=hedge_time,
+                            duration_unit='m',
+                            symbol=t['symbol'],
+                            type=type
+                        )
+
+                        # settings or session changed - arm proposals for the next orders
+                        self.arm_hedge_cache(time.perf_counter() - start)
 
                     # show result of try
-                    msg = resp['description'] if not 'error' in resp else resp['error']
-                    bin_acc.close_app()
+                    msg = (resp['description'] if not 'error' in resp else resp['error']) + accounts
+
+                    # slow hedge with small RTT means the time is lost in our process
+                    rtt = bin_acc.get_latency_stats()
+                    latency = '{:.0f} ms (rtt p50 {:.0f} ms{})'.format((time.perf_counter() - start) * 1000,
+                                                                       rtt['rtt_p50'] * 1000,
+                                                                       ', degraded' if rtt['degraded'] else '')
             else:
                 msg = 'Hedging Not Checked'
         except Exception as e:
@@ -250,6 +359,7 @@ class MTWindow(QWidget):
         self.transactions_table.setItem(0, 5, QTableWidgetItem(str(t['take_profit'])))
         self.transactions_table.setItem(0, 6, QTableWidgetItem(str(t['stop_loss'])))
         self.transactions_table.setItem(0, 7, QTableWidgetItem(msg))
+        self.transactions_table.setItem(0, 8, QTableWidgetItem(latency))
 
         self.transactions_table.resizeColumnsToContents()
 
@@ -262,4 +372,7 @@ class MTWindow(QWidget):
             self.mt_listener.connection_alive = False
             self.mt_listener.kill()
 
+        if not self.hedge_cache is None:
+            self.hedge_cache.close()
+
         self.close()
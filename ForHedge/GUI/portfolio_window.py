@@ -0,0 +1,315 @@
+'''
+    Widget that shows opened positions of the account:
+        - portfolio is loaded once, then all positions are updated
+          by one proposal_open_contract stream (Binary.portfolio_tracker)
+        - changes are taken by timer, only changed rows are repainted
+        - total mark-to-market profit
+'''
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt, QThread, QAbstractTableModel, QModelIndex, QTimer
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import *
+from GUI import _common_features
+from Binary import session_pool
+from Binary.portfolio_tracker import PortfolioTracker
+from datetime import datetime
+import logging
+import sys
+import traceback
+
+
+class PortfolioModel(QAbstractTableModel):
+    '''
+        Opened positions in order they were added.
+        Texts of row are formatted when position changes, not when it is painted
+    '''
+
+    '''
+        tuple(header, function of position which returns text)
+    '''
+    COLUMNS = [
+        ('Contract', lambda p: str(p['contract_id'])),
+        ('Symbol', lambda p: p['symbol']),
+        ('Type', lambda p: p['contract_type']),
+        ('Expiry', lambda p: '' if p['date_end'] is None else
+                             datetime.fromtimestamp(p['date_end']).strftime('%d.%m.%Y %H:%M:%S')),
+        ('Buy price', lambda p: '{:.2f}'.format(p['buy_price'])),
+        ('Bid price', lambda p: '' if p['bid_price'] is None else '{:.2f}'.format(p['bid_price'])),
+        ('Profit', lambda p: '' if p['profit'] is None else '{:.2f}'.format(p['profit'])),
+        ('Payout', lambda p: '{:.2f}'.format(p['payout'])),
+        ('Spot', lambda p: '' if p['current_spot'] is None else str(p['current_spot']))
+    ]
+
+    PROFIT_COLUMN = 6
+
+    def __init__(self):
+
+        super().__init__()
+
+        # list of tuple(contract_id, texts, profit)
+        self.rows = []
+
+        # key - contract_id, value - row number
+        self.index = dict()
+
+    def format_row(self, position):
+
+        return position['contract_id'], tuple(f(position) for _, f in self.COLUMNS), position['profit']
+
+    def clear(self):
+
+        self.beginResetModel()
+        self.rows = []
+        self.index = dict()
+        self.endResetModel()
+
+    def apply_changes(self, changed, sold):
+        '''
+        Repaints changed rows, appends new positions and removes sold ones
+        :param changed: list of position dicts
+        :param sold: list of position dicts
+        :return: None
+        '''
+
+        added = []
+        for position in changed:
+            row = self.index.get(position['contract_id'])
+            if row is None:
+                added.append(position)
+                continue
+
+            self.rows[row] = self.format_row(position)
+            self.dataChanged.emit(self.createIndex(row, 0), self.createIndex(row, len(self.COLUMNS) - 1))
+
+        if len(added) > 0:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            for position in added:
+                self.index[position['contract_id']] = len(self.rows)
+                self.rows.append(self.format_row(position))
+            self.endInsertRows()
+
+        # from the last row, so numbers of rows to remove do not shift
+        for row in sorted((self.index[p['contract_id']] for p in sold if p['contract_id'] in self.index),
+                          reverse=True):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.rows.pop(row)
+            self.endRemoveRows()
+
+        if len(sold) > 0:
+            self.index = {row[0] : i for i, row in enumerate(self.rows)}
+
+    def rowCount(self, parent=QModelIndex()):
+
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+
+        if not index.isValid():
+            return None
+
+        if role == Qt.DisplayRole:
+            return self.rows[index.row()][1][index.column()]
+
+        if role == Qt.ForegroundRole and index.column() == self.PROFIT_COLUMN:
+            profit = self.rows[index.row()][2]
+            if not profit is None and profit != 0:
+                return QColor('green') if profit > 0 else QColor('red')
+
+        if role == Qt.TextAlignmentRole and index.column() >= 4:
+            return Qt.AlignRight | Qt.AlignVCenter
+
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][0]
+
+        return None
+
+
+class TrackerStarter(QThread):
+    '''
+        Opens session, subscribes to updates and loads portfolio in background
+    '''
+    loaded = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, token):
+
+        super().__init__()
+
+        self.token = token
+        self.tracker = None
+
+    def run(self):
+
+        try:
+            account = session_pool.get_pool().get_session(self.token)
+            self.tracker = PortfolioTracker(account)
+
+            if self.tracker.start(timeout=30):
+                self.loaded.emit()
+            else:
+                self.failed.emit(self.tracker.error)
+        except Exception as e:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+            self.failed.emit(str(e))
+
+
+class Portfolio_window(QWidget):
+    '''
+        Opened positions of the account set in settings.
+        Positions are tracked while window is shown
+    '''
+
+    # milliseconds between repaints, updates of this time are coalesced
+    REFRESH_INTERVAL = 200
+
+    def __init__(self, settings_dispatcher):
+
+        super().__init__()
+
+        self.settings_dispatcher = settings_dispatcher
+
+        self.tracker = None
+        self.starter = None
+        self.model = PortfolioModel()
+
+        self.timer = QTimer()
+        self.timer.setInterval(self.REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+
+        _common_features.init_styles(self)
+        self.init_widgets()
+
+    def init_widgets(self):
+
+        label_stylesheet = self.settings_dispatcher.get_value('label_stylesheet')   \
+                            if self.settings_dispatcher.is_param('label_stylesheet')\
+                            else self.label_style_sheet
+
+        table_stylesheet = self.settings_dispatcher.get_value('table_stylesheet')   \
+                            if self.settings_dispatcher.is_param('table_stylesheet')\
+                            else self.table_stylesheet
+
+        self.vbox = QVBoxLayout()
+
+        head_label = QLabel('Portfolio')
+        head_label.setStyleSheet(self.settings_dispatcher.get_value('head_label_stylesheet')
+                                 if self.settings_dispatcher.is_param('head_label_stylesheet')
+                                 else self.head_label_stylesheet)
+        self.vbox.addWidget(head_label)
+        #--------------------------------------------------------------------------------------
+
+        self.summary_label = QLabel('')
+        self.summary_label.setStyleSheet(label_stylesheet)
+        self.vbox.addWidget(self.summary_label)
+        #--------------------------------------------------------------------------------------
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+
+        self.table.horizontalHeader().setStyleSheet(label_stylesheet)
+        self.table.setStyleSheet(table_stylesheet)
+
+        # fixed row height - view does not measure rows on each update
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        self.vbox.addWidget(self.table, 2)
+        #--------------------------------------------------------------------------------------
+
+        self.vbox.setContentsMargins(2,2,2,2)
+        self.vbox.setAlignment(Qt.AlignTop)
+        self.setLayout(self.vbox)
+
+    def showEvent(self, event):
+
+        super().showEvent(event)
+        self.start_tracking()
+
+    def hideEvent(self, event):
+
+        super().hideEvent(event)
+        self.stop_tracking()
+
+    def start_tracking(self):
+        '''
+        Loads portfolio and starts updates in background
+        :return:
+        '''
+
+        if not self.settings_dispatcher.is_param('api_token'):
+            self.summary_label.setText('Enter token to load portfolio')
+            return
+
+        if not self.tracker is None or (not self.starter is None and self.starter.isRunning()):
+            return
+
+        self.summary_label.setText('Loading portfolio...')
+        self.starter = TrackerStarter(self.settings_dispatcher.get_value('api_token'))
+        self.starter.loaded.connect(self.tracking_started)
+        self.starter.failed.connect(self.tracking_failed)
+        self.starter.start()
+
+    def tracking_started(self):
+
+        self.tracker = self.starter.tracker
+
+        if not self.isVisible():
+            # window was closed while portfolio was loading
+            self.stop_tracking()
+            return
+
+        self.model.clear()
+        self.refresh()
+        self.timer.start()
+
+    def tracking_failed(self, error):
+
+        self.summary_label.setText('Portfolio is not loaded: ' + error)
+
+    def stop_tracking(self):
+
+        self.timer.stop()
+
+        if not self.tracker is None:
+            self.tracker.stop()
+            self.tracker = None
+
+    def refresh(self):
+        '''
+        Paints positions changed since the previous refresh
+        :return:
+        '''
+
+        if self.tracker is None:
+            return
+
+        changed, sold = self.tracker.take_changes()
+        if len(changed) > 0 or len(sold) > 0:
+            self.model.apply_changes(changed, sold)
+
+        totals = self.tracker.get_totals()
+        self.summary_label.setText('Positions: {}   Invested: {:.2f}   Value: {:.2f}   Profit: {:.2f}   Realized: {:.2f}'.format(
+            totals['positions'], totals['invested'], totals['value'], totals['profit'], totals['realized']))
+
+    def close_(self):
+
+        if not self.starter is None:
+            self.starter.wait(2000)
+            if self.tracker is None and not self.starter.tracker is None:
+                # loaded, but signal is not handled yet
+                self.tracker = self.starter.tracker
+
+        self.stop_tracking()
+        self.close()
@@ -0,0 +1,369 @@
+'''
+    Widget that shows closed contracts (profit table) of the account:
+        - contracts are synced into local HistoryStore in background
+        - table reads the store page by page while it is scrolled,
+          so it stays fast for hundreds of thousands of contracts
+        - sorting and period filter are done by the store (SQLite)
+        - summary of the period
+'''
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt, QThread, QAbstractTableModel, QModelIndex, QDate, QDateTime
+from PyQt5.QtWidgets import *
+from GUI import _common_features
+from Binary import session_pool
+from Binary.history_store import HistoryStore, HistorySync
+from datetime import datetime
+import logging
+import sys
+import traceback
+
+
+class ProfitTableModel(QAbstractTableModel):
+    '''
+        Lazy model of profit table of one account in HistoryStore.
+        Rows are loaded by pages of page_size when view asks for more
+        (canFetchMore / fetchMore), only loaded rows are kept.
+    '''
+
+    '''
+        tuple(header, key of row and sort key of HistoryStore.get_profit_table)
+    '''
+    COLUMNS = [
+        ('Contract', 'contract_id'),
+        ('Purchase time', 'purchase_time'),
+        ('Sell time', 'sell_time'),
+        ('Buy price', 'price'),
+        ('Sell price', 'sell_price'),
+        ('Profit', 'profit'),
+        ('Payout', 'potential_payout'),
+        ('Description', 'description')
+    ]
+
+    def __init__(self, store, page_size=200):
+
+        super().__init__()
+
+        self.store = store
+        self.page_size = page_size
+
+        self.account = None
+        self.date_from = None
+        self.date_to = None
+        self.order_by = 'sell_time'
+        self.descending = True
+
+        self.rows = []
+        self.total = 0
+
+    def set_account(self, account):
+        '''
+        :param account: loginid
+        '''
+        self.account = account
+        self.refresh()
+
+    def set_period(self, date_from, date_to):
+        '''
+        Shows contracts sold in period
+        :param date_from: epoch or None
+        :param date_to: epoch or None
+        '''
+        self.date_from = date_from
+        self.date_to = date_to
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Drops loaded rows. The first page is loaded when view asks for it
+        '''
+
+        self.beginResetModel()
+        self.rows = []
+        self.total = 0 if self.account is None else \
+                     self.store.count_profit_table(self.account, self.date_from, self.date_to)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+
+        return not parent.isValid() and len(self.rows) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+
+        if parent.isValid():
+            return
+
+        page = self.store.get_profit_table(self.account,
+                                           date_from=self.date_from,
+                                           date_to=self.date_to,
+                                           limit=self.page_size,
+                                           offset=len(self.rows),
+                                           order_by=self.order_by,
+                                           descending=self.descending)
+        if len(page) == 0:
+            # contracts were removed meanwhile
+            self.total = len(self.rows)
+            return
+
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(self.format_row(row) for row in page)
+        self.endInsertRows()
+
+    def format_row(self, row):
+        '''
+        Converts row of store into texts of columns once,
+        so painting does not convert values
+        :return: tuple of str
+        '''
+
+        return (
+            str(row['contract_id']),
+            datetime.fromtimestamp(row['purchase_time']).strftime('%d.%m.%Y %H:%M:%S'),
+            datetime.fromtimestamp(row['sell_time']).strftime('%d.%m.%Y %H:%M:%S'),
+            '{:.2f}'.format(row['price']),
+            '{:.2f}'.format(row['sell_price']),
+            '{:.2f}'.format(row['sell_price'] - row['price']),
+            '{:.2f}'.format(row['potential_payout']),
+            row['description']
+        )
+
+    def data(self, index, role=Qt.DisplayRole):
+
+        if not index.isValid():
+            return None
+
+        if role == Qt.DisplayRole:
+            return self.rows[index.row()][index.column()]
+
+        if role == Qt.TextAlignmentRole and 0 < index.column() < len(self.COLUMNS) - 1:
+            return Qt.AlignRight | Qt.AlignVCenter
+
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][0]
+
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        '''
+        Sorting is done by store, loaded rows are dropped
+        '''
+
+        self.order_by = self.COLUMNS[column][1]
+        self.descending = order == Qt.DescendingOrder
+        self.refresh()
+
+
+class SyncThread(QThread):
+    '''
+        Syncs profit table of the account into store in background
+    '''
+    synced = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, token, store):
+
+        super().__init__()
+
+        self.token = token
+        self.store = store
+
+    def run(self):
+
+        try:
+            account = session_pool.get_pool().get_session(self.token)
+            result = HistorySync(account, self.store).sync(tables=('profit_table',))
+            if result['profit_table'] is None:
+                # error is logged by HistorySync
+                self.failed.emit('profit table was not loaded, see log')
+                return
+            self.synced.emit(account.loginid)
+        except Exception as e:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+            self.failed.emit(str(e))
+
+
+class Profit_table_window(QWidget):
+    '''
+        Profit table of the account set in settings
+    '''
+
+    def __init__(self, settings_dispatcher):
+
+        super().__init__()
+
+        self.settings_dispatcher = settings_dispatcher
+        self.sync_thread = None
+
+        path = self.settings_dispatcher.get_value('history_db')     \
+                if self.settings_dispatcher.is_param('history_db')  \
+                else 'history.sqlite'
+        self.store = HistoryStore(path)
+        self.model = ProfitTableModel(self.store)
+
+        _common_features.init_styles(self)
+        self.init_widgets()
+
+    def init_widgets(self):
+
+        label_stylesheet = self.settings_dispatcher.get_value('label_stylesheet')   \
+                            if self.settings_dispatcher.is_param('label_stylesheet')\
+                            else self.label_style_sheet
+
+        table_stylesheet = self.settings_dispatcher.get_value('table_stylesheet')   \
+                            if self.settings_dispatcher.is_param('table_stylesheet')\
+                            else self.table_stylesheet
+
+        self.vbox = QVBoxLayout()
+
+        head_label = QLabel('Profit Table')
+        head_label.setStyleSheet(self.settings_dispatcher.get_value('head_label_stylesheet')
+                                 if self.settings_dispatcher.is_param('head_label_stylesheet')
+                                 else self.head_label_stylesheet)
+        self.vbox.addWidget(head_label)
+        #--------------------------------------------------------------------------------------
+
+        period_row = QHBoxLayout()
+
+        label = QLabel('From:')
+        label.setStyleSheet(label_stylesheet)
+        period_row.addWidget(label)
+
+        self.date_from_editor = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.date_from_editor.setCalendarPopup(True)
+        self.date_from_editor.dateChanged.connect(self.period_changed)
+        period_row.addWidget(self.date_from_editor)
+
+        label = QLabel('To:')
+        label.setStyleSheet(label_stylesheet)
+        period_row.addWidget(label)
+
+        self.date_to_editor = QDateEdit(QDate.currentDate())
+        self.date_to_editor.setCalendarPopup(True)
+        self.date_to_editor.dateChanged.connect(self.period_changed)
+        period_row.addWidget(self.date_to_editor)
+
+        self.sync_button = QPushButton('Sync')
+        self.sync_button.setStyleSheet(self.button_stylesheet)
+        self.sync_button.clicked.connect(self.sync)
+        period_row.addWidget(self.sync_button)
+
+        self.vbox.addLayout(period_row)
+        #--------------------------------------------------------------------------------------
+
+        self.summary_label = QLabel('')
+        self.summary_label.setStyleSheet(label_stylesheet)
+        self.vbox.addWidget(self.summary_label)
+        #--------------------------------------------------------------------------------------
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(2, Qt.DescendingOrder)
+
+        self.table.horizontalHeader().setStyleSheet(label_stylesheet)
+        self.table.setStyleSheet(table_stylesheet)
+
+        # fixed row height - view does not measure rows while scrolling
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(len(ProfitTableModel.COLUMNS) - 1, QHeaderView.Stretch)
+
+        self.vbox.addWidget(self.table, 2)
+        #--------------------------------------------------------------------------------------
+
+        self.vbox.setContentsMargins(2,2,2,2)
+        self.vbox.setAlignment(Qt.AlignTop)
+        self.setLayout(self.vbox)
+
+        self.period_changed()
+
+    def get_period(self):
+        '''
+        :return: tuple(date_from, date_to) epoch of selected days
+        '''
+
+        date_from = QDateTime(self.date_from_editor.date()).toSecsSinceEpoch()
+        date_to = QDateTime(self.date_to_editor.date().addDays(1)).toSecsSinceEpoch() - 1
+
+        return date_from, date_to
+
+    def period_changed(self):
+
+        date_from, date_to = self.get_period()
+        self.model.set_period(date_from, date_to)
+        self.update_summary()
+
+    def update_summary(self):
+
+        if self.model.account is None:
+            self.summary_label.setText('Press Sync to load profit table')
+            return
+
+        date_from, date_to = self.get_period()
+        summary = self.store.get_profit_summary(self.model.account, date_from, date_to)
+        self.summary_label.setText('Contracts: {}   Won: {}   Bought: {:.2f}   Sold: {:.2f}   Profit: {:.2f}'.format(
+            summary['contracts'], summary['won'], summary['bought'], summary['sold'], summary['profit']))
+
+    def showEvent(self, event):
+
+        super().showEvent(event)
+
+        # the latest contracts each time window is opened
+        self.sync()
+
+    def sync(self):
+        '''
+        Starts sync of profit table with Binary.com
+        :return:
+        '''
+
+        if not self.settings_dispatcher.is_param('api_token'):
+            self.summary_label.setText('Enter token to load profit table')
+            return
+
+        if not self.sync_thread is None and self.sync_thread.isRunning():
+            return
+
+        self.sync_button.setEnabled(False)
+        self.sync_thread = SyncThread(self.settings_dispatcher.get_value('api_token'), self.store)
+        self.sync_thread.synced.connect(self.synced)
+        self.sync_thread.failed.connect(self.sync_failed)
+        self.sync_thread.start()
+
+    def synced(self, account):
+
+        self.sync_button.setEnabled(True)
+
+        if account != self.model.account:
+            self.model.set_account(account)
+        else:
+            self.model.refresh()
+
+        self.update_summary()
+
+    def sync_failed(self, error):
+
+        self.sync_button.setEnabled(True)
+        self.summary_label.setText('Sync failed: ' + error)
+
+    def close_(self):
+
+        if not self.sync_thread is None:
+            # store is closed only when sync does not write into it
+            self.sync_thread.wait()
+
+        self.store.close()
+        self.close()
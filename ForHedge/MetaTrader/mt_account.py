@@ -5,6 +5,8 @@ import re
 import sys
 import traceback
 import logging
+import time
+import traffic_recorder
 
 # FUNCTIONS TO PROCESS RESPONSE FROM MetaTrader
 RE_GET_SYMBOL = re.compile(r'Symbol: [A-Z]{6}')
@@ -54,6 +56,9 @@ class MetaTraderAccount:
                 - stop_loss
                 - volume
                 - order_id
+                - timing - dict of time.perf_counter() when connection was
+                  accepted, message was received and parsed (keys: accepted,
+                  received, parsed). Used to measure hedge latency by stages
         '''
 
         self.connection_alive = True
@@ -111,6 +116,12 @@ class MetaTraderAccount:
     def kill(self):
 
         self.connection_alive = False
+
+        # wakes server thread waiting in accept()
+        try:
+            self.mt_connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         self.mt_connection.close()
 
     def server(self):
@@ -119,6 +130,8 @@ class MetaTraderAccount:
             self.mt_connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.mt_connection.bind((self.host, self.port))
             self.mt_connection.listen()
+            # port 0 means any free port
+            self.port = self.mt_connection.getsockname()[1]
         except OSError:
             # fails if port is busy
             self.connection_alive = False
@@ -133,17 +146,24 @@ class MetaTraderAccount:
 
                 self.mt_connection.settimeout(10)
                 conn, addr = self.mt_connection.accept()
-                print('Connected')
+                accepted = time.perf_counter()
+                logging.debug('Connected')
 
                 with conn:
 
+                    data = ''
                     while self.connection_alive:
 
                         try:
                             # receive data or get Timeout error
-                            data = conn.recv(2048).decode(encoding='utf-8')
+                            chunk = conn.recv(2048)
+
+                            # connection is closed by client without order
+                            if len(chunk) == 0:
+                                break
 
                             # there was problem with receiving empty lines.
+                            data = chunk.decode(encoding='utf-8')
                             if len(data)<5:
                                 continue
                             else:
@@ -151,9 +171,20 @@ class MetaTraderAccount:
                         except socket.timeout:
                             continue
 
+                    if len(data)<5:
+                        continue
+
+                    received = time.perf_counter()
+                    traffic_recorder.record('metatrader', 'in', data)
+
                     # parse received data and emit signal if it is ok
                     data = self.process_event(data)
                     if not data is None:
+                        data['timing'] = {
+                            'accepted' : accepted,
+                            'received' : received,
+                            'parsed' : time.perf_counter()
+                        }
                         self.add_event(data)
                         self.add_unread_event(data)
                         if not self.event_listener is None:
@@ -163,6 +194,10 @@ class MetaTraderAccount:
                     conn.close()
             except socket.timeout:
                 pass
+            except OSError:
+                # listening socket is closed by kill()
+                if self.connection_alive:
+                    raise
 
         self.mt_connection.close()
 
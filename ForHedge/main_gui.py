@@ -3,7 +3,7 @@
     Main module which creates Main Window and initializes widgets
 '''
 
-from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtCore import QSize, Qt, QTimer
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import *
 import sys
@@ -11,8 +11,15 @@ import sys
 from GUI.livechart_window import Chart_window
 from GUI.settings_window import Settings_window
 from GUI.metatrader_window import MTWindow
+from GUI.profit_table_window import Profit_table_window
+from GUI.portfolio_window import Portfolio_window
 
 from settings_dispatcher import SettingsDispatcher
+from Binary import session_pool
+from Binary import metrics
+import traffic_recorder
+import logging
+import traceback
 
 SETTINGS_DISPATCHER = SettingsDispatcher()
 
@@ -42,10 +49,36 @@ class Application(QMainWindow):
         self.settings_window = Settings_window(SETTINGS_DISPATCHER)
         self.chart_window = Chart_window(SETTINGS_DISPATCHER)
         self.mt_window = MTWindow(SETTINGS_DISPATCHER)
+        self.profit_table_window = Profit_table_window(SETTINGS_DISPATCHER)
+        self.portfolio_window = Portfolio_window(SETTINGS_DISPATCHER)
 
         # need to store widget references
         self.curWidget = None
 
+        # write connection statistics to file if it is set in settings
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.export_metrics)
+        self.metrics_timer.start(15000)
+
+        # record Binary.com and MetaTrader traffic to reproduce incidents (see traffic_replay)
+        if SETTINGS_DISPATCHER.is_param('record_dir'):
+            traffic_recorder.start_recording(SETTINGS_DISPATCHER.get_value('record_dir'))
+
+    def export_metrics(self):
+        '''
+        Writes statistics of Binary.com sessions (RTT, reconnections) to 'metrics_file'
+        :return:
+        '''
+        if not SETTINGS_DISPATCHER.is_param('metrics_file'):
+            return
+
+        try:
+            metrics.write_metrics(SETTINGS_DISPATCHER.get_value('metrics_file'),
+                                  session_pool.get_pool().collect_metrics())
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
     def create_menu(self):
 
         self.toolBar = QToolBar()
@@ -110,12 +143,24 @@ class Application(QMainWindow):
         self.setCentralWidget(self.settings_window)
 
     def open_profit_table(self):
+        '''
+        Opens Profit table window - closed contracts
+        :return:
+        '''
+        self.curWidget = self.takeCentralWidget()
 
-        pass
+        self.setWindowTitle('Profit Table')
+        self.setCentralWidget(self.profit_table_window)
 
     def open_portfolio(self):
+        '''
+        Opens Portfolio window - opened contracts
+        :return:
+        '''
+        self.curWidget = self.takeCentralWidget()
 
-        pass
+        self.setWindowTitle('Portfolio')
+        self.setCentralWidget(self.portfolio_window)
 
     def open_statement(self):
 
@@ -135,9 +180,13 @@ class Application(QMainWindow):
     def close_app(self):
 
         self.close()
-        self.chart_window.close()
+        self.chart_window.close_()
         self.settings_window.close()
         self.mt_window.close_()
+        self.profit_table_window.close_()
+        self.portfolio_window.close_()
+        session_pool.get_pool().close_all()
+        traffic_recorder.stop_recording()
         sys.exit()
 
 if __name__ == '__main__':
@@ -0,0 +1,313 @@
+'''
+    Append-only log of Binary.com and MetaTrader traffic.
+
+    Clients call record() for each frame they send or receive.
+    It costs one check while recording is off, and one deque append while it is on:
+    frames are compressed and written by background thread.
+
+    Log is a directory of gzip segments <prefix>-<number>.log.gz.
+    New segment is started on each start and when segment_size bytes
+    (uncompressed) are written, existing segments are never changed.
+    Each line is JSON list:
+        [monotonic time, channel, direction, frame]
+    where channel is client name (e.g. 'BinaryAccount-2', 'metatrader')
+    and direction is 'in' or 'out'. The first line of segment is
+        [monotonic time, '', 'meta', {'wall' : time.time()}]
+
+    api tokens of authorize and buy_contract_for_multiple_accounts
+    (request and results of each account) are masked.
+
+    Usage:
+        traffic_recorder.start_recording('logs/traffic')
+        ...
+        traffic_recorder.stop_recording()
+
+        for t, channel, direction, frame in traffic_recorder.read_log('logs/traffic'):
+            ...
+
+    See traffic_replay to feed the log back into clients.
+'''
+
+from collections import deque
+from threading import Thread, Lock, Event
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import time
+import traceback
+
+
+MASK = '***'
+
+# recording in progress, see start_recording
+RECORDER = None
+
+
+def mask_request(request):
+
+    if 'authorize' in request and isinstance(request['authorize'], str):
+        request['authorize'] = MASK
+    if 'tokens' in request:
+        request['tokens'] = [MASK] * len(request['tokens'])
+
+
+def mask_results(response):
+
+    results = response.get('buy_contract_for_multiple_accounts')
+    if not isinstance(results, dict) or not isinstance(results.get('result'), list):
+        return
+
+    for result in results['result']:
+        if isinstance(result, dict) and 'token' in result:
+            result['token'] = MASK
+
+
+def mask_frame(frame):
+    '''
+    Returns frame with api tokens masked in request,
+    in request echoed by response and in results of multi-account buy
+    :param frame: str
+    :return: str
+    '''
+
+    if not '"authorize"' in frame and not '"tokens"' in frame and not '"token"' in frame:
+        return frame
+
+    message = json.loads(frame)
+    mask_request(message)
+    mask_results(message)
+    if isinstance(message.get('echo_req'), dict):
+        mask_request(message['echo_req'])
+
+    return json.dumps(message)
+
+
+class TrafficRecorder:
+    '''
+        Writes frames into segmented gzip log in background thread.
+
+        If writer falls behind by max_pending frames, new frames
+        are dropped instead of growing memory of receiving threads.
+
+        Statistics:
+            - records / dropped
+            - bytes - uncompressed bytes written
+            - segments - segments started by this recorder
+    '''
+
+    def __init__(self, directory, prefix='traffic', segment_size=64 * 2**20,
+                 flush_interval=1.0, max_pending=100000, compresslevel=6):
+
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_size = segment_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.compresslevel = compresslevel
+
+        # tuple(monotonic time, channel, direction, frame)
+        self.pending = deque()
+
+        self.file = None
+        self.segment_bytes = 0
+
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+
+        self.records = 0
+        self.dropped = 0
+        self.bytes = 0
+        self.segments = 0
+
+    def start(self):
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''
+        Writes pending frames and closes log
+        :return: None
+        '''
+
+        self.stopped.set()
+        if not self.thread is None:
+            self.thread.join()
+
+    def record(self, channel, direction, frame):
+        '''
+        Adds frame to log. Called by receiving and sending threads
+        :param channel: str
+        :param direction: 'in' or 'out'
+        :param frame: str
+        :return: None
+        '''
+
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+
+        self.pending.append((time.monotonic(), channel, direction, frame))
+
+    def run(self):
+
+        while not self.stopped.wait(self.flush_interval):
+            self.write_pending()
+
+        self.write_pending()
+
+        if not self.file is None:
+            self.file.close()
+            self.file = None
+
+    def write_pending(self):
+
+        try:
+            lines = []
+            while len(self.pending) > 0:
+                t, channel, direction, frame = self.pending.popleft()
+                if channel != 'metatrader':
+                    frame = mask_frame(frame)
+                lines.append(json.dumps([t, channel, direction, frame]))
+
+            if len(lines) == 0:
+                return
+
+            for line in lines:
+                if self.file is None or self.segment_bytes >= self.segment_size:
+                    self.open_segment()
+
+                data = line + '\n'
+                self.file.write(data)
+                self.segment_bytes += len(data)
+
+                with self.lock:
+                    self.records += 1
+                    self.bytes += len(data)
+
+            # the log can be read up to here even if the process dies
+            self.file.flush()
+        except:
+            ex_type, ex_val, ex_tb = sys.exc_info()
+            logging.error(str(ex_type)+'\n'+'\n'.join(traceback.format_tb(ex_tb)))
+
+    def open_segment(self):
+
+        if not self.file is None:
+            self.file.close()
+
+        numbers = get_segment_numbers(self.directory, self.prefix)
+        number = numbers[-1] + 1 if len(numbers) > 0 else 0
+
+        path = os.path.join(self.directory, '{}-{:06d}.log.gz'.format(self.prefix, number))
+        self.file = gzip.open(path, 'xt', compresslevel=self.compresslevel, encoding='utf-8')
+
+        meta = json.dumps([time.monotonic(), '', 'meta', {'wall' : time.time()}]) + '\n'
+        self.file.write(meta)
+        self.segment_bytes = len(meta)
+
+        with self.lock:
+            self.segments += 1
+
+    def get_stats(self):
+        '''
+        Returns statistics as dict
+        Keys are described in class docstring
+        :return: dict
+        '''
+
+        with self.lock:
+            return {
+                'records' : self.records,
+                'dropped' : self.dropped,
+                'bytes' : self.bytes,
+                'segments' : self.segments,
+                'pending' : len(self.pending)
+            }
+
+
+def get_segment_numbers(directory, prefix='traffic'):
+    '''
+    Returns sorted numbers of segments in directory
+    :return: list of int
+    '''
+
+    pattern = re.compile(re.escape(prefix) + r'-(\d+)\.log\.gz$')
+    numbers = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if not match is None:
+            numbers.append(int(match.group(1)))
+
+    return sorted(numbers)
+
+
+def read_log(directory, prefix='traffic'):
+    '''
+    Yields records of all segments in order they were written.
+    Meta records are skipped. Segment cut by crash is read up to the last flush
+    :return: generator of tuple(monotonic time, channel, direction, frame)
+    '''
+
+    for number in get_segment_numbers(directory, prefix):
+        path = os.path.join(directory, '{}-{:06d}.log.gz'.format(prefix, number))
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            try:
+                for line in file:
+                    try:
+                        t, channel, direction, frame = json.loads(line)
+                    except ValueError:
+                        # the last line of segment cut by crash
+                        break
+
+                    if direction != 'meta':
+                        yield t, channel, direction, frame
+            except EOFError:
+                pass
+
+
+def start_recording(directory, **kwargs):
+    '''
+    Starts recording traffic of all clients of the process
+    :param directory: str
+    :param kwargs: parameters of TrafficRecorder
+    :return: TrafficRecorder
+    '''
+
+    global RECORDER
+
+    stop_recording()
+
+    recorder = TrafficRecorder(directory, **kwargs)
+    recorder.start()
+    RECORDER = recorder
+
+    return recorder
+
+
+def stop_recording():
+
+    global RECORDER
+
+    recorder = RECORDER
+    RECORDER = None
+
+    if not recorder is None:
+        recorder.stop()
+
+
+def record(channel, direction, frame):
+    '''
+    Records frame if recording is started
+    :return: None
+    '''
+
+    recorder = RECORDER
+    if not recorder is None:
+        recorder.record(channel, direction, frame)
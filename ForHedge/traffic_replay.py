@@ -0,0 +1,266 @@
+'''
+    Replay of traffic log written by traffic_recorder.
+
+    Binary.com side is replayed by ReplayServer: clients connect to it
+    instead of Binary.com (BINARY_URL) and each request is answered by frames
+    recorded for the same request - the response and all the subscription
+    updates, with recorded delays divided by speed.
+    Request is matched by its text without req_id (tokens are masked
+    in the log, so any token matches), or by the first unanswered request
+    of the same call if the text differs (e.g. other date in statement).
+
+    MetaTrader side is replayed by replay_metatrader: recorded orders are
+    sent to MetaTraderAccount server with recorded intervals divided by speed.
+
+    speed 1 is real time, 10 is ten times faster, 0 is max speed.
+
+    Run from ForHedge directory:
+        python -m traffic_replay <log directory> [--speed 1|N|max] [--port 8765] [--mt-port 64500]
+    and start application with printed BINARY_URL.
+'''
+
+from collections import deque
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+from threading import Lock
+
+from Binary._scheduler import get_call_name
+from Binary.test_server import FakeBinaryServer
+import traffic_recorder
+
+
+def get_request_key(request):
+    '''
+    Returns text of request without req_id and with masked tokens
+    :param request: dict
+    :return: str
+    '''
+
+    request = dict(request)
+    request.pop('req_id', None)
+
+    if 'authorize' in request:
+        request['authorize'] = traffic_recorder.MASK
+    if 'tokens' in request:
+        request['tokens'] = [traffic_recorder.MASK] * len(request['tokens'])
+
+    return json.dumps(request, sort_keys=True)
+
+
+class RecordedRequest:
+
+    def __init__(self, channel, req_id, time):
+
+        self.channel = channel
+        self.req_id = req_id
+        self.time = time
+        self.used = False
+
+        # tuple(time, response dict)
+        self.responses = []
+
+
+class TrafficLog:
+    '''
+        Recorded requests with their responses and MetaTrader orders
+    '''
+
+    def __init__(self, directory, prefix='traffic'):
+
+        '''
+            key - request key (see get_request_key) or call name
+            value - deque of RecordedRequest in recorded order
+        '''
+        self.by_key = dict()
+        self.by_call = dict()
+
+        # tuple(time, order text)
+        self.metatrader = []
+
+        self.lock = Lock()
+        self.load(directory, prefix)
+
+    def load(self, directory, prefix):
+
+        # key - tuple(channel, req_id), value - RecordedRequest
+        sent = dict()
+
+        for t, channel, direction, frame in traffic_recorder.read_log(directory, prefix):
+            if channel == 'metatrader':
+                self.metatrader.append((t, frame))
+                continue
+
+            try:
+                message = json.loads(frame)
+            except ValueError:
+                continue
+
+            req_id = message.get('req_id')
+            if req_id is None:
+                continue
+
+            if direction == 'out':
+                recorded = RecordedRequest(channel, req_id, t)
+                # the same req_id after reconnection is replay of the same request
+                if (channel, req_id) in sent:
+                    continue
+                sent[(channel, req_id)] = recorded
+                self.by_key.setdefault(get_request_key(message), deque()).append(recorded)
+                self.by_call.setdefault(get_call_name(frame), deque()).append(recorded)
+            elif (channel, req_id) in sent:
+                sent[(channel, req_id)].responses.append((t, message))
+
+    def match(self, request):
+        '''
+        Returns recorded request matching given one and marks it used
+        :param request: dict
+        :return: RecordedRequest or None
+        '''
+
+        call = get_call_name(json.dumps(request))
+
+        with self.lock:
+            for queue in (self.by_key.get(get_request_key(request)), self.by_call.get(call)):
+                while not queue is None and len(queue) > 0:
+                    recorded = queue.popleft()
+                    if not recorded.used:
+                        recorded.used = True
+                        return recorded
+
+        return None
+
+
+class ReplayServer(FakeBinaryServer):
+    '''
+        Binary.com stand-in answering by recorded frames.
+
+        Statistics (in addition to FakeBinaryServer ones):
+            - matched / missing - requests found or not found in the log
+            - replayed - frames sent
+    '''
+
+    def __init__(self, log, speed=1.0, host='127.0.0.1', port=0):
+
+        super().__init__(host=host, port=port)
+
+        self.log = log
+        self.speed = speed
+
+        self.matched = 0
+        self.missing = 0
+        self.replayed = 0
+
+    async def respond(self, connection, request):
+
+        with self.lock:
+            self.requests[self.get_call(request)] = self.requests.get(self.get_call(request), 0) + 1
+
+        recorded = self.log.match(request)
+
+        if recorded is None:
+            with self.lock:
+                self.missing += 1
+            if 'ping' in request:
+                await self.send(connection, self.get_response(request, 'pong'), delay=False)
+            else:
+                await self.send(connection, self.get_error(request, 'ReplayMissing',
+                                                           'Request is not found in traffic log.'), delay=False)
+            return
+
+        with self.lock:
+            self.matched += 1
+
+        start = time.monotonic()
+        for t, response in recorded.responses:
+            if self.speed > 0:
+                wait = (t - recorded.time) / self.speed - (time.monotonic() - start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            response = dict(response)
+            if 'req_id' in request:
+                response['req_id'] = request['req_id']
+
+            await self.send(connection, response, delay=False)
+
+            with self.lock:
+                self.replayed += 1
+
+    def get_stats(self):
+
+        stats = super().get_stats()
+        with self.lock:
+            stats.update({
+                'matched' : self.matched,
+                'missing' : self.missing,
+                'replayed' : self.replayed
+            })
+
+        return stats
+
+
+def replay_metatrader(log, host='127.0.0.1', port=64500, speed=1.0):
+    '''
+    Sends recorded orders to MetaTraderAccount server the way MQL expert does
+    :param log: TrafficLog
+    :return: number of orders sent
+    '''
+
+    if len(log.metatrader) == 0:
+        return 0
+
+    first = log.metatrader[0][0]
+    start = time.monotonic()
+    sent = 0
+
+    for t, order in log.metatrader:
+        if speed > 0:
+            wait = (t - first) / speed - (time.monotonic() - start)
+            if wait > 0:
+                time.sleep(wait)
+
+        with socket.create_connection((host, port), timeout=5) as client:
+            client.sendall(order.encode('utf-8'))
+            try:
+                client.recv(1)
+            except socket.timeout:
+                pass
+        sent += 1
+
+    return sent
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Replay of Binary.com and MetaTrader traffic log')
+    parser.add_argument('directory')
+    parser.add_argument('--prefix', default='traffic')
+    parser.add_argument('--speed', default='1', help='1 - real time, N - N times faster, max')
+    parser.add_argument('--port', type=int, default=8765, help='port of Binary.com replay server')
+    parser.add_argument('--mt-host', default='127.0.0.1')
+    parser.add_argument('--mt-port', type=int, default=None, help='replay MetaTrader orders to this port')
+    args = parser.parse_args()
+
+    speed = 0 if args.speed == 'max' else float(args.speed)
+    log = TrafficLog(args.directory, args.prefix)
+
+    server = ReplayServer(log, speed=speed, port=args.port)
+    server.start()
+    print('Requests in log: {}, MetaTrader orders: {}'.format(
+        sum(len(queue) for queue in log.by_call.values()), len(log.metatrader)))
+    print('Run application with BINARY_URL={}'.format(server.url))
+
+    try:
+        if not args.mt_port is None:
+            input('Start MetaTrader monitoring and press Enter to replay orders')
+            print('Orders sent:', replay_metatrader(log, args.mt_host, args.mt_port, speed))
+
+        server.thread.join()
+    except KeyboardInterrupt:
+        print(server.get_stats())
+        server.stop()
+        sys.exit()